@@ -1,29 +1,98 @@
+import logging
 import streamlit as st
 from services.authentication import check_authentication
+from services.pdf_generator.resources import get_image
 from collections import defaultdict
 
 st.set_page_config(page_title="Insides Platform", layout="wide")
 
+logger = logging.getLogger(__name__)
+
+
+@st.cache_resource(ttl=600)
+def revisar_migraciones():
+    # Las migraciones se aplican al desplegar (python -m database.migrate); si
+    # alguna falló la app sigue funcionando y se avisa a los administradores
+    from database.migrate import migraciones_pendientes
+    try:
+        return migraciones_pendientes()
+    except Exception:
+        logger.exception("No se pudo revisar el estado de las migraciones")
+        return None
+
+
+@st.cache_resource
+def iniciar_outbox_sheets():
+    # Hilo que drena la cola de escrituras a Google Sheets (services/sheets_outbox.py)
+    from services.sheets_outbox import start_worker
+    return start_worker()
+
+
+@st.cache_resource
+def precargar_recursos_pdf():
+    # Opcional (general.pdf_warm_up): fuentes y plantillas PDF listas antes de la primera descarga
+    from services.pdf_generator.resources import warm_up
+    return warm_up()
+
+
+@st.cache_resource
+def volcar_metricas(path):
+    # Opcional (general.metrics_file): métricas en formato Prometheus para un textfile collector
+    from services.metrics import start_file_dump
+    from views.metricas import pool_gauges
+    return start_file_dump(path, pool_gauges)
+
+
+def es_admin():
+    admins = st.secrets.get("general", {}).get("admin_emails", [])
+    return st.user.get("email") in admins
+
+
 col1, col2, col3 = st.columns([1, 2, 1])
 
 with col2:
-    st.image("resources/images/logo_trading.png", width=800)
+    st.image(get_image("resources/images/logo_trading.png"), width=800)
 
 check_authentication()
+iniciar_outbox_sheets()
+if st.secrets.get("general", {}).get("pdf_warm_up", False):
+    precargar_recursos_pdf()
+if st.secrets.get("general", {}).get("metrics_file"):
+    volcar_metricas(st.secrets["general"]["metrics_file"])
 
 user = st.user.name
 
 with st.sidebar:
-    page = st.radio("Go to", ["Home",  "Solicitud de Anticipo", "Pre orden", "Nota Crédito"])
+    pages = ["Home",  "Solicitud de Anticipo", "Pre orden", "Nota Crédito"]
+    if es_admin():
+        pages.append("Métricas")
+    page = st.radio("Go to", pages)
+    if es_admin():
+        pendientes = revisar_migraciones()
+        if pendientes is None:
+            st.error("No se pudo revisar el estado de las migraciones del esquema (ver logs).")
+        elif pendientes:
+            st.error(
+                f"Migraciones pendientes: {', '.join(pendientes)}. "
+                "Revise los logs del despliegue y ejecute `python -m database.migrate`."
+            )
+
+from database.db import sesion_por_ejecucion
+
+# Todos los CRUD de esta ejecución comparten una sola sesión/conexión
+with sesion_por_ejecucion():
+    if page == "Solicitud de Anticipo":
+        import views.solicitud_anticipo as payment 
+        payment.show()
 
-if page == "Solicitud de Anticipo":
-    import views.solicitud_anticipo as payment 
-    payment.show()
+    elif page == "Pre orden":
+        import views.pre_orden as pre
+        pre.show()
 
-elif page == "Pre orden":
-    import views.pre_orden as pre
-    pre.show()
+    elif page == "Nota Crédito":
+        import views.nota_credito as nt
+        nt.show()
 
-elif page == "Nota Crédito":
-    import views.nota_credito as nt
-    nt.show()
\ No newline at end of file
+    elif page == "Métricas" and es_admin():
+        import views.metricas as metricas
+        metricas.show()
\ No newline at end of file
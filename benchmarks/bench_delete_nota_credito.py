@@ -0,0 +1,92 @@
+# benchmarks/bench_delete_nota_credito.py
+#
+# Borrar notas de crédito de una pestaña NOTA CREDITO de 50k filas: el camino
+# anterior (get_all_records por cada borrado) contra el índice ID Nota -> fila
+# de services/sheets_writer.py. Usa la pestaña en memoria de las pruebas, así
+# que mide llamadas a la API y celdas descargadas, no la red.
+#
+#   python -m benchmarks.bench_delete_nota_credito [--filas 50000] [--borrados 20]
+
+import argparse
+import random
+import time
+from tests.fake_gspread import FakeApi, FakeWorksheet
+from services import sheets_client, sheets_writer
+
+
+class _HojaMedida(FakeWorksheet):
+    """
+    Pestaña falsa que además cuenta las celdas que devuelve cada lectura.
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.celdas = 0
+
+    def col_values(self, col):
+        valores = super().col_values(col)
+        self.celdas += len(valores)
+        return valores
+
+    def acell(self, label):
+        self.celdas += 1
+        return super().acell(label)
+
+    def get_all_records(self):
+        registros = super().get_all_records()
+        self.celdas += len(self.rows) * len(sheets_writer.NOTA_CREDITO_HEADERS)
+        return registros
+
+
+def _hoja(filas):
+    ws = _HojaMedida(FakeApi(), "bench-orden", sheets_writer.NOTA_CREDITO_SHEET)
+    ws.rows.append(list(sheets_writer.NOTA_CREDITO_HEADERS))
+    ws.rows.extend([i, f"M-{i}", f"F-{i}", "Valor Total", 10, "", "2026-01-01 00:00:00"] for i in range(1, filas + 1))
+    return ws
+
+
+def _borrar_con_get_all_records(ws, id_nc):
+    """
+    Camino anterior: descargar la pestaña completa y buscar el ID.
+    """
+    api = sheets_client.get_sheets_client()
+    all_records = api.call("get_all_records", ws.get_all_records)
+    for idx, record in enumerate(all_records, start=2):
+        if str(record.get("ID Nota")) == str(id_nc):
+            api.call("delete_rows", ws.delete_rows, idx)
+            break
+
+
+def _medir(nombre, borrar, filas, ids):
+    ws = _hoja(filas)
+    sheets_writer._nota_index.clear()
+    sheets_writer._nota_index_built.clear()
+    inicio = time.perf_counter()
+    for id_nc in ids:
+        borrar(ws, id_nc)
+    ms = (time.perf_counter() - inicio) * 1000
+    restantes = {fila[0] for fila in ws.rows[1:]}
+    assert not restantes & set(ids), "quedaron notas sin borrar"
+    llamadas = sum(ws.api.calls.values())
+    print(f"{nombre:<22} | {llamadas:>8} | {ws.celdas:>12,} | {ms:>10.1f} | {dict(ws.api.calls)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del borrado de notas de crédito")
+    parser.add_argument("--filas", type=int, default=50_000)
+    parser.add_argument("--borrados", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    sheets_client._client = sheets_client.SheetsClient(requests_per_minute=60_000, sleep=lambda s: None)
+    ids = random.Random(0).sample(range(1, args.filas + 1), args.borrados)
+    # Dos IDs que no están en la hoja (notas ya borradas o nunca escritas)
+    ids += [args.filas + 1, args.filas + 1]
+
+    print(f"filas: {args.filas:,}  borrados: {len(ids)} (2 ausentes)")
+    print(f"{'camino':<22} | {'llamadas':>8} | {'celdas leídas':>12} | {'ms (local)':>10} | detalle")
+    _medir("get_all_records", _borrar_con_get_all_records, args.filas, ids)
+    _medir("índice ID Nota", sheets_writer._delete_nota_credito_row, args.filas, ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/bench_generate_all.py
+#
+# "Descargar Todas las Órdenes" (generate_all_archives, pool de procesos)
+# contra el camino anterior: un generate_archives por bloque, en serie.
+# No necesita base de datos ni Google Sheets.
+#
+#   python -m benchmarks.bench_generate_all [--ventas 12] [--repeticiones 3]
+
+import argparse
+import os
+import statistics
+import time
+from services.pdf_generator.generate_preorden import generate_all_archives, generate_archives
+
+
+def _jobs(ventas):
+    carga = {"cargo_type": "Contenedor", "container_details": {"40' High Cube": {"qty": 2, "names": ["CSQU3054383", "MSKU9070323"]}}}
+    jobs = []
+    for i in range(ventas):
+        recargos = [
+            {"concept": f"Recargo {j}", "quantity": 1.0, "rate": 25.0, "total": 25.0, "currency": "USD"}
+            for j in range(12 if i % 2 else 6)
+        ]
+        venta_info = {
+            "no_solicitud": "BENCH-1",
+            "comercial": "Comercial",
+            "venta": {"cliente": f"Cliente {i}", "sales_surcharges": recargos},
+            "carga": carga,
+            "comentarios": "",
+        }
+        jobs.append((f"ORDEN_{i}.pdf", venta_info, "ventas"))
+
+    costos_info = {
+        "no_solicitud": "BENCH-1",
+        "comercial": "Comercial",
+        "carga": carga,
+        "cost_surcharges": [
+            {"concept": f"Costo {j}", "quantity": 1.0, "rate": 10.0, "total": 10.0, "currency": "USD"} for j in range(8)
+        ],
+        "comentarios": "",
+    }
+    jobs.append(("COSTOS.pdf", costos_info, "costos"))
+    return jobs
+
+
+def _medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de generate_all_archives")
+    parser.add_argument("--ventas", type=int, default=12)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    jobs = _jobs(args.ventas)
+
+    # Calentar el registro de plantillas del proceso actual
+    generate_archives(jobs[0][1], jobs[0][2])
+
+    inicio = time.perf_counter()
+    generate_all_archives(jobs)
+    arranque = time.perf_counter() - inicio
+
+    serie = _medir(lambda: [generate_archives(info, variant) for _, info, variant in jobs], args.repeticiones)
+    pool = _medir(lambda: generate_all_archives(jobs), args.repeticiones)
+
+    print(f"núcleos: {os.cpu_count()}  órdenes: {len(jobs)}")
+    print(f"en serie (un generate_archives por bloque): {serie * 1000:8.1f} ms")
+    print(f"generate_all_archives (pool caliente):      {pool * 1000:8.1f} ms")
+    print(f"generate_all_archives (primer lote, arranque del pool): {arranque * 1000:8.1f} ms")
+    print(f"speedup: {serie / pool:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# benchmarks/bench_generate_archives.py
+#
+# Latencia y llamadas al sistema de generate_archives (overlay y combinación
+# en memoria) contra el flujo anterior basado en archivos: un overlay por
+# página en resources/temp, un overlay combinado en disco, el PDF final en
+# resources/output y la relectura de ese archivo para la descarga. El flujo
+# anterior se ejecuta en un directorio temporal. No necesita base de datos ni
+# Google Sheets.
+#
+# Las llamadas read/write salen de /proc/self/io (solo Linux); las aperturas
+# de archivos, de los eventos de auditoría "open" del intérprete.
+#
+#   python -m benchmarks.bench_generate_archives [--recargos 6 12] [--repeticiones 20]
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import PyPDF2
+from services.pdf_generator.generate_preorden import create_overlay, generate_archives
+from services.pdf_generator.resources import resource_path
+from ui.helpers import prepare_venta_data
+
+PLANTILLAS = {"short": "resources/templates/ORDER1.pdf", "long": "resources/templates/ORDER2.pdf"}
+
+_aperturas = 0
+
+
+def _contar_aperturas(evento, _args):
+    global _aperturas
+    if evento == "open":
+        _aperturas += 1
+
+
+def _venta_info(recargos):
+    return {
+        "no_solicitud": "BENCH-1",
+        "comercial": "Comercial",
+        "venta": {
+            "cliente": "Cliente 1",
+            "sales_surcharges": [
+                {"concept": f"Recargo {j}", "quantity": 1.0, "rate": 25.0, "total": 25.0, "currency": "USD"}
+                for j in range(recargos)
+            ],
+        },
+        "carga": {"cargo_type": "Contenedor",
+                  "container_details": {"40' High Cube": {"qty": 1, "names": ["CSQU3054383"]}}},
+        "comentarios": "",
+    }
+
+
+def _generar_en_disco(venta_info, directorio):
+    """
+    Flujo anterior de generate_archives("ventas") más la relectura del
+    formulario para st.download_button.
+    """
+    data = prepare_venta_data(venta_info)
+    version = "short" if len(data.get("sales_surcharges", [])) <= 10 else "long"
+    paginas = 1 if version == "short" else 2
+
+    overlays = []
+    for page in range(1, paginas + 1):
+        ruta = os.path.join(directorio, f"overlay_ventas_page{page}.pdf")
+        create_overlay(data, ruta, "sales_surcharges", page)
+        overlays.append(ruta)
+
+    combinado = os.path.join(directorio, "combined_overlay_ventas.pdf")
+    writer = PyPDF2.PdfWriter()
+    for ruta in overlays:
+        writer.add_page(PyPDF2.PdfReader(ruta).pages[0])
+    with open(combinado, "wb") as f:
+        writer.write(f)
+
+    plantilla = PyPDF2.PdfReader(resource_path(PLANTILLAS[version]))
+    overlay = PyPDF2.PdfReader(combinado)
+    writer = PyPDF2.PdfWriter()
+    for idx, pagina in enumerate(plantilla.pages):
+        if idx < len(overlay.pages):
+            pagina.merge_page(overlay.pages[idx])
+        writer.add_page(pagina)
+    salida = os.path.join(directorio, "pre_orden_ventas.pdf")
+    with open(salida, "wb") as f:
+        writer.write(f)
+
+    with open(salida, "rb") as f:
+        return f.read()
+
+
+def _io():
+    with open("/proc/self/io") as f:
+        campos = dict(linea.split(": ") for linea in f.read().splitlines())
+    return int(campos["syscr"]), int(campos["syscw"])
+
+
+def _medir(funcion, repeticiones):
+    global _aperturas
+    tiempos, lecturas, escrituras, aperturas = [], [], [], []
+    for _ in range(repeticiones):
+        r0, w0 = _io()
+        _aperturas = 0
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        aperturas.append(_aperturas)
+        r1, w1 = _io()
+        lecturas.append(r1 - r0)
+        escrituras.append(w1 - w0)
+    return statistics.median(tiempos), statistics.median(lecturas), statistics.median(escrituras), statistics.median(aperturas)
+
+
+def _descontar(medicion, base):
+    """
+    Resta las llamadas que hace la propia medición (leer /proc/self/io).
+    """
+    ms, *llamadas = medicion
+    return (ms, *(max(0, a - b) for a, b in zip(llamadas, base[1:])))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de generate_archives en memoria contra archivos")
+    parser.add_argument("--recargos", type=int, nargs="+", default=[6, 12])
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    sys.addaudithook(_contar_aperturas)
+    base = _medir(lambda: None, args.repeticiones)
+    print(f"{'recargos':>8} | {'flujo':<10} | {'ms (mediana)':>12} | {'read':>5} | {'write':>5} | {'open':>5}")
+    with tempfile.TemporaryDirectory() as directorio:
+        for recargos in args.recargos:
+            venta_info = _venta_info(recargos)
+            # Calentar fuentes y el registro de plantillas
+            generate_archives(venta_info)
+            _generar_en_disco(venta_info, directorio)
+
+            for nombre, funcion in (("memoria", lambda: generate_archives(venta_info)),
+                                    ("archivos", lambda: _generar_en_disco(venta_info, directorio))):
+                ms, lecturas, escrituras, aperturas = _descontar(_medir(funcion, args.repeticiones), base)
+                print(f"{recargos:>8} | {nombre:<10} | {ms:>12.2f} | {lecturas:>5.0f} | {escrituras:>5.0f} | {aperturas:>5.0f}")
+
+
+if __name__ == "__main__":
+    main()
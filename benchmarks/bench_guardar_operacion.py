@@ -0,0 +1,117 @@
+# benchmarks/bench_guardar_operacion.py
+#
+# Sentencias y latencia de guardar_operacion_completa para una operación nueva
+# con 10, 100 y 1000 recargos, comparado con el guardado anterior (un INSERT
+# por fila). Necesita una base de datos con las migraciones aplicadas
+# (DATABASE_URL); las operaciones BENCH-* que se guardan se eliminan.
+#
+#   python -m benchmarks.bench_guardar_operacion [--repeticiones 10]
+
+import argparse
+import statistics
+import time
+from sqlalchemy import event, text
+from database.db import get_engine, nueva_sesion, obtener_sesion, sesion_por_ejecucion
+from database.crud.operaciones import (
+    _fila_costo, _fila_detalle, _fila_venta_master, _insertar_carga, guardar_operacion_completa
+)
+
+LINEAS = (10, 100, 1000)
+VENTAS = 2
+
+
+def _operacion(no_solicitud, lineas):
+    """
+    Operación con `lineas` recargos: la mitad repartida entre las ventas y la
+    otra mitad en costos.
+    """
+    por_venta = max(1, lineas // (2 * VENTAS))
+    carga = {"bl_awb": "", "tipo_carga": "Suelta", "pol_aol": "", "pod_aod": "", "shipper": "",
+             "consignee": "", "detalle": None, "unidad_medida": "KG", "cantidad_suelta": 1, "referencia": ""}
+    ventas = [
+        {"cliente": f"Cliente {v}", "moneda": "USD", "comentarios": "",
+         "detalles": [{"concepto": f"Recargo {i}", "cantidad": 1, "tarifa": 20, "monto": 20, "moneda": "USD"}
+                      for i in range(por_venta)]}
+        for v in range(VENTAS)
+    ]
+    costos = [{"concepto": f"Costo {i}", "cantidad": 1, "tarifa": 10, "monto": 10, "moneda": "USD",
+               "comentarios": ""} for i in range(lineas - por_venta * VENTAS)]
+    return {"no_solicitud": no_solicitud, "comercial": "Bench"}, carga, ventas, costos
+
+
+def _guardar_fila_por_fila(operacion, carga, ventas, costos):
+    """
+    Guardado anterior de una operación nueva: un INSERT ... RETURNING por
+    ventas_master y un INSERT por cada ventas_detalle y cada costo.
+    """
+    with obtener_sesion() as db:
+        id_operacion = db.execute(text("""
+            INSERT INTO operaciones (no_solicitud, comercial) VALUES (:no_solicitud, :comercial)
+            RETURNING id_operacion
+        """), operacion).scalar()
+        _insertar_carga(db, id_operacion, carga)
+        for venta in ventas:
+            id_venta_master = db.execute(text("""
+                INSERT INTO ventas_master (id_operacion, cliente, monto_total, moneda, comentarios)
+                VALUES (:id_operacion, :cliente, :monto_total, :moneda, :comentarios)
+                RETURNING id_venta_master
+            """), _fila_venta_master(id_operacion, venta)).scalar()
+            for detalle in venta["detalles"]:
+                db.execute(text("""
+                    INSERT INTO ventas_detalle (id_venta_master, concepto, cantidad, tarifa, monto, moneda)
+                    VALUES (:id_venta_master, :concepto, :cantidad, :tarifa, :monto, :moneda)
+                """), _fila_detalle(id_venta_master, detalle))
+        for costo in costos:
+            db.execute(text("""
+                INSERT INTO costos (id_operacion, concepto, cantidad, tarifa, monto, moneda, comentarios)
+                VALUES (:id_operacion, :concepto, :cantidad, :tarifa, :monto, :moneda, :comentarios)
+            """), _fila_costo(id_operacion, costo))
+        db.commit()
+
+
+def _borrar_bench():
+    with nueva_sesion() as db:
+        db.execute(text("DELETE FROM operaciones WHERE starts_with(no_solicitud, 'BENCH-')"))
+        db.commit()
+
+
+def _medir(funcion, lineas, repeticiones, contador):
+    tiempos = []
+    for _ in range(repeticiones):
+        datos = _operacion(f"BENCH-{lineas}", lineas)
+        contador["sentencias"] = 0
+        inicio = time.perf_counter()
+        funcion(*datos)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        sentencias = contador["sentencias"]
+        _borrar_bench()
+    return sentencias, statistics.median(tiempos)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de guardar_operacion_completa")
+    parser.add_argument("--repeticiones", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    contador = {"sentencias": 0}
+
+    def contar(*_):
+        contador["sentencias"] += 1
+
+    engine = get_engine()
+    _borrar_bench()
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        with sesion_por_ejecucion():
+            print(f"{'recargos':>8} | {'sentencias':>10} | {'ms (mediana)':>12} | {'antes: sentencias':>17} | {'antes: ms':>9}")
+            for lineas in LINEAS:
+                sentencias, ms = _medir(guardar_operacion_completa, lineas, args.repeticiones, contador)
+                sentencias_antes, ms_antes = _medir(_guardar_fila_por_fila, lineas, args.repeticiones, contador)
+                print(f"{lineas:>8} | {sentencias:>10} | {ms:>12.2f} | {sentencias_antes:>17} | {ms_antes:>9.2f}")
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+        _borrar_bench()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/bench_importtime.py
+#
+# Tiempo de importación (python -X importtime) de la página Home (los
+# imports a nivel de módulo de app.py) y de cada vista, y qué dependencias
+# pesadas carga cada una. Con --antes se mide también otra versión del
+# repositorio (extraída con git archive en un directorio temporal) para
+# comparar. Cada medición es un proceso nuevo; se informa la mediana.
+#
+#   python -m benchmarks.bench_importtime [--antes <ref de git>] [--repeticiones 5]
+
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+from io import BytesIO
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VISTAS = ["views.solicitud_anticipo", "views.pre_orden", "views.nota_credito", "views.metricas"]
+PESADAS = ["pandas", "reportlab", "PyPDF2", "gspread", "googleapiclient"]
+
+
+def _imports_home(raiz):
+    """
+    Sentencias import de nivel de módulo de app.py: lo que carga la página
+    Home antes de elegir una vista.
+    """
+    with open(os.path.join(raiz, "app.py"), encoding="utf-8") as f:
+        arbol = ast.parse(f.read())
+    return "\n".join(ast.unparse(nodo) for nodo in arbol.body if isinstance(nodo, (ast.Import, ast.ImportFrom)))
+
+
+def _importtime(raiz, codigo):
+    """
+    Ejecuta `codigo` con -X importtime en `raiz`. Devuelve el tiempo total de
+    importación en ms y los módulos cargados, o None si falla.
+    """
+    entorno = {**os.environ, "PYTHONPATH": raiz,
+               "DATABASE_URL": os.getenv("DATABASE_URL", "postgresql+psycopg2://bench@localhost/bench")}
+    proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo], cwd=raiz, env=entorno,
+                             capture_output=True, text=True)
+    if proceso.returncode != 0:
+        return None
+
+    total_us = 0
+    modulos = set()
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        # "import time:  propio |  acumulado | <espacios por nivel>módulo"
+        _, acumulado, nombre = linea.split("|")
+        modulo = nombre[1:].rstrip()
+        if not modulo.startswith(" "):
+            # Import de primer nivel: su tiempo acumulado incluye a sus hijos
+            total_us += int(acumulado)
+        modulos.add(modulo.strip())
+    return total_us / 1000, modulos
+
+
+def _medir(raiz, codigo, repeticiones):
+    _importtime(raiz, codigo)  # compila los .pyc
+    resultados = [_importtime(raiz, codigo) for _ in range(repeticiones)]
+    if any(r is None for r in resultados):
+        return None
+    pesadas = sorted(p for p in PESADAS if any(m == p or m.startswith(p + ".") for m in resultados[0][1]))
+    return statistics.median(r[0] for r in resultados), pesadas
+
+
+def _extraer(ref, destino):
+    archivo = subprocess.run(["git", "archive", ref], cwd=PROJECT_ROOT, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=BytesIO(archivo)) as tar:
+        tar.extractall(destino)
+
+
+def _informe(titulo, raiz, repeticiones):
+    print(f"\n{titulo}")
+    print(f"{'página':<26} | {'ms (mediana)':>12} | dependencias pesadas")
+    objetivos = [("Home", _imports_home(raiz))] + [(vista, f"import {vista}") for vista in VISTAS]
+    for nombre, codigo in objetivos:
+        if nombre != "Home" and not os.path.exists(os.path.join(raiz, *nombre.split(".")) + ".py"):
+            print(f"{nombre:<26} | {'no existe':>12} |")
+            continue
+        medicion = _medir(raiz, codigo, repeticiones)
+        if medicion is None:
+            print(f"{nombre:<26} | {'error':>12} |")
+            continue
+        ms, pesadas = medicion
+        print(f"{nombre:<26} | {ms:>12.1f} | {', '.join(pesadas) or '-'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tiempo de importación de la app y sus vistas")
+    parser.add_argument("--antes", help="ref de git con la versión a comparar (p. ej. un commit anterior)")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.antes:
+        with tempfile.TemporaryDirectory() as directorio:
+            _extraer(args.antes, directorio)
+            _informe(f"antes ({args.antes})", directorio, args.repeticiones)
+    _informe("actual (árbol de trabajo)", PROJECT_ROOT, args.repeticiones)
+
+
+if __name__ == "__main__":
+    main()
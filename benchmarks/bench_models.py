@@ -0,0 +1,102 @@
+# benchmarks/bench_models.py
+#
+# Memoria por sesión y costo de conversión de una operación grande en el
+# formulario de pre orden: los objetos de database/models.py que guarda
+# st.session_state contra los diccionarios que guardaba antes, y el costo de
+# cargar (filas -> objetos), guardar (objetos -> filas) y armar los totales
+# de Sheets/PDF (sin conversión). No necesita base de datos ni Google Sheets.
+#
+#   python -m benchmarks.bench_models [--ventas 10] [--lineas 500] [--costos 500]
+
+import argparse
+import statistics
+import time
+import tracemalloc
+from decimal import Decimal
+from database.models import Operation, Surcharge
+from services.pricing import summarize
+from ui.helpers import reconstruir_sales_blocks
+
+
+def _filas_db(ventas, lineas, costos):
+    """
+    Lo que devuelve obtener_operacion_completa para la operación.
+    """
+    def fila(i, id_key):
+        return {id_key: i, "concepto": f"Recargo {i}", "cantidad": Decimal("1.00"), "tarifa": Decimal("25.50"),
+                "monto": Decimal("25.50"), "moneda": "USD"}
+
+    ventas_db = [
+        {"id_venta_master": v, "cliente": f"Cliente {v}", "comentarios": "",
+         "detalles": [fila(v * lineas + i, "id_detalle") for i in range(lineas)]}
+        for v in range(ventas)
+    ]
+    return ventas_db, [fila(i, "id_costo") for i in range(costos)]
+
+
+def _cargar_objetos(ventas_db, costos_db):
+    return reconstruir_sales_blocks(ventas_db), [Surcharge.from_db(c, "id_costo") for c in costos_db]
+
+
+def _cargar_diccionarios(ventas_db, costos_db):
+    """
+    Estado anterior del formulario: un diccionario por venta y por recargo.
+    """
+    def recargo(fila, id_key):
+        return {id_key: fila.get(id_key), "concept": fila.get("concepto", ""),
+                "quantity": float(fila.get("cantidad") or 0), "rate": float(fila.get("tarifa") or 0),
+                "total": float(fila.get("monto") or 0), "currency": fila.get("moneda", "USD")}
+
+    return (
+        [{"id_venta_master": v["id_venta_master"], "client": v["cliente"], "comments": v["comentarios"],
+          "sales_surcharges": [recargo(d, "id_detalle") for d in v["detalles"]]} for v in ventas_db],
+        [recargo(c, "id_costo") for c in costos_db],
+    )
+
+
+def _memoria(construir):
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    objeto = construir()
+    despues = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objeto
+    return (despues - antes) / 1024
+
+
+def _medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del modelo de operaciones")
+    parser.add_argument("--ventas", type=int, default=10)
+    parser.add_argument("--lineas", type=int, default=500)
+    parser.add_argument("--costos", type=int, default=500)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    ventas_db, costos_db = _filas_db(args.ventas, args.lineas, args.costos)
+    ventas, costos = _cargar_objetos(ventas_db, costos_db)
+    estado = {"no_solicitud": "BENCH-1", "commercial": "Comercial", "cargo_type": "Contenedor",
+              "sales_blocks": ventas, "cost_surcharges": costos, "final_comments_cost": ""}
+
+    recargos = args.ventas * args.lineas + args.costos
+    print(f"recargos: {recargos:,} ({args.ventas} ventas x {args.lineas} + {args.costos} costos)")
+    print(f"memoria por sesión, diccionarios (antes):          {_memoria(lambda: _cargar_diccionarios(ventas_db, costos_db)):8.0f} KB")
+    print(f"memoria por sesión, SaleBlock/Surcharge (slots):   {_memoria(lambda: _cargar_objetos(ventas_db, costos_db)):8.0f} KB")
+
+    rep = args.repeticiones
+    print(f"cargar, filas -> objetos:                {_medir(lambda: _cargar_objetos(ventas_db, costos_db), rep):8.2f} ms")
+    print(f"cargar, filas -> diccionarios (antes):   {_medir(lambda: _cargar_diccionarios(ventas_db, costos_db), rep):8.2f} ms")
+    print(f"guardar, Operation -> filas:             {_medir(lambda: Operation.from_session(estado).to_db(), rep):8.2f} ms")
+    print(f"totales para Sheets/PDF (sin copiar):    {_medir(lambda: [summarize(v.surcharges) for v in ventas], rep):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
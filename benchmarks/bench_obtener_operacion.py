@@ -0,0 +1,109 @@
+# benchmarks/bench_obtener_operacion.py
+#
+# Consultas y latencia de obtener_operacion_completa con 1, 10 y 50 ventas,
+# comparado con la carga anterior (una consulta por venta). Necesita una base
+# de datos con las migraciones aplicadas (DATABASE_URL); las operaciones
+# BENCH-* que se siembran se eliminan al final.
+#
+#   python -m benchmarks.bench_obtener_operacion [--repeticiones 50]
+
+import argparse
+import statistics
+import time
+from sqlalchemy import event, text
+from database.db import get_engine, nueva_sesion, sesion_por_ejecucion
+from database.crud.operaciones import obtener_operacion_completa
+
+VENTAS = (1, 10, 50)
+DETALLES_POR_VENTA = 8
+
+
+def _sembrar(db, no_solicitud, ventas):
+    id_operacion = db.execute(text("""
+        INSERT INTO operaciones (no_solicitud, comercial) VALUES (:no_solicitud, 'Bench')
+        RETURNING id_operacion
+    """), {"no_solicitud": no_solicitud}).scalar()
+    db.execute(text("""
+        INSERT INTO cargas (id_operacion, tipo_carga, detalle)
+        VALUES (:id, 'Contenedor', '{"20'' Dry Standard": ["CSQU3054383"]}')
+    """), {"id": id_operacion})
+    db.execute(text("""
+        INSERT INTO ventas_master (id_operacion, cliente, monto_total)
+        SELECT :id, 'Cliente ' || g, 160 FROM generate_series(1, :ventas) g
+    """), {"id": id_operacion, "ventas": ventas})
+    db.execute(text("""
+        INSERT INTO ventas_detalle (id_venta_master, concepto, cantidad, tarifa, monto)
+        SELECT vm.id_venta_master, 'Recargo ' || g, 1, 20, 20
+        FROM ventas_master vm, generate_series(1, :detalles) g
+        WHERE vm.id_operacion = :id
+    """), {"id": id_operacion, "detalles": DETALLES_POR_VENTA})
+    db.execute(text("""
+        INSERT INTO costos (id_operacion, concepto, cantidad, tarifa, monto)
+        SELECT :id, 'Costo ' || g, 1, 10, 10 FROM generate_series(1, 5) g
+    """), {"id": id_operacion})
+
+
+def _carga_por_venta(no_solicitud):
+    """
+    Carga anterior: operación, carga, ventas_master, un SELECT de
+    ventas_detalle por venta y costos.
+    """
+    from database.db import obtener_sesion
+
+    with obtener_sesion() as db:
+        operacion = db.execute(text("SELECT * FROM operaciones WHERE no_solicitud = :n"),
+                               {"n": no_solicitud}).mappings().first()
+        id_operacion = operacion["id_operacion"]
+        db.execute(text("SELECT * FROM cargas WHERE id_operacion = :id"), {"id": id_operacion}).mappings().first()
+        ventas = db.execute(text("SELECT * FROM ventas_master WHERE id_operacion = :id"),
+                            {"id": id_operacion}).mappings().all()
+        for venta in ventas:
+            db.execute(text("SELECT * FROM ventas_detalle WHERE id_venta_master = :id"),
+                       {"id": venta["id_venta_master"]}).mappings().all()
+        db.execute(text("SELECT * FROM costos WHERE id_operacion = :id"), {"id": id_operacion}).mappings().all()
+
+
+def _medir(funcion, no_solicitud, repeticiones, contador):
+    tiempos = []
+    for _ in range(repeticiones):
+        contador["consultas"] = 0
+        inicio = time.perf_counter()
+        funcion(no_solicitud)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return contador["consultas"], statistics.median(tiempos)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de obtener_operacion_completa")
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    contador = {"consultas": 0}
+
+    def contar(*_):
+        contador["consultas"] += 1
+
+    engine = get_engine()
+    with nueva_sesion() as db:
+        for ventas in VENTAS:
+            _sembrar(db, f"BENCH-{ventas}", ventas)
+        db.commit()
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        # Igual que en la app: todas las consultas de la ejecución en una sesión
+        with sesion_por_ejecucion():
+            print(f"{'ventas':>6} | {'consultas':>9} | {'ms (mediana)':>12} | {'antes: consultas':>16} | {'antes: ms':>9}")
+            for ventas in VENTAS:
+                no_solicitud = f"BENCH-{ventas}"
+                consultas, ms = _medir(obtener_operacion_completa, no_solicitud, args.repeticiones, contador)
+                consultas_antes, ms_antes = _medir(_carga_por_venta, no_solicitud, args.repeticiones, contador)
+                print(f"{ventas:>6} | {consultas:>9} | {ms:>12.2f} | {consultas_antes:>16} | {ms_antes:>9.2f}")
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+        with nueva_sesion() as db:
+            db.execute(text("DELETE FROM operaciones WHERE starts_with(no_solicitud, 'BENCH-')"))
+            db.commit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_pre_orden_form.py
+#
+# Ejecución completa del formulario de pre orden con AppTest (sin navegador)
+# para una operación de 10 ventas x 30 recargos: latencia y cuántas veces se
+# dibuja el profit, comparado con el dibujo anterior (al final de cada
+# fragmento y otra vez en forms()). No necesita base de datos ni Google
+# Sheets: el directorio de clientes es fijo.
+#
+#   python -m benchmarks.bench_pre_orden_form [--ventas 10] [--recargos 30] [--repeticiones 5]
+
+import argparse
+import statistics
+import time
+from streamlit.testing.v1 import AppTest
+import forms.pre_orden_form as pre_orden_form
+from database.crud import clientes
+from database.models import SaleBlock, Surcharge
+
+
+def _app():
+    from forms.pre_orden_form import forms
+    forms()
+
+
+def _medir(ventas, recargos, repeticiones):
+    llamadas = []
+    render_profit = pre_orden_form._render_profit
+
+    def contar(profit_area):
+        llamadas.append(profit_area)
+        render_profit(profit_area)
+
+    pre_orden_form._render_profit = contar
+    try:
+        at = AppTest.from_function(_app, default_timeout=120)
+        at.session_state["form_visible"] = True
+        at.session_state["sales_blocks"] = [
+            SaleBlock(f"Cliente {v}", surcharges=[Surcharge(f"Recargo {i}", 1, 25.5) for i in range(recargos)])
+            for v in range(ventas)
+        ]
+        at.session_state["cost_surcharges"] = [Surcharge(f"Costo {i}", 1, 10) for i in range(recargos)]
+        at.run()  # primera ejecución: arma los DataFrame de los editores
+
+        tiempos = []
+        for _ in range(repeticiones):
+            llamadas.clear()
+            inicio = time.perf_counter()
+            at.run()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+        return statistics.median(tiempos), len(llamadas)
+    finally:
+        pre_orden_form._render_profit = render_profit
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del formulario de pre orden (AppTest)")
+    parser.add_argument("--ventas", type=int, default=10)
+    parser.add_argument("--recargos", type=int, default=30)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    directorio = clientes.DirectorioClientes([{"cliente": f"Cliente {v}", "nit": str(v)} for v in range(args.ventas)])
+    pre_orden_form.obtener_directorio_clientes = lambda: directorio
+
+    ms, profits = _medir(args.ventas, args.recargos, args.repeticiones)
+
+    # Antes: cada fragmento dibujaba el profit al terminar, también en la
+    # ejecución completa
+    profit_fragmento = pre_orden_form._render_profit_fragmento
+    pre_orden_form._render_profit_fragmento = lambda profit_area: pre_orden_form._render_profit(profit_area)
+    try:
+        ms_antes, profits_antes = _medir(args.ventas, args.recargos, args.repeticiones)
+    finally:
+        pre_orden_form._render_profit_fragmento = profit_fragmento
+
+    print(f"{args.ventas} ventas x {args.recargos} recargos, ejecución completa (mediana de {args.repeticiones})")
+    print(f"{'':<8} | {'ms':>8} | {'profit dibujado':>15}")
+    print(f"{'antes':<8} | {ms_antes:>8.1f} | {profits_antes:>15}")
+    print(f"{'ahora':<8} | {ms:>8.1f} | {profits:>15}")
+
+
+if __name__ == "__main__":
+    main()
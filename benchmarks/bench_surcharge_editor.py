@@ -0,0 +1,74 @@
+# benchmarks/bench_surcharge_editor.py
+#
+# Grilla de recargos (st.data_editor de forms/pre_orden_form.py) medida con
+# AppTest: un bloque de venta con 50, 200 y 500 líneas más 30 costos. Para
+# cada tamaño: la primera ejecución, una ejecución sin cambios y una edición
+# de cantidad (recalcula la columna Total y toma una nueva instantánea). No
+# necesita base de datos ni Google Sheets.
+#
+#   python -m benchmarks.bench_surcharge_editor [--lineas 50 200 500] [--repeticiones 5]
+
+import argparse
+import statistics
+import time
+import pandas  # noqa: F401  (la primera ejecución no incluye importar pandas)
+from streamlit.testing.v1 import AppTest
+import forms.pre_orden_form as pre_orden_form
+from database.crud import clientes
+from database.models import SaleBlock, Surcharge
+
+COSTOS = 30
+
+
+def _app():
+    from forms.pre_orden_form import forms
+    forms()
+
+
+def _ms(funcion):
+    inicio = time.perf_counter()
+    funcion()
+    return (time.perf_counter() - inicio) * 1000
+
+
+def _medir(lineas, repeticiones):
+    at = AppTest.from_function(_app, default_timeout=120)
+    at.session_state["form_visible"] = True
+    at.session_state["sales_blocks"] = [
+        SaleBlock("Cliente 1", surcharges=[Surcharge(f"Recargo {i}", 1, 25.5) for i in range(lineas)])
+    ]
+    at.session_state["cost_surcharges"] = [Surcharge(f"Costo {i}", 1, 10) for i in range(COSTOS)]
+
+    primera = _ms(at.run)
+    sin_cambios = statistics.median(_ms(at.run) for _ in range(repeticiones))
+
+    ediciones = []
+    for i in range(repeticiones):
+        nonce = at.session_state["sale_surcharges_0_editor"]["nonce"]
+        at.session_state[f"sale_surcharges_0_{nonce}"] = {
+            "edited_rows": {i: {"quantity": 2 + i}}, "added_rows": [], "deleted_rows": []
+        }
+        ediciones.append(_ms(at.run))
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return primera, sin_cambios, statistics.median(ediciones)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la grilla de recargos (AppTest)")
+    parser.add_argument("--lineas", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    directorio = clientes.DirectorioClientes([{"cliente": "Cliente 1", "nit": "1"}])
+    pre_orden_form.obtener_directorio_clientes = lambda: directorio
+
+    print(f"1 venta + {COSTOS} costos (mediana de {args.repeticiones})")
+    print(f"{'líneas':>6} | {'primera ms':>10} | {'sin cambios ms':>14} | {'edición ms':>10}")
+    for lineas in args.lineas:
+        primera, sin_cambios, edicion = _medir(lineas, args.repeticiones)
+        print(f"{lineas:>6} | {primera:>10.1f} | {sin_cambios:>14.1f} | {edicion:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,82 @@
+import bisect
+import threading
+import time
 from sqlalchemy import text
-from database.db import SessionLocal  # o tu conexión
+from database.db import obtener_sesion
+from services.metrics import timed
 
+# Segundos que el directorio de clientes se sirve desde memoria
+DIRECTORIO_TTL_S = 300
+
+# Resultados por página en la búsqueda de clientes
+LIMITE_BUSQUEDA = 20
+
+CONSULTA_CLIENTES = text("""
+    SELECT id_cliente, cliente, nit, direccion, telefono_contacto, correo, pais
+    FROM clientes
+    ORDER BY cliente
+""")
+
+CONSULTA_CLIENTES_PAGINA = text("""
+    SELECT id_cliente, cliente, nit, direccion, telefono_contacto, correo, pais
+    FROM clientes
+    ORDER BY cliente
+    LIMIT :limite OFFSET :offset
+""")
+
+CONSULTA_BUSCAR_CLIENTES = text("""
+    SELECT id_cliente, cliente, nit, direccion, telefono_contacto, correo, pais
+    FROM clientes
+    WHERE cliente ILIKE :prefijo ESCAPE '\\' OR cliente % :termino
+    ORDER BY cliente ILIKE :prefijo ESCAPE '\\' DESC,
+             similarity(cliente, :termino) DESC,
+             cliente
+    LIMIT :limite OFFSET :offset
+""")
+
+_lock_directorio = threading.Lock()
+_directorio = None
+_directorio_cargado_en = 0.0
+
+
+@timed("db.obtener_clientes")
 def obtener_clientes():
-    query = text("""
-        SELECT id_cliente, cliente, nit, direccion, telefono_contacto, correo, pais
-        FROM clientes
-        ORDER BY cliente
-    """)
-    with SessionLocal() as db:
-        return db.execute(query).mappings().all()
+    with obtener_sesion() as db:
+        return db.execute(CONSULTA_CLIENTES).mappings().all()
+
 
+@timed("db.buscar_clientes")
+def buscar_clientes(termino, limite=LIMITE_BUSQUEDA, offset=0):
+    """
+    Busca clientes por prefijo o por similitud de trigramas (pg_trgm), para
+    que el typeahead tolere errores de digitación. Los que empiezan por el
+    término van primero.
+    """
+    termino = (termino or "").strip()
+    if not termino:
+        query = CONSULTA_CLIENTES_PAGINA
+        params = {"limite": limite, "offset": offset}
+    else:
+        query = CONSULTA_BUSCAR_CLIENTES
+        escapado = termino.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        params = {
+            "termino": termino,
+            "prefijo": f"{escapado}%",
+            "limite": limite,
+            "offset": offset
+        }
 
+    with obtener_sesion() as db:
+        return [dict(r) for r in db.execute(query, params).mappings().all()]
+
+
+@timed("db.insertar_cliente")
 def insertar_cliente(cliente, nit, direccion, telefono_contacto, correo, pais):
     query = text("""
         INSERT INTO clientes (cliente, nit, direccion, telefono_contacto, correo, pais)
         VALUES (:cliente, :nit, :direccion, :telefono_contacto, :correo, :pais)
     """)
-    with SessionLocal() as db:
+    with obtener_sesion() as db:
         db.execute(query, {
             "cliente": cliente,
             "nit": nit,
@@ -25,4 +85,82 @@ def insertar_cliente(cliente, nit, direccion, telefono_contacto, correo, pais):
             "correo": correo,
             "pais": pais
         })
-        db.commit()
\ No newline at end of file
+        db.commit()
+
+    invalidar_directorio_clientes()
+
+
+class DirectorioClientes:
+    """
+    Lista de clientes en memoria con búsqueda O(1) por nombre y por NIT.
+    Se comparte entre sesiones; no modificar sus listas ni diccionarios.
+    """
+
+    def __init__(self, filas):
+        self.clientes = [dict(f) for f in filas]
+        self.nombres = [c["cliente"] for c in self.clientes]
+        self.por_nombre = {c["cliente"]: c for c in self.clientes}
+        self.por_nit = {
+            str(c["nit"]).strip(): c for c in self.clientes if c.get("nit")
+        }
+        # Índice ordenado por nombre en minúsculas para búsqueda por prefijo
+        self._indice = sorted((n.lower(), n) for n in self.nombres)
+        self._claves = [clave for clave, _ in self._indice]
+
+    def buscar_por_nombre(self, nombre):
+        return self.por_nombre.get(nombre)
+
+    def buscar_por_nit(self, nit):
+        if not nit:
+            return None
+        return self.por_nit.get(str(nit).strip())
+
+    def buscar(self, termino, limite=LIMITE_BUSQUEDA, offset=0):
+        """
+        Nombres que empiezan por `termino` (búsqueda binaria) seguidos de los
+        que solo lo contienen. Devuelve a lo sumo `limite` nombres.
+        """
+        termino = (termino or "").strip().lower()
+        if not termino:
+            return self.nombres[offset:offset + limite]
+
+        requeridos = offset + limite
+        resultados = []
+        i = bisect.bisect_left(self._claves, termino)
+        while i < len(self._claves) and self._claves[i].startswith(termino) and len(resultados) < requeridos:
+            resultados.append(self._indice[i][1])
+            i += 1
+
+        if len(resultados) < requeridos:
+            for clave, nombre in self._indice:
+                if termino in clave and not clave.startswith(termino):
+                    resultados.append(nombre)
+                    if len(resultados) >= requeridos:
+                        break
+
+        return resultados[offset:offset + limite]
+
+
+@timed("db.obtener_directorio_clientes")
+def obtener_directorio_clientes():
+    """
+    Devuelve el directorio de clientes del proceso, recargándolo de la base
+    de datos cuando vence el TTL o después de invalidarlo.
+    """
+    global _directorio, _directorio_cargado_en
+    with _lock_directorio:
+        vencido = time.monotonic() - _directorio_cargado_en > DIRECTORIO_TTL_S
+        if _directorio is None or vencido:
+            _directorio = DirectorioClientes(obtener_clientes())
+            _directorio_cargado_en = time.monotonic()
+        return _directorio
+
+
+@timed("db.invalidar_directorio_clientes")
+def invalidar_directorio_clientes():
+    """
+    Descarta el directorio en memoria; la próxima lectura va a la base de datos.
+    """
+    global _directorio
+    with _lock_directorio:
+        _directorio = None
\ No newline at end of file
@@ -1,21 +1,36 @@
 from sqlalchemy import text
-from database.db import SessionLocal
-from services.sheets_writer import save_nota_credito, delete_nota_credito_sheet
+from database.db import obtener_sesion
+from services.metrics import timed
+from database.models import CreditNote
+from services.sheets_writer import enqueue_nota_credito, enqueue_delete_nota_credito
+from services.sheets_outbox import notify as notify_sheets_outbox
 
+CONSULTA_ID_OPERACION = text("""
+    SELECT id_operacion
+    FROM operaciones
+    WHERE no_solicitud = :no_solicitud
+""")
+
+CONSULTA_NOTAS_POR_SOLICITUD = text("""
+    SELECT nc.*
+    FROM notas_credito nc
+    JOIN operaciones op ON op.id_operacion = nc.id_operacion
+    WHERE op.no_solicitud = :no_solicitud
+""")
+
+@timed("db.insertar_nota_credito")
 def insertar_nota_credito(no_solicitud: str, no_factura: str, tipo_nc: str, valor_nc: float, razon: str, id_venta_master: int):
     """
     Inserta una nueva nota de crédito asociada a una operación (no_solicitud)
-    y a una venta consolidada (id_venta_master), y la guarda también en Google Sheets.
+    y a una venta consolidada (id_venta_master). La fila para Google Sheets se
+    encola en el outbox dentro de la misma transacción.
     """
-    with SessionLocal() as db:
+    nota = CreditNote(no_solicitud, id_venta_master, no_factura, tipo_nc, valor_nc, razon)
+
+    with obtener_sesion() as db:
         try:
             # 1. Obtener id_operacion
-            query_id = text("""
-                SELECT id_operacion 
-                FROM operaciones 
-                WHERE no_solicitud = :no_solicitud
-            """)
-            result = db.execute(query_id, {"no_solicitud": no_solicitud}).fetchone()
+            result = db.execute(CONSULTA_ID_OPERACION, {"no_solicitud": no_solicitud}).fetchone()
             if not result:
                 raise ValueError(f"No se encontró la operación con no_solicitud={no_solicitud}")
 
@@ -27,61 +42,45 @@ def insertar_nota_credito(no_solicitud: str, no_factura: str, tipo_nc: str, valo
                 VALUES (:id_operacion, :id_venta_master, :no_factura, :tipo_nc, :valor_nc, :razon)
                 RETURNING id_nc
             """)
-            new_id = db.execute(query_insert, {
-                "id_operacion": id_operacion,
-                "id_venta_master": id_venta_master,
-                "no_factura": no_factura,
-                "tipo_nc": tipo_nc,
-                "valor_nc": valor_nc,
-                "razon": razon
-            }).scalar()
+            nota.id_nc = db.execute(query_insert, nota.to_db(id_operacion)).scalar()
 
-            db.commit()
+            # 3. Encolar la fila para Google Sheets en la misma transacción
+            enqueue_nota_credito(db, nota)
 
-            # 3. Guardar en Google Sheets
-            save_nota_credito({
-                "id_nc": new_id,
-                "no_solicitud": no_solicitud,
-                "id_venta_master": id_venta_master,
-                "no_factura": no_factura,
-                "tipo_nc": tipo_nc,
-                "valor_nc": valor_nc,
-                "razon": razon
-            })
+            db.commit()
+            notify_sheets_outbox()
 
         except Exception as e:
             db.rollback()
             raise RuntimeError(f"Error al insertar la nota de crédito: {e}")
 
 
+@timed("db.obtener_notas_credito")
 def obtener_notas_credito(no_solicitud: str):
     """
     Obtiene todas las notas de crédito asociadas a una operación (no_solicitud).
     """
-    with SessionLocal() as db:
-        query = text("""
-            SELECT nc.* 
-            FROM notas_credito nc
-            JOIN operaciones op ON op.id_operacion = nc.id_operacion
-            WHERE op.no_solicitud = :no_solicitud
-        """)
-        result = db.execute(query, {"no_solicitud": no_solicitud}).mappings().all()
+    with obtener_sesion() as db:
+        result = db.execute(CONSULTA_NOTAS_POR_SOLICITUD, {"no_solicitud": no_solicitud}).mappings().all()
         return [dict(row) for row in result]
 
 
+@timed("db.eliminar_nota_credito")
 def eliminar_nota_credito(id_nc: int):
     """
     Elimina una nota de crédito por su ID (en BD y en Google Sheets).
     """
-    with SessionLocal() as db:
+    with obtener_sesion() as db:
         try:
             # 1. Eliminar de la base de datos
             query = text("DELETE FROM notas_credito WHERE id_nc = :id_nc")
             db.execute(query, {"id_nc": id_nc})
-            db.commit()
 
-            # 2. Eliminar de Google Sheets
-            delete_nota_credito_sheet(id_nc)
+            # 2. Encolar la eliminación en Google Sheets en la misma transacción
+            enqueue_delete_nota_credito(db, id_nc)
+
+            db.commit()
+            notify_sheets_outbox()
 
         except Exception as e:
             db.rollback()
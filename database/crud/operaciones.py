@@ -1,20 +1,528 @@
 from sqlalchemy import text
-from database.db import SessionLocal
+from database.db import obtener_sesion
+from services.metrics import timed
+from datetime import datetime
+from decimal import Decimal
+from services.pricing import summarize
 import json
 
-def guardar_operacion_completa(operacion, carga, ventas, costos):
+# Máximo de filas por sentencia INSERT multi-fila
+TAMANO_LOTE = 1000
+
+COLUMNAS_VENTA_MASTER = ["cliente", "monto_total", "moneda", "comentarios"]
+COLUMNAS_DETALLE = ["concepto", "cantidad", "tarifa", "monto", "moneda"]
+COLUMNAS_COSTO = ["concepto", "cantidad", "tarifa", "monto", "moneda", "comentarios"]
+
+# Columnas que la agregación JSON devuelve como float / texto y que se
+# convierten de vuelta a Decimal / datetime (ver _restaurar_tipos)
+COLUMNAS_NUMERICAS = {"monto_total", "cantidad", "tarifa", "monto", "cantidad_suelta", "valor_nc"}
+COLUMNAS_FECHA = {"fecha_creacion"}
+
+# ----------------------------------------------------------------------
+# Consultas de lectura
+# ----------------------------------------------------------------------
+CONSULTA_ID_OPERACION = text("""
+    SELECT id_operacion FROM operaciones WHERE no_solicitud = :no_solicitud
+""")
+
+CONSULTA_IDS_VENTA_MASTER = text("""
+    SELECT id_venta_master FROM ventas_master WHERE id_operacion = :id_operacion
+""")
+
+CONSULTA_OPERACION_COMPLETA = text("""
+    SELECT
+        row_to_json(o) AS operacion,
+        (
+            SELECT row_to_json(c)
+            FROM cargas c
+            WHERE c.id_operacion = o.id_operacion
+            ORDER BY c.id_carga
+            LIMIT 1
+        ) AS carga,
+        COALESCE((
+            SELECT json_agg(
+                to_jsonb(vm) || jsonb_build_object(
+                    'detalles', COALESCE((
+                        SELECT json_agg(vd ORDER BY vd.id_detalle)
+                        FROM ventas_detalle vd
+                        WHERE vd.id_venta_master = vm.id_venta_master
+                    ), '[]'::json)
+                )
+                ORDER BY vm.id_venta_master
+            )
+            FROM ventas_master vm
+            WHERE vm.id_operacion = o.id_operacion
+        ), '[]'::json) AS ventas,
+        COALESCE((
+            SELECT json_agg(co ORDER BY co.id_costo)
+            FROM costos co
+            WHERE co.id_operacion = o.id_operacion
+        ), '[]'::json) AS costos
+    FROM operaciones o
+    WHERE o.no_solicitud = :no_solicitud
+""")
+
+CONSULTA_VENTAS_GUARDADAS = text("""
+    SELECT
+        vm.id_venta_master, vm.cliente, vm.monto_total, vm.moneda, vm.comentarios,
+        COALESCE(
+            json_agg(
+                json_build_object(
+                    'id_detalle', vd.id_detalle,
+                    'concepto', vd.concepto,
+                    'cantidad', vd.cantidad,
+                    'tarifa', vd.tarifa,
+                    'monto', vd.monto,
+                    'moneda', vd.moneda
+                )
+            ) FILTER (WHERE vd.id_detalle IS NOT NULL),
+            '[]'::json
+        ) AS detalles
+    FROM ventas_master vm
+    LEFT JOIN ventas_detalle vd ON vd.id_venta_master = vm.id_venta_master
+    WHERE vm.id_operacion = :id_operacion
+    GROUP BY vm.id_venta_master
+""")
+
+CONSULTA_COSTOS_GUARDADOS = text("""
+    SELECT id_costo, concepto, cantidad, tarifa, monto, moneda, comentarios
+    FROM costos
+    WHERE id_operacion = :id_operacion
+""")
+
+CONSULTA_VENTAS_CON_NC = text("""
+    SELECT DISTINCT id_venta_master
+    FROM notas_credito
+    WHERE id_venta_master = ANY(:ids)
+    ORDER BY id_venta_master
+""")
+
+CONSULTA_VENTAS_POR_SOLICITUD = text("""
+    SELECT vm.id_venta_master, vm.cliente, vm.monto_total, vm.moneda, vm.comentarios
+    FROM ventas_master vm
+    JOIN operaciones o ON o.id_operacion = vm.id_operacion
+    WHERE o.no_solicitud = :no_solicitud
+""")
+
+CONSULTA_DETALLES_POR_VENTA = text("""
+    SELECT vd.id_detalle, vd.concepto, vd.cantidad, vd.tarifa, vd.monto, vd.moneda
+    FROM ventas_detalle vd
+    WHERE vd.id_venta_master = :id_venta_master
+""")
+
+CONSULTA_NOTAS_POR_VENTA = text("""
+    SELECT id_nc, id_operacion, no_factura, tipo_nc, valor_nc, razon, id_venta_master
+    FROM notas_credito
+    WHERE id_venta_master = :id_venta_master
+""")
+
+CONSULTA_VENTAS_CON_NOTAS = text("""
+    SELECT
+        vm.id_venta_master,
+        vm.cliente,
+        vm.monto_total,
+        vm.moneda,
+        vm.comentarios,
+        COALESCE(SUM(nc.valor_nc), 0) AS total_nc,
+        vm.monto_total - COALESCE(SUM(nc.valor_nc), 0) AS saldo,
+        COALESCE(
+            json_agg(
+                json_build_object(
+                    'id_nc', nc.id_nc,
+                    'id_operacion', nc.id_operacion,
+                    'no_factura', nc.no_factura,
+                    'tipo_nc', nc.tipo_nc,
+                    'valor_nc', nc.valor_nc,
+                    'razon', nc.razon,
+                    'id_venta_master', nc.id_venta_master
+                )
+                ORDER BY nc.id_nc
+            ) FILTER (WHERE nc.id_nc IS NOT NULL),
+            '[]'::json
+        ) AS notas
+    FROM ventas_master vm
+    JOIN operaciones o ON o.id_operacion = vm.id_operacion
+    LEFT JOIN notas_credito nc ON nc.id_venta_master = vm.id_venta_master
+    WHERE o.no_solicitud = :no_solicitud
+    GROUP BY vm.id_venta_master
+    ORDER BY vm.id_venta_master
+""")
+
+
+def _fila_venta_master(id_operacion, venta):
+    return {
+        "id_operacion": id_operacion,
+        "cliente": venta.get("cliente"),
+        "monto_total": summarize(venta.get("detalles", []), amount_key="monto", currency_key="moneda").grand_total,
+        "moneda": venta.get("moneda", "USD"),
+        "comentarios": venta.get("comentarios", "")
+    }
+
+
+def _fila_detalle(id_venta_master, detalle):
+    return {
+        "id_venta_master": id_venta_master,
+        "concepto": detalle.get("concepto"),
+        "cantidad": detalle.get("cantidad", 0),
+        "tarifa": detalle.get("tarifa", 0),
+        "monto": detalle.get("monto", 0),
+        "moneda": detalle.get("moneda", "USD")
+    }
+
+
+def _fila_costo(id_operacion, costo):
+    return {
+        "id_operacion": id_operacion,
+        "concepto": costo.get("concepto"),
+        "cantidad": costo.get("cantidad", 0),
+        "tarifa": costo.get("tarifa", 0),
+        "monto": costo.get("monto", 0),
+        "moneda": costo.get("moneda", "USD"),
+        "comentarios": costo.get("comentarios", "")
+    }
+
+
+def _normalizar(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, (int, float, Decimal)):
+        return Decimal(str(valor)).quantize(Decimal("0.01"))
+    return valor
+
+
+def _restaurar_tipos(fila):
+    """
+    Devuelve `fila` (un objeto de row_to_json/json_agg) con los mismos tipos
+    que daría un SELECT normal: DECIMAL(12, 2) como Decimal y TIMESTAMP como
+    datetime.
+    """
+    fila = dict(fila)
+    for col, valor in fila.items():
+        if valor is None:
+            continue
+        if col in COLUMNAS_NUMERICAS:
+            fila[col] = Decimal(str(valor)).quantize(Decimal("0.01"))
+        elif col in COLUMNAS_FECHA and isinstance(valor, str):
+            fila[col] = datetime.fromisoformat(valor)
+    return fila
+
+
+def _cambio(actual, nueva, columnas):
+    """
+    Indica si `nueva` difiere de la fila guardada `actual` en alguna columna.
+    """
+    return any(_normalizar(actual.get(col)) != _normalizar(nueva[col]) for col in columnas)
+
+
+def _json_columna(valor):
+    if isinstance(valor, Decimal):
+        return str(valor)
+    raise TypeError(f"{type(valor).__name__} no es serializable")
+
+
+def _insertar_multiples(db, tabla, columnas, filas, returning=None):
+    """
+    Inserta varias filas con un solo INSERT ... SELECT por lote. Las filas
+    viajan como un arreglo JSON que jsonb_populate_recordset convierte a los
+    tipos de `tabla`. Si se indica `returning`, devuelve los valores de esa
+    columna en el mismo orden de `filas`.
+    """
+    lista = ", ".join(columnas)
+    devueltos = []
+    for inicio in range(0, len(filas), TAMANO_LOTE):
+        lote = [{col: fila[col] for col in columnas} for fila in filas[inicio:inicio + TAMANO_LOTE]]
+        params = {"filas": json.dumps(lote, default=_json_columna)}
+        filas_lote = f"jsonb_populate_recordset(NULL::{tabla}, CAST(:filas AS jsonb)) WITH ORDINALITY AS f"
+
+        if not returning:
+            db.execute(text(f"INSERT INTO {tabla} ({lista}) SELECT {lista} FROM {filas_lote}"), params)
+            continue
+
+        # RETURNING no garantiza el orden de las filas, así que el id se toma
+        # de la secuencia junto con la posición (ordinality) de cada fila y se
+        # devuelve ordenado por esa posición.
+        devueltos.extend(db.execute(text(f"""
+            WITH nuevas AS MATERIALIZED (
+                SELECT nextval(pg_get_serial_sequence('{tabla}', '{returning}')) AS {returning},
+                       f.ordinality AS posicion, {", ".join(f"f.{col}" for col in columnas)}
+                FROM {filas_lote}
+            ), insertadas AS (
+                INSERT INTO {tabla} ({returning}, {lista})
+                SELECT {returning}, {lista} FROM nuevas
+            )
+            SELECT {returning} FROM nuevas ORDER BY posicion
+        """), params).scalars().all())
+
+    return devueltos
+
+
+def _insertar_detalles(db, detalles):
+    """
+    Inserta filas de ventas_detalle en bloque y devuelve sus id_detalle en el
+    mismo orden.
+    """
+    return _insertar_multiples(
+        db, "ventas_detalle",
+        ["id_venta_master", "concepto", "cantidad", "tarifa", "monto", "moneda"],
+        detalles, returning="id_detalle"
+    )
+
+
+def _insertar_ventas(db, id_operacion, ventas):
+    """
+    Inserta las ventas_master de una operación con un INSERT multi-fila y luego
+    todos sus ventas_detalle en bloque. Devuelve, en el orden de `ventas`,
+    {"id_venta_master": ..., "detalles": [id_detalle, ...]}.
+    """
+    if not ventas:
+        return []
+
+    masters = [_fila_venta_master(id_operacion, venta) for venta in ventas]
+    ids = _insertar_multiples(
+        db, "ventas_master",
+        ["id_operacion", "cliente", "monto_total", "moneda", "comentarios"],
+        masters, returning="id_venta_master"
+    )
+
+    detalles = [
+        _fila_detalle(id_venta_master, detalle)
+        for id_venta_master, venta in zip(ids, ventas)
+        for detalle in venta.get("detalles", [])
+    ]
+    ids_detalle = iter(_insertar_detalles(db, detalles))
+
+    return [
+        {"id_venta_master": id_venta_master,
+         "detalles": [next(ids_detalle) for _ in venta.get("detalles", [])]}
+        for id_venta_master, venta in zip(ids, ventas)
+    ]
+
+
+def _insertar_costos(db, id_operacion, costos):
+    """
+    Inserta los costos de una operación en bloque y devuelve sus id_costo en
+    el mismo orden.
+    """
+    filas = [_fila_costo(id_operacion, costo) for costo in costos]
+    return _insertar_multiples(
+        db, "costos",
+        ["id_operacion", "concepto", "cantidad", "tarifa", "monto", "moneda", "comentarios"],
+        filas, returning="id_costo"
+    )
+
+
+def _verificar_sin_notas_credito(db, ids_venta_master):
+    """
+    Impide eliminar ventas_master que tienen notas crédito: el ON DELETE
+    CASCADE las borraría sin aviso.
+    """
+    if not ids_venta_master:
+        return
+    con_notas = db.execute(CONSULTA_VENTAS_CON_NC, {"ids": list(ids_venta_master)}).scalars().all()
+    if con_notas:
+        raise ValueError(
+            "No se pueden eliminar ventas con notas crédito registradas "
+            f"(ventas #{', '.join(str(i) for i in con_notas)})"
+        )
+
+
+def _insertar_carga(db, id_operacion, carga):
+    db.execute(text("""
+        INSERT INTO cargas (id_operacion, bl_awb, tipo_carga, pol_aol, pod_aod, shipper, consignee,
+                             detalle, unidad_medida, cantidad_suelta, referencia)
+        VALUES (:id_operacion, :bl_awb, :tipo_carga, :pol_aol, :pod_aod, :shipper, :consignee,
+                :detalle, :unidad_medida, :cantidad_suelta, :referencia)
+    """), _serializar_carga(id_operacion, carga))
+
+
+def _serializar_carga(id_operacion, carga):
+    carga_serializada = {**carga, "id_operacion": id_operacion}
+    if isinstance(carga_serializada.get("detalle"), dict):
+        carga_serializada["detalle"] = json.dumps(carga_serializada["detalle"])
+    return carga_serializada
+
+
+def _sincronizar_carga(db, id_operacion, carga):
+    """
+    Actualiza la carga existente de la operación, o la inserta si no hay.
+    """
+    result = db.execute(text("""
+        UPDATE cargas
+        SET bl_awb = :bl_awb,
+            tipo_carga = :tipo_carga,
+            pol_aol = :pol_aol,
+            pod_aod = :pod_aod,
+            shipper = :shipper,
+            consignee = :consignee,
+            detalle = :detalle,
+            unidad_medida = :unidad_medida,
+            cantidad_suelta = :cantidad_suelta,
+            referencia = :referencia
+        WHERE id_carga = (
+            SELECT id_carga FROM cargas WHERE id_operacion = :id_operacion ORDER BY id_carga LIMIT 1
+        )
+    """), _serializar_carga(id_operacion, carga))
+
+    if result.rowcount == 0:
+        _insertar_carga(db, id_operacion, carga)
+
+
+def _sincronizar_ventas(db, id_operacion, ventas):
+    """
+    Compara las ventas enviadas con las guardadas y aplica solo las diferencias:
+    actualiza las filas que cambiaron, inserta las nuevas y elimina las que ya
+    no están. Los id_venta_master existentes se conservan, así que las notas
+    crédito asociadas no se pierden; eliminar una venta que tiene notas crédito
+    lanza ValueError.
+
+    Devuelve, en el orden de `ventas`, {"id_venta_master": ...,
+    "detalles": [id_detalle, ...]} incluyendo los ids de las filas nuevas.
+    """
+    guardadas = db.execute(CONSULTA_VENTAS_GUARDADAS, {"id_operacion": id_operacion}).mappings().all()
+    guardadas = {v["id_venta_master"]: v for v in guardadas}
+
+    masters_actualizar = []
+    ventas_nuevas = []
+    detalles_actualizar = []
+    detalles_nuevos = []
+    detalles_eliminar = []
+    # Ids resultantes por venta; los None se completan al insertar
+    ids = []
+
+    for venta in ventas:
+        id_venta_master = venta.get("id_venta_master")
+        actual = guardadas.pop(id_venta_master, None)
+        if actual is None:
+            ventas_nuevas.append(venta)
+            ids.append(None)
+            continue
+
+        fila = _fila_venta_master(id_operacion, venta)
+        if _cambio(actual, fila, COLUMNAS_VENTA_MASTER):
+            masters_actualizar.append({**fila, "id_venta_master": id_venta_master})
+
+        ids_detalle = []
+        detalles_guardados = {d["id_detalle"]: d for d in actual["detalles"]}
+        for detalle in venta.get("detalles", []):
+            fila_detalle = _fila_detalle(id_venta_master, detalle)
+            detalle_actual = detalles_guardados.pop(detalle.get("id_detalle"), None)
+            if detalle_actual is None:
+                detalles_nuevos.append(fila_detalle)
+                ids_detalle.append(None)
+            else:
+                if _cambio(detalle_actual, fila_detalle, COLUMNAS_DETALLE):
+                    detalles_actualizar.append({**fila_detalle, "id_detalle": detalle_actual["id_detalle"]})
+                ids_detalle.append(detalle_actual["id_detalle"])
+        detalles_eliminar.extend(detalles_guardados)
+        ids.append({"id_venta_master": id_venta_master, "detalles": ids_detalle})
+
+    # Lo que queda en `guardadas` fue eliminado del formulario
+    masters_eliminar = list(guardadas)
+    _verificar_sin_notas_credito(db, masters_eliminar)
+
+    if detalles_eliminar:
+        db.execute(text("DELETE FROM ventas_detalle WHERE id_detalle = ANY(:ids)"), {"ids": detalles_eliminar})
+    if masters_eliminar:
+        db.execute(text("DELETE FROM ventas_detalle WHERE id_venta_master = ANY(:ids)"), {"ids": masters_eliminar})
+        db.execute(text("DELETE FROM ventas_master WHERE id_venta_master = ANY(:ids)"), {"ids": masters_eliminar})
+
+    if masters_actualizar:
+        db.execute(text("""
+            UPDATE ventas_master
+            SET cliente = :cliente,
+                monto_total = :monto_total,
+                moneda = :moneda,
+                comentarios = :comentarios
+            WHERE id_venta_master = :id_venta_master
+        """), masters_actualizar)
+    if detalles_actualizar:
+        db.execute(text("""
+            UPDATE ventas_detalle
+            SET concepto = :concepto,
+                cantidad = :cantidad,
+                tarifa = :tarifa,
+                monto = :monto,
+                moneda = :moneda
+            WHERE id_detalle = :id_detalle
+        """), detalles_actualizar)
+
+    ids_detalle_nuevos = iter(_insertar_detalles(db, detalles_nuevos))
+    ids_ventas_nuevas = iter(_insertar_ventas(db, id_operacion, ventas_nuevas))
+
+    for i, ids_venta in enumerate(ids):
+        if ids_venta is None:
+            ids[i] = next(ids_ventas_nuevas)
+        else:
+            ids_venta["detalles"] = [
+                id_detalle if id_detalle is not None else next(ids_detalle_nuevos)
+                for id_detalle in ids_venta["detalles"]
+            ]
+    return ids
+
+
+def _sincronizar_costos(db, id_operacion, costos):
+    """
+    Aplica solo las diferencias entre los costos enviados y los guardados.
+    Devuelve los id_costo en el orden de `costos`.
+    """
+    guardados = db.execute(CONSULTA_COSTOS_GUARDADOS, {"id_operacion": id_operacion}).mappings().all()
+    guardados = {c["id_costo"]: c for c in guardados}
+
+    actualizar = []
+    nuevos = []
+    ids = []
+    for costo in costos:
+        fila = _fila_costo(id_operacion, costo)
+        actual = guardados.pop(costo.get("id_costo"), None)
+        if actual is None:
+            nuevos.append(costo)
+            ids.append(None)
+        else:
+            if _cambio(actual, fila, COLUMNAS_COSTO):
+                actualizar.append({**fila, "id_costo": actual["id_costo"]})
+            ids.append(actual["id_costo"])
+
+    if guardados:
+        db.execute(text("DELETE FROM costos WHERE id_costo = ANY(:ids)"), {"ids": list(guardados)})
+    if actualizar:
+        db.execute(text("""
+            UPDATE costos
+            SET concepto = :concepto,
+                cantidad = :cantidad,
+                tarifa = :tarifa,
+                monto = :monto,
+                moneda = :moneda,
+                comentarios = :comentarios
+            WHERE id_costo = :id_costo
+        """), actualizar)
+
+    ids_nuevos = iter(_insertar_costos(db, id_operacion, nuevos))
+    return [id_costo if id_costo is not None else next(ids_nuevos) for id_costo in ids]
+
+
+@timed("db.guardar_operacion_completa")
+def guardar_operacion_completa(operacion, carga, ventas, costos, incremental=True):
     """
     Guarda una operación completa con el nuevo modelo:
     - ventas_master (venta consolidada)
     - ventas_detalle (recargos de cada venta)
+
+    Si la operación ya existe y `incremental` es True, solo se escriben las
+    diferencias contra lo guardado (ver _sincronizar_ventas). Con
+    incremental=False se borra todo y se vuelve a insertar. En ningún caso se
+    eliminan ventas que tengan notas crédito.
+
+    Devuelve los ids guardados, en el orden de los argumentos, para que el
+    formulario los conserve y el siguiente guardado actualice esas filas:
+    {"id_operacion": ..., "ventas": [{"id_venta_master": ...,
+    "detalles": [id_detalle, ...]}, ...], "costos": [id_costo, ...]}
     """
 
-    with SessionLocal() as db:
+    with obtener_sesion() as db:
         try:
             # 1. Verificar si la operación ya existe
             result = db.execute(
-                text("SELECT id_operacion FROM operaciones WHERE no_solicitud = :no_solicitud"),
-                {"no_solicitud": operacion["no_solicitud"]}
+                CONSULTA_ID_OPERACION, {"no_solicitud": operacion["no_solicitud"]}
             ).fetchone()
 
             if result:
@@ -32,6 +540,17 @@ def guardar_operacion_completa(operacion, carga, ventas, costos):
                     "id_operacion": id_operacion
                 })
 
+                if incremental:
+                    _sincronizar_carga(db, id_operacion, carga)
+                    ids_ventas = _sincronizar_ventas(db, id_operacion, ventas)
+                    ids_costos = _sincronizar_costos(db, id_operacion, costos)
+                    db.commit()
+                    return {"id_operacion": id_operacion, "ventas": ids_ventas, "costos": ids_costos}
+
+                _verificar_sin_notas_credito(db, db.execute(
+                    CONSULTA_IDS_VENTA_MASTER, {"id_operacion": id_operacion}
+                ).scalars().all())
+
                 # Eliminar datos previos
                 db.execute(text("""
                     DELETE FROM ventas_detalle 
@@ -57,69 +576,23 @@ def guardar_operacion_completa(operacion, carga, ventas, costos):
                 }).scalar()
 
             # 2. Insertar carga
-            carga_serializada = {**carga, "id_operacion": id_operacion}
-            if isinstance(carga_serializada.get("detalle"), dict):
-                carga_serializada["detalle"] = json.dumps(carga_serializada["detalle"])
-
-            db.execute(text("""
-                INSERT INTO cargas (id_operacion, bl_awb, tipo_carga, pol_aol, pod_aod, shipper, consignee,
-                                     detalle, unidad_medida, cantidad_suelta, referencia)
-                VALUES (:id_operacion, :bl_awb, :tipo_carga, :pol_aol, :pod_aod, :shipper, :consignee,
-                        :detalle, :unidad_medida, :cantidad_suelta, :referencia)
-            """), carga_serializada)
+            _insertar_carga(db, id_operacion, carga)
 
             # 3. Insertar ventas_master y ventas_detalle
-            for venta in ventas:
-                monto_total = sum(d.get("monto", 0) for d in venta.get("detalles", []))
-
-                id_venta_master = db.execute(text("""
-                    INSERT INTO ventas_master (id_operacion, cliente, monto_total, moneda, comentarios)
-                    VALUES (:id_operacion, :cliente, :monto_total, :moneda, :comentarios)
-                    RETURNING id_venta_master
-                """), {
-                    "id_operacion": id_operacion,
-                    "cliente": venta.get("cliente"),
-                    "monto_total": monto_total,
-                    "moneda": venta.get("moneda", "USD"),
-                    "comentarios": venta.get("comentarios", "")
-                }).scalar()
-
-                # Insertar detalles de venta
-                for detalle in venta.get("detalles", []):
-                    db.execute(text("""
-                        INSERT INTO ventas_detalle (id_venta_master, concepto, cantidad, tarifa, monto, moneda)
-                        VALUES (:id_venta_master, :concepto, :cantidad, :tarifa, :monto, :moneda)
-                    """), {
-                        "id_venta_master": id_venta_master,
-                        "concepto": detalle.get("concepto"),
-                        "cantidad": detalle.get("cantidad", 0),
-                        "tarifa": detalle.get("tarifa", 0),
-                        "monto": detalle.get("monto", 0),
-                        "moneda": detalle.get("moneda", "USD")
-                    })
+            ids_ventas = _insertar_ventas(db, id_operacion, ventas)
 
             # 4. Insertar costos
-            for costo in costos:
-                db.execute(text("""
-                    INSERT INTO costos (id_operacion, concepto, cantidad, tarifa, monto, moneda, comentarios)
-                    VALUES (:id_operacion, :concepto, :cantidad, :tarifa, :monto, :moneda, :comentarios)
-                """), {
-                    "id_operacion": id_operacion,
-                    "concepto": costo.get("concepto"),
-                    "cantidad": costo.get("cantidad", 0),
-                    "tarifa": costo.get("tarifa", 0),
-                    "monto": costo.get("monto", 0),
-                    "moneda": costo.get("moneda", "USD"),
-                    "comentarios": costo.get("comentarios", "")
-                })
+            ids_costos = _insertar_costos(db, id_operacion, costos)
 
             db.commit()
+            return {"id_operacion": id_operacion, "ventas": ids_ventas, "costos": ids_costos}
 
         except Exception as e:
             db.rollback()
             raise RuntimeError(f"Error al guardar la operación: {e}")
 
 
+@timed("db.obtener_operacion_completa")
 def obtener_operacion_completa(no_solicitud):
     """
     Devuelve toda la información de una operación:
@@ -127,106 +600,87 @@ def obtener_operacion_completa(no_solicitud):
     - Información de la carga (detalle JSON a dict).
     - Ventas_master con sus ventas_detalle.
     - Costos.
-    """
-    with SessionLocal() as db:
-        # 1. Obtener operación
-        query_operacion = text("""
-            SELECT * FROM operaciones WHERE no_solicitud = :no_solicitud
-        """)
-        operacion = db.execute(query_operacion, {"no_solicitud": no_solicitud}).mappings().first()
-        if not operacion:
-            return None
-
-        id_operacion = operacion["id_operacion"]
-
-        # 2. Obtener carga
-        query_carga = text("""
-            SELECT * FROM cargas WHERE id_operacion = :id_operacion
-        """)
-        carga = db.execute(query_carga, {"id_operacion": id_operacion}).mappings().first()
-        if carga and carga.get("detalle"):
-            if isinstance(carga["detalle"], str):
-                try:
-                    carga = dict(carga)
-                    carga["detalle"] = json.loads(carga["detalle"])
-                except json.JSONDecodeError:
-                    carga["detalle"] = {}
-            else:
-                carga = dict(carga)
 
-        # 3. Obtener ventas consolidadas (ventas_master)
-        query_ventas_master = text("""
-            SELECT * FROM ventas_master WHERE id_operacion = :id_operacion
-        """)
-        ventas_master = db.execute(query_ventas_master, {"id_operacion": id_operacion}).mappings().all()
+    Todo el grafo se arma en Postgres con agregación JSON, así que la carga
+    completa cuesta un solo round trip sin importar cuántas ventas tenga el caso.
+    Los valores numéricos y las fechas se convierten de vuelta a Decimal y
+    datetime, igual que con un SELECT por tabla.
+    """
 
-        # Para cada venta, obtener detalles (ventas_detalle)
-        ventas_completas = []
-        for venta in ventas_master:
-            venta_dict = dict(venta)
+    with obtener_sesion() as db:
+        fila = db.execute(CONSULTA_OPERACION_COMPLETA, {"no_solicitud": no_solicitud}).mappings().first()
 
-            query_detalles = text("""
-                SELECT * FROM ventas_detalle WHERE id_venta_master = :id_venta_master
-            """)
-            detalles = db.execute(query_detalles, {"id_venta_master": venta["id_venta_master"]}).mappings().all()
-            venta_dict["detalles"] = [dict(d) for d in detalles]
+    if not fila:
+        return None
 
-            ventas_completas.append(venta_dict)
+    carga = _restaurar_tipos(fila["carga"] or {})
+    if isinstance(carga.get("detalle"), str):
+        try:
+            carga["detalle"] = json.loads(carga["detalle"])
+        except json.JSONDecodeError:
+            carga["detalle"] = {}
 
-        # 4. Obtener costos
-        query_costos = text("""
-            SELECT * FROM costos WHERE id_operacion = :id_operacion
-        """)
-        costos = db.execute(query_costos, {"id_operacion": id_operacion}).mappings().all()
+    ventas = []
+    for v in fila["ventas"]:
+        venta = _restaurar_tipos(v)
+        venta["detalles"] = [_restaurar_tipos(d) for d in venta["detalles"]]
+        ventas.append(venta)
 
-        return {
-            "operacion": dict(operacion),
-            "carga": dict(carga) if carga else {},
-            "ventas": ventas_completas,
-            "costos": [dict(c) for c in costos]
-        }
+    return {
+        "operacion": _restaurar_tipos(fila["operacion"]),
+        "carga": carga,
+        "ventas": ventas,
+        "costos": [_restaurar_tipos(c) for c in fila["costos"]]
+    }
 
 
+@timed("db.obtener_ventas_por_solicitud")
 def obtener_ventas_por_solicitud(no_solicitud: str, incluir_detalles: bool = False):
     """
     Obtiene las ventas consolidadas (ventas_master) para una solicitud.
     Si incluir_detalles=True, también incluye los recargos de cada venta.
     """
-    with SessionLocal() as db:
-        query = text("""
-            SELECT vm.id_venta_master, vm.cliente, vm.monto_total, vm.moneda, vm.comentarios
-            FROM ventas_master vm
-            JOIN operaciones o ON o.id_operacion = vm.id_operacion
-            WHERE o.no_solicitud = :no_solicitud
-        """)
-        ventas = db.execute(query, {"no_solicitud": no_solicitud}).mappings().all()
+    with obtener_sesion() as db:
+        ventas = db.execute(CONSULTA_VENTAS_POR_SOLICITUD, {"no_solicitud": no_solicitud}).mappings().all()
 
         ventas_lista = [dict(v) for v in ventas]
 
         if incluir_detalles:
             for venta in ventas_lista:
-                query_detalles = text("""
-                    SELECT vd.id_detalle, vd.concepto, vd.cantidad, vd.tarifa, vd.monto, vd.moneda
-                    FROM ventas_detalle vd
-                    WHERE vd.id_venta_master = :id_venta_master
-                """)
-                detalles = db.execute(query_detalles, {"id_venta_master": venta["id_venta_master"]}).mappings().all()
+                detalles = db.execute(
+                    CONSULTA_DETALLES_POR_VENTA, {"id_venta_master": venta["id_venta_master"]}
+                ).mappings().all()
                 venta["detalles"] = [dict(d) for d in detalles]
 
         return ventas_lista
 
+@timed("db.obtener_notas_credito_por_venta")
 def obtener_notas_credito_por_venta(id_venta_master: int):
     """
     Obtiene las notas crédito registradas para una venta completa (ventas_master).
     """
-    with SessionLocal() as db:
-        query = text("""
-            SELECT id_nc, id_operacion, no_factura, tipo_nc, valor_nc, razon, id_venta_master
-            FROM notas_credito
-            WHERE id_venta_master = :id_venta_master
-        """)
-        result = db.execute(query, {"id_venta_master": id_venta_master}).mappings().all()
+    with obtener_sesion() as db:
+        result = db.execute(CONSULTA_NOTAS_POR_VENTA, {"id_venta_master": id_venta_master}).mappings().all()
         return [dict(r) for r in result]
 
 
 
+
+
+@timed("db.obtener_ventas_con_notas_credito")
+def obtener_ventas_con_notas_credito(no_solicitud: str):
+    """
+    Obtiene las ventas consolidadas (ventas_master) de una solicitud junto con
+    sus notas crédito, el total de NC y el saldo disponible de cada venta,
+    todo en una sola consulta agregada. Las notas vuelven con los mismos
+    tipos que obtener_notas_credito_por_venta (valor_nc como Decimal).
+    """
+    with obtener_sesion() as db:
+        result = db.execute(CONSULTA_VENTAS_CON_NOTAS, {"no_solicitud": no_solicitud}).mappings().all()
+
+    ventas = []
+    for r in result:
+        venta = dict(r)
+        venta["notas"] = [_restaurar_tipos(n) for n in venta["notas"]]
+        ventas.append(venta)
+    return ventas
@@ -1,20 +1,218 @@
 # database/db.py
 
 import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
-try:
-    import streamlit as st
-    DATABASE_URL = st.secrets["DATABASE_URL"]
-except Exception:
-    from dotenv import load_dotenv
-    load_dotenv()
-    DATABASE_URL = os.getenv("DATABASE_URL")
+# El engine se crea la primera vez que se pide una sesión (ver get_engine),
+# así importar este módulo no lee secretos ni abre conexiones.
+_secrets = None
 
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL no está definida. Revisa tus secretos o tu archivo .env")
 
-engine = create_engine(DATABASE_URL)
+def _cargar_secretos():
+    global _secrets
+    if _secrets is None:
+        try:
+            import streamlit as st
+            st.secrets["DATABASE_URL"]
+            _secrets = st.secrets
+        except Exception:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _secrets = {}
+    return _secrets
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
+
+def _config(nombre, default, tipo=int):
+    """
+    Lee un parámetro de conexión de los secretos de Streamlit o, si no está,
+    de las variables de entorno.
+    """
+    try:
+        valor = _cargar_secretos()[nombre]
+    except Exception:
+        valor = os.getenv(nombre)
+    if valor in (None, ""):
+        return default
+    if tipo is bool and isinstance(valor, str):
+        return valor.strip().lower() in ("1", "true", "yes", "si", "sí")
+    return tipo(valor)
+
+
+# ----------------------------------------------------------------------
+# Métricas del pool
+# ----------------------------------------------------------------------
+_lock_metricas = threading.Lock()
+_espera = {"checkouts": 0, "total_s": 0.0, "max_s": 0.0}
+
+
+class _PoolMedido(QueuePool):
+    """
+    QueuePool que mide cuánto espera cada checkout por una conexión.
+    """
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            espera = time.perf_counter() - inicio
+            with _lock_metricas:
+                _espera["checkouts"] += 1
+                _espera["total_s"] += espera
+                _espera["max_s"] = max(_espera["max_s"], espera)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Devuelve el engine del proceso, creándolo (con la configuración del
+    pool leída de los secretos o del entorno) la primera vez.
+    """
+    global _engine
+    if _engine is not None:
+        return _engine
+
+    with _engine_lock:
+        if _engine is None:
+            database_url = _config("DATABASE_URL", None, str)
+            if not database_url:
+                raise ValueError("DATABASE_URL no está definida. Revisa tus secretos o tu archivo .env")
+
+            connect_args = {}
+            if database_url.startswith("postgresql"):
+                opciones = []
+                statement_timeout_ms = _config("DB_STATEMENT_TIMEOUT_MS", 30000)
+                if statement_timeout_ms:
+                    opciones.append(f"-c statement_timeout={statement_timeout_ms}")
+                # Red de seguridad: una transacción olvidada no retiene locks
+                idle_timeout_ms = _config("DB_IDLE_IN_TRANSACTION_TIMEOUT_MS", 60000)
+                if idle_timeout_ms:
+                    opciones.append(f"-c idle_in_transaction_session_timeout={idle_timeout_ms}")
+                if opciones:
+                    connect_args["options"] = " ".join(opciones)
+
+            _engine = create_engine(
+                database_url,
+                poolclass=_PoolMedido,
+                pool_size=_config("DB_POOL_SIZE", 5),
+                max_overflow=_config("DB_MAX_OVERFLOW", 10),
+                pool_timeout=_config("DB_POOL_TIMEOUT", 30),
+                pool_recycle=_config("DB_POOL_RECYCLE", 1800),
+                pool_pre_ping=_config("DB_POOL_PRE_PING", True, bool),
+                connect_args=connect_args,
+            )
+            SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+# Se enlaza al engine en get_engine(); usar nueva_sesion() para obtener una
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+
+def nueva_sesion():
+    get_engine()
+    return SessionLocal()
+
+
+def metricas_pool():
+    """
+    Estado actual del pool para dimensionarlo con varios usuarios concurrentes.
+    """
+    pool = get_engine().pool
+    with _lock_metricas:
+        checkouts = _espera["checkouts"]
+        total_s = _espera["total_s"]
+        max_s = _espera["max_s"]
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "checkouts": checkouts,
+        "espera_promedio_ms": (total_s / checkouts * 1000) if checkouts else 0.0,
+        "espera_max_ms": max_s * 1000,
+    }
+
+
+# ----------------------------------------------------------------------
+# Sesión compartida por ejecución del script
+# ----------------------------------------------------------------------
+_sesion_actual = ContextVar("sesion_actual", default=None)
+
+
+class _SesionEjecucion:
+    """
+    Conexión y sesión de una ejecución. La conexión se toma del pool la
+    primera vez que un CRUD la pide y se mantiene hasta el final de la
+    ejecución; la sesión está atada a ella, así cada commit/rollback termina
+    la transacción sin devolver la conexión al pool.
+    """
+
+    def __init__(self):
+        self.conexion = None
+        self.sesion = None
+
+    def obtener(self):
+        if self.sesion is None:
+            self.conexion = get_engine().connect()
+            self.sesion = SessionLocal(bind=self.conexion)
+        return self.sesion
+
+    def cerrar(self):
+        if self.sesion is not None:
+            self.sesion.close()
+            self.conexion.close()
+            self.sesion = self.conexion = None
+
+
+@contextmanager
+def sesion_por_ejecucion():
+    """
+    Abre una sesión que comparten todos los CRUD llamados dentro del bloque,
+    de modo que una ejecución (rerun) de Streamlit toma como máximo una
+    conexión del pool (un checkout y, con pool_pre_ping, un solo ping). La
+    conexión se toma la primera vez que se usa y se devuelve al pool al
+    salir del bloque; entre un CRUD y otro no queda ninguna transacción
+    abierta (ver obtener_sesion).
+    """
+    ejecucion = _SesionEjecucion()
+    token = _sesion_actual.set(ejecucion)
+    try:
+        yield ejecucion
+    finally:
+        _sesion_actual.reset(token)
+        ejecucion.cerrar()
+
+
+@contextmanager
+def obtener_sesion():
+    """
+    Devuelve la sesión de la ejecución actual si existe; si no, abre una
+    sesión propia que se cierra al salir del bloque.
+
+    Con la sesión compartida, la transacción se termina al salir del bloque
+    (las escrituras ya hicieron commit), así la conexión no queda "idle in
+    transaction" reteniendo locks mientras el resto de la ejecución llama a
+    Google Sheets o genera PDFs.
+    """
+    ejecucion = _sesion_actual.get()
+    if ejecucion is None:
+        with nueva_sesion() as db:
+            yield db
+        return
+
+    db = ejecucion.obtener()
+    try:
+        yield db
+    finally:
+        # Lo que no se confirmó se descarta, igual que al cerrar una sesión propia
+        db.rollback()
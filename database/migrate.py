@@ -0,0 +1,251 @@
+# database/migrate.py
+#
+# Migraciones versionadas del esquema. Se aplican al desplegar, antes de
+# arrancar Streamlit (ver Dockerfile), y no al cargar las páginas, para que
+# el arranque en frío no ejecute DDL. Desde la línea de comandos:
+#
+#   python -m database.migrate              # aplica las pendientes
+#   python -m database.migrate --explain    # verifica planes de consulta
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from sqlalchemy import text
+from database.db import get_engine
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# Evita que dos instancias de la app apliquen migraciones al mismo tiempo
+ADVISORY_LOCK_ID = 7310452
+
+
+def listar_migraciones():
+    """
+    Devuelve las migraciones disponibles como (version, ruta), ordenadas.
+    La versión es el nombre del archivo sin la extensión .sql.
+    """
+    archivos = sorted(f for f in os.listdir(MIGRATIONS_DIR) if f.endswith(".sql"))
+    return [(f[:-4], os.path.join(MIGRATIONS_DIR, f)) for f in archivos]
+
+
+def aplicar_migraciones():
+    """
+    Aplica, en orden y cada una en su propia transacción, las migraciones que
+    aún no estén registradas en schema_migrations. Devuelve las versiones
+    aplicadas. Si una falla se detiene ahí (las anteriores quedan aplicadas)
+    y lanza RuntimeError con la versión que falló.
+    """
+    aplicadas = []
+    with get_engine().connect() as conn:
+        with conn.begin():
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version VARCHAR(100) PRIMARY KEY,
+                    aplicada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """))
+
+        for version, ruta in listar_migraciones():
+            with conn.begin():
+                conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+                ya_aplicada = conn.execute(
+                    text("SELECT 1 FROM schema_migrations WHERE version = :version"),
+                    {"version": version}
+                ).fetchone()
+                if ya_aplicada:
+                    continue
+
+                with open(ruta, encoding="utf-8") as f:
+                    try:
+                        conn.exec_driver_sql(f.read())
+                    except Exception as e:
+                        raise RuntimeError(f"La migración {version} falló: {e}") from e
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version) VALUES (:version)"),
+                    {"version": version}
+                )
+                aplicadas.append(version)
+
+    return aplicadas
+
+
+def migraciones_pendientes():
+    """
+    Versiones de database/migrations que aún no están registradas en
+    schema_migrations (todas si la tabla no existe).
+    """
+    with get_engine().connect() as conn:
+        aplicadas = set()
+        if conn.execute(text("SELECT to_regclass('schema_migrations')")).scalar():
+            aplicadas = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+    return [version for version, _ in listar_migraciones() if version not in aplicadas]
+
+
+# ----------------------------------------------------------------------
+# Verificación de planes (EXPLAIN)
+# ----------------------------------------------------------------------
+
+# Datos sintéticos para que el planificador tenga estadísticas realistas.
+SEED_SQL = """
+    INSERT INTO operaciones (no_solicitud, comercial)
+    SELECT 'EXPLAIN-' || g, 'Comercial' FROM generate_series(1, 20000) g;
+
+    INSERT INTO cargas (id_operacion, tipo_carga)
+    SELECT id_operacion, 'Contenedor' FROM operaciones WHERE starts_with(no_solicitud, 'EXPLAIN-');
+
+    INSERT INTO ventas_master (id_operacion, cliente, monto_total)
+    SELECT o.id_operacion, 'Cliente ' || g, 100
+    FROM operaciones o, generate_series(1, 2) g
+    WHERE starts_with(o.no_solicitud, 'EXPLAIN-');
+
+    INSERT INTO ventas_detalle (id_venta_master, concepto, cantidad, tarifa, monto)
+    SELECT vm.id_venta_master, 'Recargo ' || g, 1, 20, 20
+    FROM ventas_master vm
+    JOIN operaciones o ON o.id_operacion = vm.id_operacion, generate_series(1, 5) g
+    WHERE starts_with(o.no_solicitud, 'EXPLAIN-');
+
+    INSERT INTO costos (id_operacion, concepto, cantidad, tarifa, monto)
+    SELECT o.id_operacion, 'Costo ' || g, 1, 10, 10
+    FROM operaciones o, generate_series(1, 3) g
+    WHERE starts_with(o.no_solicitud, 'EXPLAIN-');
+
+    INSERT INTO notas_credito (id_operacion, id_venta_master, no_factura, tipo_nc, valor_nc)
+    SELECT vm.id_operacion, vm.id_venta_master, 'F-' || vm.id_venta_master, 'Valor Parcial', 10
+    FROM ventas_master vm
+    JOIN operaciones o ON o.id_operacion = vm.id_operacion
+    WHERE starts_with(o.no_solicitud, 'EXPLAIN-') AND mod(vm.id_venta_master, 4) = 0;
+
+    INSERT INTO clientes (cliente, nit, pais)
+    SELECT 'EXPLAIN ' || md5(g::text), 'NIT-' || g, 'Colombia'
+    FROM generate_series(1, 20000) g;
+
+    ANALYZE operaciones, cargas, ventas_master, ventas_detalle, costos, notas_credito, clientes;
+"""
+
+# Fila de muestra del conjunto sembrado para los parámetros de las consultas
+MUESTRA_SQL = """
+    SELECT o.id_operacion, min(vm.id_venta_master) AS id_venta_master
+    FROM operaciones o
+    JOIN ventas_master vm ON vm.id_operacion = o.id_operacion
+    WHERE o.no_solicitud = 'EXPLAIN-777'
+    GROUP BY o.id_operacion
+"""
+
+# Consultas que barren la tabla a propósito (listados completos)
+SIN_VERIFICAR = {"clientes.CONSULTA_CLIENTES"}
+
+
+def consultas_criticas(muestra):
+    """
+    Las consultas de database/crud/ con parámetros tomados del conjunto
+    sembrado. Los CRUD declaran sus consultas como constantes CONSULTA_* a
+    nivel de módulo para que aquí se verifique el plan de las mismas
+    sentencias que ejecutan, no de una copia. Devuelve
+    {nombre: (consulta, parámetros)}.
+    """
+    from database.crud import clientes, nota_credito, operaciones
+
+    por_solicitud = {"no_solicitud": "EXPLAIN-777"}
+    por_operacion = {"id_operacion": muestra["id_operacion"]}
+    por_venta = {"id_venta_master": muestra["id_venta_master"]}
+    # Un cliente sembrado: 'EXPLAIN ' || md5('777'), recortado como lo escribiría un usuario
+    termino = "EXPLAIN " + hashlib.md5(b"777").hexdigest()[:6]
+
+    consultas = {
+        "operaciones.CONSULTA_ID_OPERACION": (operaciones.CONSULTA_ID_OPERACION, por_solicitud),
+        "operaciones.CONSULTA_IDS_VENTA_MASTER": (operaciones.CONSULTA_IDS_VENTA_MASTER, por_operacion),
+        "operaciones.CONSULTA_OPERACION_COMPLETA": (operaciones.CONSULTA_OPERACION_COMPLETA, por_solicitud),
+        "operaciones.CONSULTA_VENTAS_GUARDADAS": (operaciones.CONSULTA_VENTAS_GUARDADAS, por_operacion),
+        "operaciones.CONSULTA_COSTOS_GUARDADOS": (operaciones.CONSULTA_COSTOS_GUARDADOS, por_operacion),
+        "operaciones.CONSULTA_VENTAS_CON_NC": (operaciones.CONSULTA_VENTAS_CON_NC, {"ids": [muestra["id_venta_master"]]}),
+        "operaciones.CONSULTA_VENTAS_POR_SOLICITUD": (operaciones.CONSULTA_VENTAS_POR_SOLICITUD, por_solicitud),
+        "operaciones.CONSULTA_DETALLES_POR_VENTA": (operaciones.CONSULTA_DETALLES_POR_VENTA, por_venta),
+        "operaciones.CONSULTA_NOTAS_POR_VENTA": (operaciones.CONSULTA_NOTAS_POR_VENTA, por_venta),
+        "operaciones.CONSULTA_VENTAS_CON_NOTAS": (operaciones.CONSULTA_VENTAS_CON_NOTAS, por_solicitud),
+        "nota_credito.CONSULTA_ID_OPERACION": (nota_credito.CONSULTA_ID_OPERACION, por_solicitud),
+        "nota_credito.CONSULTA_NOTAS_POR_SOLICITUD": (nota_credito.CONSULTA_NOTAS_POR_SOLICITUD, por_solicitud),
+        "clientes.CONSULTA_CLIENTES_PAGINA": (clientes.CONSULTA_CLIENTES_PAGINA, {"limite": 20, "offset": 0}),
+        "clientes.CONSULTA_BUSCAR_CLIENTES": (clientes.CONSULTA_BUSCAR_CLIENTES, {
+            "termino": termino, "prefijo": f"{termino}%", "limite": 20, "offset": 0
+        }),
+    }
+
+    # Cualquier constante CONSULTA_* nueva debe agregarse arriba o a SIN_VERIFICAR
+    for modulo in (clientes, nota_credito, operaciones):
+        nombre_modulo = modulo.__name__.rsplit(".", 1)[-1]
+        for atributo in dir(modulo):
+            nombre = f"{nombre_modulo}.{atributo}"
+            if atributo.startswith("CONSULTA_") and nombre not in consultas and nombre not in SIN_VERIFICAR:
+                raise RuntimeError(f"La consulta {nombre} no tiene parámetros para la verificación EXPLAIN")
+
+    return consultas
+
+
+def _seq_scans(plan):
+    """
+    Recorre un plan de EXPLAIN (FORMAT JSON) y devuelve las tablas leídas
+    con Seq Scan.
+    """
+    tablas = []
+    if plan.get("Node Type") == "Seq Scan":
+        tablas.append(plan.get("Relation Name"))
+    for hijo in plan.get("Plans", []):
+        tablas.extend(_seq_scans(hijo))
+    return tablas
+
+
+def verificar_planes():
+    """
+    Siembra un conjunto de datos sintético dentro de una transacción, corre
+    EXPLAIN sobre las consultas de database/crud/ (ver consultas_criticas) y
+    revierte todo al final. Devuelve
+    {nombre_consulta: [tablas con Seq Scan]} solo para las consultas que
+    hacen barridos secuenciales.
+    """
+    fallas = {}
+    with get_engine().connect() as conn:
+        trans = conn.begin()
+        try:
+            conn.exec_driver_sql(SEED_SQL)
+            muestra = conn.execute(text(MUESTRA_SQL)).mappings().one()
+            for nombre, (consulta, params) in consultas_criticas(muestra).items():
+                plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {consulta.text}"), params).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                tablas = _seq_scans(plan[0]["Plan"])
+                if tablas:
+                    fallas[nombre] = tablas
+        finally:
+            trans.rollback()
+    return fallas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migraciones del esquema de órdenes")
+    parser.add_argument(
+        "--explain", action="store_true",
+        help="verifica que las consultas críticas no usen Seq Scan (usar en staging)"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        aplicadas = aplicar_migraciones()
+    except RuntimeError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    print(f"Migraciones aplicadas: {', '.join(aplicadas) if aplicadas else 'ninguna'}")
+
+    if args.explain:
+        fallas = verificar_planes()
+        for nombre, tablas in fallas.items():
+            print(f"❌ {nombre}: Seq Scan sobre {', '.join(tablas)}")
+        if fallas:
+            return 1
+        print("✅ Ninguna consulta crítica usa Seq Scan.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+-- Tablas del modelo de ventas consolidadas que el código usa y que
+-- init_db.sql no declara.
+
+CREATE TABLE IF NOT EXISTS ventas_master (
+    id_venta_master SERIAL PRIMARY KEY,
+    id_operacion INT NOT NULL REFERENCES operaciones(id_operacion) ON DELETE CASCADE,
+    cliente VARCHAR(100),                       -- Cliente facturado
+    monto_total DECIMAL(12, 2) DEFAULT 0,       -- Suma de los recargos
+    moneda VARCHAR(10) DEFAULT 'USD',
+    comentarios TEXT DEFAULT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ventas_detalle (
+    id_detalle SERIAL PRIMARY KEY,
+    id_venta_master INT NOT NULL REFERENCES ventas_master(id_venta_master) ON DELETE CASCADE,
+    concepto VARCHAR(100) NOT NULL,             -- Concepto del recargo
+    cantidad DECIMAL(12, 2) DEFAULT 0,          -- Quantity
+    tarifa DECIMAL(12, 2) DEFAULT 0,            -- Rate
+    monto DECIMAL(12, 2) DEFAULT 0,             -- Total (cantidad * tarifa)
+    moneda VARCHAR(10) DEFAULT 'USD'
+);
+
+ALTER TABLE notas_credito
+    ADD COLUMN IF NOT EXISTS id_venta_master INT REFERENCES ventas_master(id_venta_master) ON DELETE CASCADE,
+    ADD COLUMN IF NOT EXISTS razon TEXT;
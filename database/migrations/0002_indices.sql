@@ -0,0 +1,9 @@
+-- Índices de llaves foráneas y de búsqueda usados en cada carga de página.
+
+CREATE INDEX IF NOT EXISTS idx_cargas_id_operacion ON cargas (id_operacion);
+CREATE INDEX IF NOT EXISTS idx_costos_id_operacion ON costos (id_operacion);
+CREATE INDEX IF NOT EXISTS idx_ventas_master_id_operacion ON ventas_master (id_operacion);
+CREATE INDEX IF NOT EXISTS idx_ventas_detalle_id_venta_master ON ventas_detalle (id_venta_master);
+CREATE INDEX IF NOT EXISTS idx_notas_credito_id_venta_master ON notas_credito (id_venta_master);
+CREATE INDEX IF NOT EXISTS idx_notas_credito_id_operacion ON notas_credito (id_operacion);
+CREATE INDEX IF NOT EXISTS idx_clientes_cliente ON clientes (cliente);
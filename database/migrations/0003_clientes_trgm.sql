@@ -0,0 +1,5 @@
+-- Búsqueda de clientes por prefijo / similitud (typeahead).
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_clientes_cliente_trgm ON clientes USING gin (cliente gin_trgm_ops);
@@ -0,0 +1,19 @@
+-- Cola de escrituras a Google Sheets. Se escribe en la misma transacción que
+-- la fila de negocio y un worker en segundo plano la drena por lotes.
+
+CREATE TABLE IF NOT EXISTS sheets_outbox (
+    id_evento BIGSERIAL PRIMARY KEY,
+    destino VARCHAR(50) NOT NULL,               -- Hoja de cálculo lógica (time_sheet, orden)
+    hoja VARCHAR(100) NOT NULL,                 -- Pestaña
+    accion VARCHAR(20) NOT NULL DEFAULT 'append',
+    payload JSONB NOT NULL,                     -- Fila, encabezados o id a eliminar
+    intentos INT NOT NULL DEFAULT 0,
+    ultimo_error TEXT,
+    disponible_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    procesado_en TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_sheets_outbox_pendientes
+    ON sheets_outbox (disponible_en, id_evento)
+    WHERE procesado_en IS NULL;
@@ -0,0 +1,6 @@
+-- Eventos pendientes por pestaña, para que el worker del outbox detecte en
+-- orden los eventos reprogramados que bloquean a los posteriores.
+
+CREATE INDEX IF NOT EXISTS idx_sheets_outbox_hoja_pendientes
+    ON sheets_outbox (destino, hoja, id_evento)
+    WHERE procesado_en IS NULL;
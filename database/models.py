@@ -0,0 +1,240 @@
+# database/models.py
+#
+# Modelo de dominio de una operación. Dataclasses con __slots__ (sin
+# __dict__ por instancia): el formulario de pre orden guarda estos objetos en
+# st.session_state y solo se convierten en los bordes (filas de la base de
+# datos al guardar, objetos al cargar, DataFrame del st.data_editor).
+#
+# Los PDF, Google Sheets y el motor de precios leen los campos como si fueran
+# un diccionario (obj["total"], obj.get("concept")), así que reciben los
+# mismos objetos sin copiarlos. Un campo en None se trata como una clave
+# ausente, igual que en los diccionarios que reemplazan.
+
+from dataclasses import dataclass, field, fields
+from typing import Optional
+
+
+def _float(valor) -> float:
+    return float(valor) if valor not in (None, "") else 0.0
+
+
+_CAMPOS: dict = {}
+
+
+def _campos(cls) -> frozenset:
+    campos = _CAMPOS.get(cls)
+    if campos is None:
+        campos = _CAMPOS[cls] = frozenset(f.name for f in fields(cls))
+    return campos
+
+
+class _LecturaComoDict:
+    """
+    Acceso de solo lectura por nombre de campo: `"total" in obj`,
+    `obj["total"]` y `obj.get("total", 0)`.
+    """
+    __slots__ = ()
+
+    def __contains__(self, key) -> bool:
+        return key in _campos(type(self)) and getattr(self, key) is not None
+
+    def __getitem__(self, key):
+        if key in _campos(type(self)):
+            valor = getattr(self, key)
+            if valor is not None:
+                return valor
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in _campos(type(self)):
+            valor = getattr(self, key)
+            if valor is not None:
+                return valor
+        return default
+
+
+@dataclass(slots=True)
+class Surcharge(_LecturaComoDict):
+    """
+    Recargo de una venta (ventas_detalle) o costo (costos). `id` es
+    id_detalle o id_costo según el caso; `total` queda en None hasta que el
+    motor de precios lo calcula.
+    """
+    concept: str = ""
+    quantity: float = 0.0
+    rate: float = 0.0
+    total: Optional[float] = None
+    currency: str = "USD"
+    id: Optional[int] = None
+
+    @classmethod
+    def from_db(cls, fila: dict, id_key: str):
+        """
+        Recargo a partir de una fila de ventas_detalle o costos. Los NULL
+        numéricos quedan en 0.
+        """
+        return cls(fila.get("concepto") or "", _float(fila.get("cantidad")), _float(fila.get("tarifa")),
+                   _float(fila.get("monto")), fila.get("moneda") or "USD", fila.get(id_key))
+
+    def to_db(self, id_key: str) -> dict:
+        return {id_key: self.id, "concepto": self.concept, "cantidad": self.quantity,
+                "tarifa": self.rate, "monto": self.total or 0.0, "moneda": self.currency}
+
+
+@dataclass(slots=True)
+class SaleBlock(_LecturaComoDict):
+    """
+    Venta consolidada (ventas_master) con sus recargos.
+    """
+    client: str = ""
+    comments: str = ""
+    surcharges: list = field(default_factory=list)
+    id_venta_master: Optional[int] = None
+
+    @classmethod
+    def from_db(cls, venta: dict):
+        return cls(venta.get("cliente") or "", venta.get("comentarios") or "",
+                   [Surcharge.from_db(d, "id_detalle") for d in venta.get("detalles", [])],
+                   venta.get("id_venta_master"))
+
+    def to_db(self) -> dict:
+        return {
+            "id_venta_master": self.id_venta_master,
+            "cliente": self.client,
+            "moneda": self.surcharges[0].currency if self.surcharges else "USD",
+            "comentarios": self.comments,
+            "detalles": [s.to_db("id_detalle") for s in self.surcharges],
+        }
+
+
+@dataclass(slots=True)
+class Carga(_LecturaComoDict):
+    """
+    Carga de la operación. Los nombres de los campos son los del bloque
+    "carga" que leen el PDF y la fila de Google Sheets.
+    """
+    cargo_type: str = "Contenedor"
+    bl_awb: str = ""
+    pol_aol: str = ""
+    pod_aod: str = ""
+    shipper: str = ""
+    consignee: str = ""
+    reference: str = ""
+    container_details: dict = field(default_factory=dict)
+    unidad_medida: str = ""
+    cantidad_suelta: float = 0.0
+
+    @classmethod
+    def from_session(cls, estado):
+        """
+        Lee la carga de las keys de los widgets del formulario de pre orden.
+        """
+        return cls(
+            estado.get("cargo_type", "Contenedor"),
+            estado.get("bl_awb", ""),
+            estado.get("pol_aol", ""),
+            estado.get("pod_aod", ""),
+            estado.get("shipper", ""),
+            estado.get("consignee", ""),
+            estado.get("reference", ""),
+            estado.get("container_data", {}),
+            estado.get("unidad_medida", ""),
+            estado.get("cantidad_suelta", 0),
+        )
+
+    @property
+    def es_contenedor(self) -> bool:
+        return self.cargo_type == "Contenedor"
+
+    def to_db(self) -> dict:
+        return {
+            "bl_awb": self.bl_awb,
+            "tipo_carga": self.cargo_type,
+            "pol_aol": self.pol_aol,
+            "pod_aod": self.pod_aod,
+            "shipper": self.shipper,
+            "consignee": self.consignee,
+            "detalle": self.container_details if self.es_contenedor else None,
+            "unidad_medida": self.unidad_medida if not self.es_contenedor else None,
+            "cantidad_suelta": self.cantidad_suelta if not self.es_contenedor else None,
+            "referencia": self.reference,
+        }
+
+
+@dataclass(slots=True)
+class Operation:
+    no_solicitud: str = ""
+    commercial: str = ""
+    carga: Carga = field(default_factory=Carga)
+    sales: list = field(default_factory=list)
+    costs: list = field(default_factory=list)
+    cost_comments: str = ""
+
+    @classmethod
+    def from_session(cls, estado):
+        """
+        Operación del formulario de pre orden. Las ventas y los costos son las
+        mismas listas de st.session_state (no se copian).
+        """
+        return cls(
+            estado.get("no_solicitud", ""),
+            estado.get("commercial", ""),
+            Carga.from_session(estado),
+            estado.get("sales_blocks", []),
+            estado.get("cost_surcharges", []),
+            estado.get("final_comments_cost", ""),
+        )
+
+    def to_db(self):
+        """
+        Argumentos (operacion, carga, ventas, costos) de guardar_operacion_completa.
+        """
+        costos = []
+        for c in self.costs:
+            fila = c.to_db("id_costo")
+            fila["comentarios"] = self.cost_comments
+            costos.append(fila)
+        return (
+            {"no_solicitud": self.no_solicitud, "comercial": self.commercial},
+            self.carga.to_db(),
+            [venta.to_db() for venta in self.sales],
+            costos,
+        )
+
+    def register_ids(self, ids: dict):
+        """
+        Guarda en los objetos los ids que devolvió guardar_operacion_completa,
+        para que el siguiente guardado actualice esas filas en vez de
+        eliminarlas y volver a insertarlas.
+        """
+        for venta, ids_venta in zip(self.sales, ids["ventas"]):
+            venta.id_venta_master = ids_venta["id_venta_master"]
+            for surcharge, id_detalle in zip(venta.surcharges, ids_venta["detalles"]):
+                surcharge.id = id_detalle
+        for surcharge, id_costo in zip(self.costs, ids["costos"]):
+            surcharge.id = id_costo
+
+
+@dataclass(slots=True)
+class CreditNote(_LecturaComoDict):
+    """
+    Nota de crédito. Se pasa tal cual a build_nota_credito_row para la hoja
+    NOTA CREDITO.
+    """
+    no_solicitud: str
+    id_venta_master: int
+    no_factura: str
+    tipo_nc: str
+    valor_nc: float
+    razon: str = ""
+    id_nc: Optional[int] = None
+
+    def to_db(self, id_operacion: int) -> dict:
+        return {
+            "id_operacion": id_operacion,
+            "id_venta_master": self.id_venta_master,
+            "no_factura": self.no_factura,
+            "tipo_nc": self.tipo_nc,
+            "valor_nc": self.valor_nc,
+            "razon": self.razon,
+        }
@@ -1,6 +1,7 @@
 import streamlit as st
 import math
 import pytz
+from ui.helpers import filtrar_clientes
 # from utils.helpers import *
 
 colombia_timezone = pytz.timezone('America/Bogota')
@@ -18,7 +19,13 @@ def forms(clients_list):
         no_solicitud = st.text_input("Operation Number (M)*", key="no_solicitud")
 
     with st.expander("**Client Information**",expanded=True):
-        client = st.selectbox("Select your Client*", [" "] + ["+ Add New"] + clients_list, key="client")
+        search = st.text_input("Search Client", key="client_search", placeholder="Type part of the name...")
+        client_options = [" ", "+ Add New"] + filtrar_clientes(clients_list, search)
+        current_client = st.session_state.get("client")
+        if current_client and current_client.strip() and current_client not in client_options:
+            client_options.insert(2, current_client)
+
+        client = st.selectbox("Select your Client*", client_options, key="client")
 
         new_client_saved = st.session_state.get("new_client_saved", False)
 
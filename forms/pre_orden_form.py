@@ -1,10 +1,363 @@
 import streamlit as st
-import pandas as pd
-from database.crud.clientes import obtener_clientes, insertar_cliente
+from copy import copy
+from database.crud.clientes import obtener_directorio_clientes, buscar_clientes, insertar_cliente
 from database.crud.operaciones import guardar_operacion_completa
 from ui.helpers import cargar_operacion_en_formulario
-from services.pdf_generator.generate_preorden import generate_archives
-from services.sheets_writer import save_order_submission
+from ui.validators import parse_container_numbers
+from services.pricing import profit, summarize
+from database.models import Carga, Operation, SaleBlock, Surcharge
+
+def _opciones_cliente(directorio, busqueda, seleccionado):
+    """
+    Opciones del selectbox de clientes: solo los resultados de la búsqueda
+    (más el cliente ya seleccionado), en vez de la lista completa.
+    Si el índice en memoria no encuentra nada se intenta la búsqueda por
+    similitud en la base de datos.
+    """
+    resultados = directorio.buscar(busqueda)
+    if busqueda and not resultados:
+        resultados = [c["cliente"] for c in buscar_clientes(busqueda)]
+
+    opciones = [" ", "+ Add New"] + resultados
+    if seleccionado and seleccionado.strip() and seleccionado not in opciones:
+        opciones.insert(2, seleccionado)
+    return opciones
+
+
+def _carga_info():
+    return Carga.from_session(st.session_state)
+
+
+def _venta_info(block_index, block):
+    """
+    Datos de una venta para generar su PDF y su fila en la hoja VENTA.
+    """
+    return {
+        "no_solicitud": st.session_state.get("no_solicitud", ""),
+        "comercial": st.session_state.get("commercial", ""),
+        "venta": {
+            "cliente": block.client,
+            "customer_phone": st.session_state.get(f"customer_phone_{block_index}", ""),
+            "customer_address": st.session_state.get(f"customer_address_{block_index}", ""),
+            "customer_account": st.session_state.get(f"customer_account_{block_index}", ""),
+            "customer_nit": st.session_state.get(f"customer_nit_{block_index}", ""),
+            "customer_contact": st.session_state.get(f"customer_contact_{block_index}", ""),
+            "customer_email": st.session_state.get(f"customer_email_{block_index}", ""),
+            "sales_surcharges": block.surcharges
+        },
+        "carga": _carga_info(),
+        "comentarios": block.comments
+    }
+
+
+def _costos_info():
+    """
+    Datos de los costos para generar su PDF y su fila en la hoja COSTO.
+    """
+    return {
+        "no_solicitud": st.session_state.get("no_solicitud", ""),
+        "comercial": st.session_state.get("commercial", ""),
+        "carga": _carga_info(),
+        "cost_surcharges": st.session_state.get("cost_surcharges", []),
+        "comentarios": st.session_state.get("final_comments_cost", ""),
+    }
+
+
+CURRENCIES = ['USD', 'COP', 'MXN']
+
+
+def _render_profit(profit_area):
+    """
+    Profit de la operación a partir de los totales ya calculados por cada
+    fragmento (no recorre los recargos).
+    """
+    profit_totals = profit(
+        st.session_state.get("sale_totals", {}).values(),
+        st.session_state.get("cost_totals", {}),
+    )
+
+    with profit_area.container():
+        st.markdown("### **Profit de la Operación:**")
+        for currency, amount in profit_totals.items():
+            st.markdown(f"**Profit {currency}**: {amount:,.2f} {currency}")
+
+
+def _render_profit_fragmento(profit_area):
+    """
+    Profit al terminar un fragmento. En una ejecución completa forms() lo
+    dibuja una sola vez después de todos los fragmentos; solo cuando se vuelve
+    a ejecutar un fragmento por sí solo lo actualiza ese fragmento.
+    """
+    if not st.session_state.get("profit_diferido"):
+        _render_profit(profit_area)
+
+
+SURCHARGE_COLUMNS = ["id", "concept", "quantity", "rate", "total", "currency"]
+
+
+def _recargo(valores: dict, base: Surcharge = None) -> Surcharge:
+    """
+    Surcharge a partir de una fila del editor. Las celdas vacías toman el valor
+    de `base` (la fila original) o el default de la columna.
+    """
+    import pandas as pd
+
+    base = base or Surcharge()
+
+    def valor(col, default):
+        v = valores.get(col, default)
+        return default if v is None or pd.isna(v) else v
+
+    id_recargo = valor("id", base.id)
+    return Surcharge(
+        concept=valor("concept", base.concept),
+        quantity=float(valor("quantity", base.quantity)),
+        rate=float(valor("rate", base.rate)),
+        currency=valor("currency", base.currency),
+        id=None if id_recargo is None else int(id_recargo),
+    )
+
+
+def _aplicar_cambios(base, cambios):
+    """
+    Recargos que muestra el editor antes de dibujarlo: la instantánea `base`
+    con los cambios pendientes del widget (edited_rows, added_rows y
+    deleted_rows, por posición de fila).
+    """
+    cambios = cambios or {}
+    editadas = {int(i): valores for i, valores in cambios.get("edited_rows", {}).items()}
+    eliminadas = {int(i) for i in cambios.get("deleted_rows", [])}
+
+    filas = [
+        _recargo(editadas.get(i, {}), fila)
+        for i, fila in enumerate(base)
+        if i not in eliminadas
+    ]
+    filas.extend(_recargo(valores) for valores in cambios.get("added_rows", []))
+    return filas
+
+
+def _surcharge_editor(surcharges, key):
+    """
+    Edita la lista de recargos (Surcharge de database/models.py) en una sola
+    grilla st.data_editor y la actualiza en el lugar. Devuelve los totales por
+    moneda (ver services/pricing.py).
+
+    El editor guarda sus cambios como diferencias contra los datos que recibe,
+    así que se le pasa siempre la misma instantánea. La columna Total (solo
+    lectura) sale del motor de precios: antes de dibujar la grilla se aplican
+    los cambios pendientes y, si algún total cambió o la lista cambió por fuera
+    (p. ej. al cargar una operación), se toma una nueva instantánea y se cambia
+    la key del widget.
+    """
+    import pandas as pd
+
+    state = st.session_state.setdefault(f"{key}_editor", {"nonce": 0, "base": None, "rows": None})
+    if state["base"] is not None and state["rows"] == surcharges:
+        records = _aplicar_cambios(state["base"], st.session_state.get(f"{key}_{state['nonce']}"))
+    else:
+        records = [_recargo({}, s) for s in surcharges]
+
+    # Totales por línea y por moneda desde el motor de precios (una pasada,
+    # memoizado mientras las filas no cambien)
+    summary = summarize(records)
+    for record, total in zip(records, summary.line_totals):
+        record.total = float(total)
+
+    if state["base"] is None or state["rows"] != surcharges or \
+            [s.total for s in state["base"]] != [s.total for s in records]:
+        state["nonce"] += 1
+        state["base"] = [copy(s) for s in records]
+        state["frame"] = pd.DataFrame(
+            [(s.id, s.concept, s.quantity, s.rate, s.total, s.currency) for s in records], columns=SURCHARGE_COLUMNS
+        ).astype({"id": "Int64", "quantity": "float", "rate": "float", "total": "float"})
+
+    st.data_editor(
+        state["frame"],
+        key=f"{key}_{state['nonce']}",
+        num_rows="dynamic",
+        hide_index=True,
+        width="stretch",
+        column_order=SURCHARGE_COLUMNS[1:],
+        disabled=["total"],
+        column_config={
+            "id": None,
+            "concept": st.column_config.TextColumn("Concept*", required=True, default=""),
+            "quantity": st.column_config.NumberColumn("Quantity*", min_value=0.0, step=0.01, default=0.0, required=True),
+            "rate": st.column_config.NumberColumn("Rate*", min_value=0.0, step=0.01, default=0.0, required=True),
+            "total": st.column_config.NumberColumn("Total", format="%.2f"),
+            "currency": st.column_config.SelectboxColumn("Currency*", options=CURRENCIES, default="USD", required=True),
+        },
+    )
+
+    surcharges[:] = records
+    state["rows"] = [copy(s) for s in surcharges]
+
+    return dict(summary.totals)
+
+
+@st.fragment
+def _sale_block(block_index, directorio, paises, profit_area):
+    block = st.session_state["sales_blocks"][block_index]
+    client_lookup = directorio.por_nombre
+
+    with st.expander(f"**Venta #{block_index + 1}**", expanded=True):
+
+        # --- Actualizar la selección si se agregó un cliente nuevo ---
+        if "client_new" in st.session_state:
+            block.client = st.session_state.pop("client_new")
+        else:
+            block.client = block.client or " "
+
+        # --- Búsqueda + selectbox principal ---
+        busqueda = st.text_input(
+            "Buscar cliente",
+            key=f"client_search_{block_index}",
+            placeholder="Escribe parte del nombre..."
+        )
+        opciones_cliente = _opciones_cliente(directorio, busqueda, block.client)
+        block.client = st.selectbox(
+            "Selecciona el cliente*",
+            opciones_cliente,
+            index=opciones_cliente.index(block.client)
+                if block.client in opciones_cliente else 0,
+            key=f"client_{block_index}"
+        )
+
+        # --- Cliente existente ---
+        if block.client in client_lookup:
+            client_info = client_lookup[block.client]
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.text_input("Teléfono", value=client_info.get("telefono_contacto", ""), key=f"customer_phone_{block_index}")
+            with col2:
+                st.text_input("Dirección", value=client_info.get("direccion", ""), key=f"customer_address_{block_index}")
+            with col3:
+                st.selectbox(
+                    "País de Emisión",
+                    paises,
+                    index=paises.index(client_info.get("pais", "Colombia")) if client_info.get("pais", "Colombia") in paises else 0,
+                    key=f"customer_account_{block_index}"
+                )
+            col4, col5, col6 = st.columns(3)
+            with col4:
+                st.text_input("NIT", value=client_info.get("nit", ""), key=f"customer_nit_{block_index}")
+            with col5:
+                st.text_input("Contacto", key=f"customer_contact_{block_index}")
+            with col6:
+                st.text_input("Correo Electrónico", value=client_info.get("correo", ""), key=f"customer_email_{block_index}")
+
+        # --- Opción para agregar un nuevo cliente ---
+        elif block.client == "+ Add New":
+            st.markdown("### **Nuevo Cliente**")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                new_cliente = st.text_input("Nombre del Cliente*", key=f"new_cliente_{block_index}")
+                new_telefono = st.text_input("Teléfono*", key=f"new_telefono_{block_index}")
+            with col2:
+                new_nit = st.text_input("NIT*", key=f"new_nit_{block_index}")
+                new_correo = st.text_input("Correo Electrónico*", key=f"new_correo_{block_index}")
+            with col3:
+                new_direccion = st.text_input("Dirección*", key=f"new_direccion_{block_index}")
+                new_pais = st.selectbox("País*", paises, key=f"new_pais_{block_index}")
+
+            if st.button("💾 Guardar Cliente", key=f"save_new_client_{block_index}"):
+                if new_cliente and new_nit and new_direccion and new_telefono and new_correo:
+                    # Insertar en la base de datos
+                    insertar_cliente(
+                        cliente=new_cliente,
+                        nit=new_nit,
+                        direccion=new_direccion,
+                        telefono_contacto=new_telefono,
+                        correo=new_correo,
+                        pais=new_pais
+                    )
+                    st.success(f"Cliente '{new_cliente}' agregado con éxito.")
+
+                    # Guardar datos en session_state para PDF y siguiente render
+                    st.session_state[f"customer_phone_{block_index}"] = new_telefono
+                    st.session_state[f"customer_address_{block_index}"] = new_direccion
+                    st.session_state[f"customer_account_{block_index}"] = new_pais
+                    st.session_state[f"customer_nit_{block_index}"] = new_nit
+                    st.session_state[f"customer_contact_{block_index}"] = ""
+                    st.session_state[f"customer_email_{block_index}"] = new_correo
+
+                    block.client = new_cliente
+                    st.session_state["client_new"] = new_cliente
+                    # El directorio de clientes cambió: se redibuja toda la página
+                    st.rerun()
+                else:
+                    st.warning("Por favor completa todos los campos obligatorios.")
+
+        # --- Recargos ---
+        sales_totals = _surcharge_editor(block.surcharges, f"sale_surcharges_{block_index}")
+
+        block.comments = st.text_area(
+            "Comentarios de la Venta",
+            block.comments,
+            key=f"final_comments_sale_{block_index}"
+        )
+
+        # --- Totales por moneda para este bloque ---
+        st.session_state.setdefault("sale_totals", {})[block_index] = sales_totals
+
+        for currency, amount in sales_totals.items():
+            st.markdown(f"**Total {currency} (Venta #{block_index + 1})**: {amount:,.2f} {currency}")
+
+        if st.button(f"📥 Descargar Venta #{block_index + 1}", key=f"download_sale_{block_index}"):
+            from services.pdf_generator.generate_preorden import generate_archives
+            from services.sheets_writer import save_order_submission
+
+            venta_info = _venta_info(block_index, block)
+            pdf_ventas = generate_archives(venta_info)
+
+            save_order_submission(venta_info, sheet_name="VENTA")
+
+            st.success(f"Se ha generado el archivo para Venta #{block_index + 1}.")
+            st.download_button(
+                label="Descargar Orden de Venta",
+                data=pdf_ventas,
+                file_name=f"ORDEN_{st.session_state.get('no_solicitud', '')}_{st.session_state.get('commercial', '')}.pdf",
+                mime="application/pdf",
+                key="dl_ventas"
+            )
+
+    _render_profit_fragmento(profit_area)
+
+
+@st.fragment
+def _cost_editor(profit_area):
+    with st.expander("**Costos**", expanded=True):
+        cost_totals = _surcharge_editor(st.session_state["cost_surcharges"], "cost_surcharges")
+
+        st.text_area("Comentarios de Costos", key="final_comments_cost")
+
+        st.session_state["cost_totals"] = cost_totals
+
+        for currency, amount in cost_totals.items():
+            st.markdown(f"**Total {currency}**: {amount:,.2f} {currency}")
+
+        if st.button("📥 Descargar Costos", key="download_costos"):
+            from services.pdf_generator.generate_preorden import generate_archives
+            from services.sheets_writer import save_order_submission
+
+            costos_info = _costos_info()
+
+            pdf_costos = generate_archives(costos_info, variant="costos")
+
+            save_order_submission(costos_info, sheet_name="COSTO")
+
+            st.success("Se ha generado el archivo de Costos.")
+            st.download_button(
+                label="Descargar Orden de Costos",
+                data=pdf_costos,
+                file_name=f"COSTOS_{st.session_state.get('no_solicitud', '')}_{st.session_state.get('commercial', '')}.pdf",
+                mime="application/pdf",
+                key="dl_costos"
+            )
+
+    _render_profit_fragmento(profit_area)
+
 
 def forms():
     st.subheader("Facturas")
@@ -12,9 +365,7 @@ def forms():
     if "client_new" in st.session_state:
         st.session_state["client"] = st.session_state.pop("client_new")
 
-    clientes_db = obtener_clientes()
-    clients_list = [c["cliente"] for c in clientes_db]
-    client_lookup = {c["cliente"]: c for c in clientes_db}
+    directorio = obtener_directorio_clientes()
 
     col1, col2 = st.columns(2)
 
@@ -87,7 +438,7 @@ def forms():
                                 c_type = selected_types[idx]
 
                                 qty_key   = f"qty_{c_type}"
-                                base_name = f"name_{c_type}"  
+                                names_key = f"containers_{c_type}"
 
                                 with cols[j]:
                                     # ---------- Cantidad ----------
@@ -95,21 +446,27 @@ def forms():
                                         f"Cantidad para {c_type}*", min_value=0, step=1,
                                         key=qty_key
                                     )
-                                    qty_int = int(qty)         
-
-                                    # ---------- Nombres ----------
-                                    names = []
-                                    for n in range(qty_int):    
-                                        name_key = f"{base_name}_{n}"
-                                        name = st.text_input(
-                                            f"Nombre {n+1} para {c_type}",
-                                            key=name_key
+                                    qty_int = int(qty)
+
+                                    # ---------- Números (un solo campo por tipo) ----------
+                                    names, invalid = parse_container_numbers(st.text_area(
+                                        f"Números de contenedor {c_type}",
+                                        key=names_key,
+                                        placeholder="Pega la lista: uno por línea o separados por comas",
+                                    ))
+                                    if names:
+                                        st.caption(f"{len(names)} contenedor(es) ingresado(s)")
+                                    if invalid:
+                                        st.warning(
+                                            f"Dígito de control o formato ISO 6346 inválido: {', '.join(invalid[:10])}"
+                                            + (f" y {len(invalid) - 10} más" if len(invalid) > 10 else "")
                                         )
-                                        names.append(name)
+                                    if len(names) > qty_int:
+                                        st.warning(f"Hay {len(names)} números para una cantidad de {qty_int}.")
 
                                 container_data[c_type] = {
                                     "qty": qty_int,
-                                    "names": names              
+                                    "names": names
                                 }
 
                 st.session_state["container_data"] = container_data
@@ -135,366 +492,81 @@ def forms():
 
         if "sales_blocks" not in st.session_state:
             st.session_state["sales_blocks"] = []
+        if "cost_surcharges" not in st.session_state or not isinstance(st.session_state["cost_surcharges"], list):
+            st.session_state["cost_surcharges"] = []
 
         def add_sales_block():
-            st.session_state["sales_blocks"].append({
-                "client": "",
-                "sales_surcharges": [],
-                "comments": ""
-            })
-
-        st.button("➕ Add Sale", key="add_sales_block", on_click=add_sales_block)
-
-        for block_index, block in enumerate(st.session_state["sales_blocks"]):
-            with st.expander(f"**Venta #{block_index + 1}**", expanded=True):
-
-                # --- Actualizar la selección si se agregó un cliente nuevo ---
-                if "client_new" in st.session_state:
-                    if st.session_state["client_new"] not in clients_list:
-                        clients_list.append(st.session_state["client_new"])
-                    block["client"] = st.session_state.pop("client_new")
-                else:
-                    block["client"] = block.get("client", " ")
-
-                # --- Selectbox principal ---
-                block["client"] = st.selectbox(
-                    "Selecciona el cliente*",
-                    [" "] + ["+ Add New"] + clients_list,
-                    index=([" "] + ["+ Add New"] + clients_list).index(block["client"])
-                        if block["client"] in ([" "] + ["+ Add New"] + clients_list) else 0,
-                    key=f"client_{block_index}"
-                )
-
-                # --- Cliente existente ---
-                if block["client"] in client_lookup:
-                    client_info = client_lookup[block["client"]]
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.text_input("Teléfono", value=client_info.get("telefono_contacto", ""), key=f"customer_phone_{block_index}")
-                    with col2:
-                        st.text_input("Dirección", value=client_info.get("direccion", ""), key=f"customer_address_{block_index}")
-                    with col3:
-                        st.selectbox(
-                            "País de Emisión",
-                            paises,
-                            index=paises.index(client_info.get("pais", "Colombia")) if client_info.get("pais", "Colombia") in paises else 0,
-                            key=f"customer_account_{block_index}"
-                        )
-                    col4, col5, col6 = st.columns(3)
-                    with col4:
-                        st.text_input("NIT", value=client_info.get("nit", ""), key=f"customer_nit_{block_index}")
-                    with col5:
-                        st.text_input("Contacto", key=f"customer_contact_{block_index}")
-                    with col6:
-                        st.text_input("Correo Electrónico", value=client_info.get("correo", ""), key=f"customer_email_{block_index}")
-
-                # --- Opción para agregar un nuevo cliente ---
-                elif block["client"] == "+ Add New":
-                    st.markdown("### **Nuevo Cliente**")
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        new_cliente = st.text_input("Nombre del Cliente*", key=f"new_cliente_{block_index}")
-                        new_telefono = st.text_input("Teléfono*", key=f"new_telefono_{block_index}")
-                    with col2:
-                        new_nit = st.text_input("NIT*", key=f"new_nit_{block_index}")
-                        new_correo = st.text_input("Correo Electrónico*", key=f"new_correo_{block_index}")
-                    with col3:
-                        new_direccion = st.text_input("Dirección*", key=f"new_direccion_{block_index}")
-                        new_pais = st.selectbox("País*", paises, key=f"new_pais_{block_index}")
-
-                    if st.button("💾 Guardar Cliente", key=f"save_new_client_{block_index}"):
-                        if new_cliente and new_nit and new_direccion and new_telefono and new_correo:
-                            # Insertar en la base de datos
-                            insertar_cliente(
-                                cliente=new_cliente,
-                                nit=new_nit,
-                                direccion=new_direccion,
-                                telefono_contacto=new_telefono,
-                                correo=new_correo,
-                                pais=new_pais
-                            )
-                            st.success(f"Cliente '{new_cliente}' agregado con éxito.")
-
-                            # Guardar datos en session_state para PDF y siguiente render
-                            st.session_state[f"customer_phone_{block_index}"] = new_telefono
-                            st.session_state[f"customer_address_{block_index}"] = new_direccion
-                            st.session_state[f"customer_account_{block_index}"] = new_pais
-                            st.session_state[f"customer_nit_{block_index}"] = new_nit
-                            st.session_state[f"customer_contact_{block_index}"] = ""
-                            st.session_state[f"customer_email_{block_index}"] = new_correo
-
-                            block["client"] = new_cliente 
-                            st.session_state["client_new"] = new_cliente
-                            st.rerun()
-                        else:
-                            st.warning("Por favor completa todos los campos obligatorios.")
-
-                # --- Recargos ---
-                if "sales_surcharges" not in block or not isinstance(block["sales_surcharges"], list):
-                    block["sales_surcharges"] = []
-
-                def add_block_surcharge(idx=block_index):
-                    st.session_state["sales_blocks"][idx]["sales_surcharges"].append(
-                        {"concept": "", "quantity": 0.0, "rate": 0.0, "total": 0.0, "currency": "USD"}
-                    )
-
-                for i, surcharge in enumerate(block["sales_surcharges"]):
-                    col1, col2, col3, col4, col5, col6 = st.columns([2.5, 0.5, 0.8, 0.8, 0.7, 0.5])
-                    with col1:
-                        surcharge["concept"] = st.text_input(f"Concept*", value=surcharge["concept"], key=f'sale_concept_{block_index}_{i}')
-                    with col2:
-                        surcharge["quantity"] = st.number_input(f"Quantity*", value=surcharge.get("quantity", 0.0), min_value=0.0, step=0.01, key=f'sale_quantity_{block_index}_{i}')
-                    with col3:
-                        surcharge["rate"] = st.number_input(f"Rate*", value=surcharge.get("rate", 0.0), min_value=0.0, step=0.01, key=f'sale_rate_{block_index}_{i}')
-                    with col4:
-                        computed_total = surcharge["rate"] * surcharge["quantity"]
-                        surcharge["total"] = computed_total
-                        st.markdown(f"**Total**")
-                        st.markdown(f"{computed_total:,.2f}")
-                    with col5:
-                        surcharge["currency"] = st.selectbox(
-                            f"Currency*", ['USD', 'COP', 'MXN'],
-                            index=['USD', 'COP', 'MXN'].index(surcharge["currency"]),
-                            key=f'sale_currency_{block_index}_{i}'
-                        )
-                    with col6:
-                        st.write(" ")
-                        st.write(" ")
-                        if st.button("❌", key=f'remove_sale_{block_index}_{i}'):
-                            block["sales_surcharges"].pop(i)
-                            st.rerun()
-
-                # --- Botón para agregar recargo dentro de esta venta ---
-                st.button("➕ Add Surcharge", key=f"add_sale_surcharge_{block_index}", on_click=lambda idx=block_index: add_block_surcharge(idx))
-
-                comment_value = st.text_area(
-                    "Comentarios de la Venta",
-                    block.get("comments", ""),
-                    key=f"final_comments_sale_{block_index}"
-                )
-                block["comments"] = comment_value 
-
-                # --- Totales por moneda para este bloque ---
-                sales_totals = {}
-                for surcharge in block["sales_surcharges"]:
-                    currency = surcharge["currency"]
-                    value = surcharge.get("total", 0.0)
-                    sales_totals[currency] = sales_totals.get(currency, 0.0) + value
-
-                for currency, amount in sales_totals.items():
-                    st.markdown(f"**Total {currency} (Venta #{block_index + 1})**: {amount:,.2f} {currency}")
-                
-                if st.button(f"📥 Descargar Venta #{block_index + 1}", key=f"download_sale_{block_index}"):
-                    venta_info = {
-                        "no_solicitud": st.session_state.get("no_solicitud", ""),
-                        "comercial": st.session_state.get("commercial", ""),
-                        "venta": {
-                            "cliente": block["client"],
-                            "customer_phone": st.session_state.get(f"customer_phone_{block_index}", ""),
-                            "customer_address": st.session_state.get(f"customer_address_{block_index}", ""),
-                            "customer_account": st.session_state.get(f"customer_account_{block_index}", ""),
-                            "customer_nit": st.session_state.get(f"customer_nit_{block_index}", ""),
-                            "customer_contact": st.session_state.get(f"customer_contact_{block_index}", ""),
-                            "customer_email": st.session_state.get(f"customer_email_{block_index}", ""),
-                            "sales_surcharges": block["sales_surcharges"]
-                        },
-                        "carga": {
-                            "bl_awb": st.session_state.get("bl_awb", ""),
-                            "pol_aol": st.session_state.get("pol_aol", ""),
-                            "pod_aod": st.session_state.get("pod_aod", ""),
-                            "shipper": st.session_state.get("shipper", ""),
-                            "consignee": st.session_state.get("consignee", ""),
-                            "reference": st.session_state.get("reference", ""),
-                            "cargo_type": st.session_state.get("cargo_type", ""),
-                            "container_details": st.session_state.get("container_data", {}),
-                            "unidad_medida": st.session_state.get("unidad_medida", ""),
-                            "cantidad_suelta": st.session_state.get("cantidad_suelta", 0),
-                        },
-                        "comentarios": block.get("comments", "") 
-                    }
-                    pdf_ventas = generate_archives(venta_info)
-
-                    save_order_submission(venta_info, sheet_name="VENTA")
-
-                    st.success(f"Se ha generado el archivo para Venta #{block_index + 1}.")
-                    with open(pdf_ventas, "rb") as f:
-                        st.download_button(
-                            label="Descargar Orden de Venta",
-                            data=f,                       
-                            file_name=f"ORDEN_{no_solicitud}_{commercial}.pdf",
-                            mime="application/pdf",
-                            key="dl_ventas"
-                        )
-
-        total_sales_totals = {}
-        for block in st.session_state.get("sales_blocks", []):
-            for surcharge in block["sales_surcharges"]:
-                currency = surcharge.get("currency", "USD")
-                value = surcharge.get("total", 0.0)
-                total_sales_totals[currency] = total_sales_totals.get(currency, 0.0) + value
-
-        with st.expander("**Costos**", expanded=True):
-            if "cost_surcharges" not in st.session_state or not isinstance(st.session_state["cost_surcharges"], list):
-                st.session_state["cost_surcharges"] = []
-
-            def remove_cost_surcharge(index):
-                if 0 <= index < len(st.session_state["cost_surcharges"]):
-                    st.session_state["cost_surcharges"].pop(index)
-
-            def add_cost_surcharge():
-                st.session_state["cost_surcharges"].append({"concept": "", "quantity": 0.0, "rate": 0.0 , "total": 0.0, "currency": "USD"})
-
-            for i, surcharge in enumerate(st.session_state["cost_surcharges"]):
-
-                col1, col2, col3, col4, col5, col6 = st.columns([2.5, 0.5, 0.8, 0.8, 0.7, 0.5])
-
-                with col1:
-                    surcharge["concept"] = st.text_input(f"Concept*", value=surcharge["concept"], key=f'cost_concept_{i}')
-
-                with col2:
-                    surcharge["quantity"] = st.number_input(f"Quantity*", value=surcharge["quantity"], min_value=0.0, step=0.01, key=f'cost_quantity_{i}')
-
-                with col3:
-                    surcharge["rate"] = st.number_input(f"Rate*", value=surcharge["rate"], min_value=0.0, step=0.01, key=f'cost_rate_{i}')
-
-                with col4:
-                    computed_total = surcharge["rate"] * surcharge["quantity"]
-                    surcharge["total"] = computed_total
-                    st.markdown(f"**Total**")
-                    st.markdown(f"{computed_total:,.2f}")
-
-                with col5:
-                    surcharge["currency"] = st.selectbox(
-                        f"Currency*", ['USD', 'COP', 'MXN'],
-                        index=['USD', 'COP', 'MXN'].index(surcharge["currency"]),
-                        key=f'cost_currency_{i}'
-                    )
-
-                with col6:
-                    st.write(" ")
-                    st.write(" ")
-                    if st.button("❌", key=f'remove_cost_{i}'):
-                        remove_cost_surcharge(i)
-                        st.rerun()
-
-            st.button("➕ Add Surcharge", key="add_cost_surcharge", on_click=add_cost_surcharge)
-
-            final_comments = st.text_area("Comentarios de Costos", key="final_comments_cost")
-
-            cost_totals = {}
-            for surcharge in st.session_state["cost_surcharges"]:
-                currency = surcharge["currency"]
-                value = surcharge.get("total", 0.0)
-                cost_totals[currency] = cost_totals.get(currency, 0.0) + value
-
-            for currency, amount in cost_totals.items():
-                st.markdown(f"**Total {currency}**: {amount:,.2f} {currency}")
-        
-            if st.button("📥 Descargar Costos", key="download_costos"):
-                costos_info = {
-                    "no_solicitud": st.session_state.get("no_solicitud", ""),
-                    "comercial": st.session_state.get("commercial", ""),
-                    "carga": {
-                        "bl_awb": st.session_state.get("bl_awb", ""),
-                        "pol_aol": st.session_state.get("pol_aol", ""),
-                        "pod_aod": st.session_state.get("pod_aod", ""),
-                        "shipper": st.session_state.get("shipper", ""),
-                        "consignee": st.session_state.get("consignee", ""),
-                        "reference": st.session_state.get("reference", ""),
-                        "cargo_type": st.session_state.get("cargo_type", ""),
-                        "container_details": st.session_state.get("container_data", {}),
-                        "unidad_medida": st.session_state.get("unidad_medida", ""),
-                        "cantidad_suelta": st.session_state.get("cantidad_suelta", 0),
-                    },
-                    "cost_surcharges": st.session_state.get("cost_surcharges", []),
-                    "comentarios": st.session_state.get("final_comments_cost", ""),
-
-                }
-
-                pdf_costos = generate_archives(costos_info, variant="costos")
-
-                save_order_submission(costos_info, sheet_name="COSTO")
-
-                st.success("Se ha generado el archivo de Costos.")
-                with open(pdf_costos, "rb") as f:
-                    st.download_button(
-                        label="Descargar Orden de Costos",
-                        data=f,
-                        file_name=f"COSTOS_{st.session_state.get('no_solicitud', '')}_{commercial}.pdf",
-                        mime="application/pdf",
-                        key="dl_costos"
-                    )
-
-        # --- Profit Global ---
-        profit_totals = {}
-        all_currencies = set(total_sales_totals) | set(cost_totals)
-        for currency in all_currencies:
-            sales_amount = total_sales_totals.get(currency, 0.0)
-            cost_amount = cost_totals.get(currency, 0.0)
-            profit_totals[currency] = sales_amount - cost_amount
-
-        st.markdown("### **Profit de la Operación:**")
-        for currency, amount in profit_totals.items():
-            st.markdown(f"**Profit {currency}**: {amount:,.2f} {currency}")
+            st.session_state["sales_blocks"].append(SaleBlock())
+
+        # Los bloques de venta y el editor de costos son fragmentos: editar un
+        # recargo solo vuelve a ejecutar su propio bloque. El profit se dibuja
+        # en un placeholder: una vez al final de la ejecución completa, y en
+        # las ejecuciones de un solo fragmento, al terminar ese fragmento.
+        sales_area = st.container()
+        costs_area = st.container()
+        profit_area = st.empty()
+        st.session_state["sale_totals"] = {}
+
+        st.session_state["profit_diferido"] = True
+        try:
+            with sales_area:
+                st.button("➕ Add Sale", key="add_sales_block", on_click=add_sales_block)
+                for block_index in range(len(st.session_state["sales_blocks"])):
+                    _sale_block(block_index, directorio, paises, profit_area)
+
+            with costs_area:
+                _cost_editor(profit_area)
+        finally:
+            st.session_state["profit_diferido"] = False
+
+        _render_profit(profit_area)
 
         col1, col2 = st.columns(2)
 
         with col1:
 
             if st.button("💾 Guardar Orden"):
-                operacion_data = {
-                    "no_solicitud": no_solicitud,
-                    "comercial": commercial
-                }
-
-                carga_data = {
-                    "bl_awb": bl_awb,
-                    "tipo_carga": cargo_type,
-                    "pol_aol": pol_aol,
-                    "pod_aod": pod_aod,
-                    "shipper": shipper,
-                    "consignee": consignee,
-                    "detalle": container_data if cargo_type == "Contenedor" else None,
-                    "unidad_medida": unidad_medida if cargo_type != "Contenedor" else None,
-                    "cantidad_suelta": cant_suelta if cargo_type != "Contenedor" else None,
-                    "referencia": reference
-                }
-
-                # --- Nuevo armado de ventas_data ---
-                ventas_data = []
-                for block in st.session_state.get("sales_blocks", []):
-                    venta_master = {
-                        "cliente": block["client"],
-                        "moneda": block["sales_surcharges"][0]["currency"] if block["sales_surcharges"] else "USD",
-                        "comentarios": block.get("comments", ""),
-                        "detalles": []
-                    }
-                    for surcharge in block["sales_surcharges"]:
-                        venta_master["detalles"].append({
-                            "concepto": surcharge["concept"],
-                            "cantidad": surcharge["quantity"],
-                            "tarifa": surcharge["rate"],
-                            "monto": surcharge["total"],
-                            "moneda": surcharge["currency"]
-                        })
-                    ventas_data.append(venta_master)
-
-                costos_data = [
-                    {
-                        "concepto": c["concept"],
-                        "cantidad": c["quantity"],
-                        "tarifa": c["rate"],
-                        "monto": c["total"],
-                        "moneda": c["currency"],
-                        "comentarios": st.session_state.get("final_comments_cost", "")
-                    }
-                    for c in st.session_state.get("cost_surcharges", [])
-                ]
-
-                guardar_operacion_completa(operacion_data, carga_data, ventas_data, costos_data)
-                st.success("✅ Orden guardada con éxito.")
+                operacion = Operation.from_session(st.session_state)
+                try:
+                    ids = guardar_operacion_completa(*operacion.to_db())
+                except RuntimeError as e:
+                    st.error(f"❌ {e}")
+                else:
+                    operacion.register_ids(ids)
+                    st.success("✅ Orden guardada con éxito.")
             
             with col2:
+                if st.button("📦 Descargar Todas las Órdenes", key="download_all"):
+                    jobs = []
+                    submissions = []
+                    for block_index, block in enumerate(st.session_state.get("sales_blocks", [])):
+                        venta_info = _venta_info(block_index, block)
+                        jobs.append((f"ORDEN_{no_solicitud}_{block_index + 1}_{block.client}.pdf", venta_info, "ventas"))
+                        submissions.append((venta_info, "VENTA"))
+
+                    if st.session_state.get("cost_surcharges"):
+                        costos_info = _costos_info()
+                        jobs.append((f"COSTOS_{no_solicitud}_{commercial}.pdf", costos_info, "costos"))
+                        submissions.append((costos_info, "COSTO"))
+
+                    if jobs:
+                        from services.pdf_generator.generate_preorden import generate_all_archives
+                        from services.sheets_writer import save_order_submissions
+
+                        zip_bytes = generate_all_archives(jobs)
+                        save_order_submissions(submissions)
+
+                        st.success(f"Se generaron {len(jobs)} órdenes.")
+                        st.download_button(
+                            label="Descargar ZIP",
+                            data=zip_bytes,
+                            file_name=f"ORDENES_{no_solicitud}.zip",
+                            mime="application/zip",
+                            key="dl_all"
+                        )
+                    else:
+                        st.warning("No hay ventas ni costos para generar.")
+
                 if st.button("🧹 Limpiar Formulario"):
                     for key in list(st.session_state.keys()):
                         del st.session_state[key]
@@ -1,3 +1,6 @@
+-- Esquema base. Los cambios posteriores viven en database/migrations/ y se
+-- aplican con `python -m database.migrate` (o automáticamente al iniciar la app).
+
 CREATE TABLE IF NOT EXISTS operaciones (
     id_operacion SERIAL PRIMARY KEY,
     no_solicitud VARCHAR(50) UNIQUE NOT NULL,   -- Identificador único del caso
@@ -0,0 +1,214 @@
+import functools
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+# ----------------------------------------------------------------------
+# Métricas de latencia en proceso
+#
+# `timed` (decorador o context manager) mide las rutas calientes: CRUD,
+# llamadas a Google Sheets y etapas de los PDF. Por cada nombre se guardan
+# llamadas, errores, suma y un histograma de buckets fijos; registrar una
+# medición es un perf_counter y un incremento bajo lock (~1 µs). Se exponen
+# en la página de métricas (solo administradores) y en formato de texto de
+# Prometheus, que se puede volcar a un archivo para que lo lea un
+# node_exporter (textfile collector) o similar.
+# ----------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores de los buckets, en segundos
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+DUMP_INTERVAL_S = 60
+
+
+class _Serie:
+    __slots__ = ("count", "errors", "total_s", "max_s", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)  # el último es +Inf
+
+
+_series = {}
+_lock = threading.Lock()
+
+
+def observe(name: str, seconds: float, error: bool = False):
+    """
+    Registra una medición de `seconds` para `name`.
+    """
+    with _lock:
+        serie = _series.get(name)
+        if serie is None:
+            serie = _series[name] = _Serie()
+        serie.count += 1
+        serie.total_s += seconds
+        if seconds > serie.max_s:
+            serie.max_s = seconds
+        if error:
+            serie.errors += 1
+        serie.buckets[bisect_left(BUCKETS, seconds)] += 1
+
+
+class timed:
+    """
+    Mide la duración de un bloque o de una función:
+
+        with timed("pdf.merge"):
+            ...
+
+        @timed("db.obtener_operacion_completa")
+        def obtener_operacion_completa(...):
+            ...
+
+    Las excepciones se cuentan como error y se propagan.
+    """
+
+    __slots__ = ("name", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self._start, exc_type is not None)
+        return False
+
+    def __call__(self, fn):
+        name = self.name
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                observe(name, time.perf_counter() - start, True)
+                raise
+            observe(name, time.perf_counter() - start)
+            return result
+
+        return wrapper
+
+
+def snapshot() -> dict:
+    """
+    Copia de las métricas: {nombre: {count, errors, total_s, avg_ms, max_ms,
+    p50_ms, p95_ms, p99_ms, buckets}}. Los percentiles se estiman con el
+    límite superior del bucket que los contiene.
+    """
+    with _lock:
+        series = {name: (s.count, s.errors, s.total_s, s.max_s, list(s.buckets)) for name, s in _series.items()}
+
+    result = {}
+    for name, (count, errors, total_s, max_s, buckets) in sorted(series.items()):
+        result[name] = {
+            "count": count,
+            "errors": errors,
+            "total_s": total_s,
+            "avg_ms": total_s / count * 1000 if count else 0.0,
+            "max_ms": max_s * 1000,
+            "p50_ms": _percentile(buckets, count, 0.50, max_s) * 1000,
+            "p95_ms": _percentile(buckets, count, 0.95, max_s) * 1000,
+            "p99_ms": _percentile(buckets, count, 0.99, max_s) * 1000,
+            "buckets": buckets,
+        }
+    return result
+
+
+def _percentile(buckets, count, q, max_s):
+    if not count:
+        return 0.0
+    target = q * count
+    acumulado = 0
+    for i, n in enumerate(buckets):
+        acumulado += n
+        if acumulado >= target:
+            return min(BUCKETS[i], max_s) if i < len(BUCKETS) else max_s
+    return max_s
+
+
+def reset():
+    with _lock:
+        _series.clear()
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def prometheus_text(extra_gauges: dict = None) -> str:
+    """
+    Métricas en formato de texto de Prometheus. `extra_gauges` agrega gauges
+    sueltos ({nombre: valor}), p. ej. el estado del pool de conexiones.
+    """
+    lines = [
+        "# HELP orders_operation_seconds Latencia de operaciones instrumentadas.",
+        "# TYPE orders_operation_seconds histogram",
+    ]
+    errors = [
+        "# HELP orders_operation_errors_total Operaciones que terminaron en excepción.",
+        "# TYPE orders_operation_errors_total counter",
+    ]
+    for name, m in snapshot().items():
+        op = _label(name)
+        acumulado = 0
+        for limit, n in zip(BUCKETS, m["buckets"]):
+            acumulado += n
+            lines.append(f'orders_operation_seconds_bucket{{operation="{op}",le="{limit}"}} {acumulado}')
+        lines.append(f'orders_operation_seconds_bucket{{operation="{op}",le="+Inf"}} {m["count"]}')
+        lines.append(f'orders_operation_seconds_sum{{operation="{op}"}} {m["total_s"]:.6f}')
+        lines.append(f'orders_operation_seconds_count{{operation="{op}"}} {m["count"]}')
+        errors.append(f'orders_operation_errors_total{{operation="{op}"}} {m["errors"]}')
+
+    gauges = []
+    for name, value in (extra_gauges or {}).items():
+        gauges.append(f"# TYPE {name} gauge")
+        gauges.append(f"{name} {value}")
+
+    return "\n".join(lines + errors + gauges) + "\n"
+
+
+def dump_to_file(path: str, extra_gauges: dict = None):
+    """
+    Escribe las métricas en `path` de forma atómica (archivo temporal + rename).
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(prometheus_text(extra_gauges))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def start_file_dump(path: str, gauges=None, interval: float = DUMP_INTERVAL_S):
+    """
+    Inicia un hilo que vuelca las métricas a `path` cada `interval` segundos.
+    `gauges` es una función opcional que devuelve gauges adicionales.
+    """
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                dump_to_file(path, gauges() if gauges else None)
+            except Exception:
+                logger.exception("No se pudieron volcar las métricas a %s", path)
+
+    worker = threading.Thread(target=run, name="metrics-dump", daemon=True)
+    worker.start()
+    return worker
@@ -1,12 +1,11 @@
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
-import PyPDF2
 from reportlab.platypus import Table, TableStyle
-from reportlab.pdfbase.ttfonts import TTFont
-import os
-from reportlab.pdfbase import pdfmetrics
 from datetime import datetime
+from io import BytesIO
 from ui.helpers import user_data
+from services.pdf_generator.resources import get_template, register_fonts, save_canvas
+from services.metrics import timed
 from reportlab.pdfbase.pdfmetrics import stringWidth
 
 def wrapped_draw_string(c, text, x, y, fontName, fontSize, max_width, leading=12):
@@ -28,22 +27,9 @@ def wrapped_draw_string(c, text, x, y, fontName, fontSize, max_width, leading=12
 
     return y_offset
 
-font_path = "resources/fonts/OpenSauceSans-Regular.ttf"
-font_bold = "resources/fonts/OpenSauceSans-Bold.ttf"
-
-if os.path.exists(font_path):
-    pdfmetrics.registerFont(TTFont("OpenSauce", font_path))
-else:
-    print("⚠️ Advertencia: La fuente 'Open Sauce' no se encontró. Se usará 'Helvetica' como alternativa.")
-
-if os.path.exists(font_bold):
-    pdfmetrics.registerFont(TTFont("OpenSauceBold", font_bold))
-else:
-    print("⚠️ Advertencia: La fuente 'Open Sauce Bold' no se encontró. Se usará 'Helvetica' como alternativa.")
-
-
 def create_overlay(data, overlay_path):
 
+    register_fonts()
     commercial_data = user_data(data.get('commercial'))
 
     c = canvas.Canvas(overlay_path, pagesize=letter)
@@ -116,7 +102,6 @@ def create_overlay(data, overlay_path):
         c.drawString(350, 546, f"Referencia de cliente: {reference}")
 
     table_data = []
-    total_cost_by_currency = {}
 
     # Procesar los additional_surcharges por tipo de contenedor
     for container, surcharges in data.get("additional_surcharges", {}).items():
@@ -124,8 +109,6 @@ def create_overlay(data, overlay_path):
             cost = additional.get("cost", 0)
             currency = additional.get("currency", "USD")
 
-            total_cost_by_currency[currency] = total_cost_by_currency.get(currency, 0) + cost
-
             row = [
                 additional.get("concept", ""),  # Concepto
                 currency,                       # Moneda
@@ -185,24 +168,20 @@ def create_overlay(data, overlay_path):
         )
         y_position_offset += 10
 
-    c.save()
-
-def merge_pdfs(template_path, overlay_path, output_path):
-    template_pdf = PyPDF2.PdfReader(template_path)
-    overlay_pdf = PyPDF2.PdfReader(overlay_path)
-    output = PyPDF2.PdfWriter()
-
-    for page_number in range(len(template_pdf.pages)):
-        template_page = template_pdf.pages[page_number]
-        if page_number < len(overlay_pdf.pages):
-            overlay_page = overlay_pdf.pages[page_number]
-            template_page.merge_page(overlay_page)
-        output.add_page(template_page)
-
-    with open(output_path, "wb") as f_out:
-        output.write(f_out)
-
-def generate_pdf(data, template_path="resources/templates/Solicitud Anticipo-2.pdf", output_path="resources/output/Solicitud de Anticipo.pdf", overlay_path="resources/templates/overlay.pdf"):
-    create_overlay(data, overlay_path)
-    merge_pdfs(template_path, overlay_path, output_path)
-    return output_path
\ No newline at end of file
+    save_canvas(c)
+
+def merge_pdfs(template_path, overlay_path, output_path=None):
+    return get_template(template_path).merge(overlay_path, output_path)
+
+@timed("pdf.generate_anticipo")
+def generate_pdf(data, template_path="resources/templates/Solicitud Anticipo-2.pdf", output_path=None):
+    """
+    Genera la solicitud de anticipo en memoria, sin archivos compartidos entre
+    usuarios. Devuelve bytes, o escribe de forma atómica en `output_path` si
+    se indica y devuelve la ruta.
+    """
+    overlay = BytesIO()
+    create_overlay(data, overlay)
+    overlay.seek(0)
+    result = merge_pdfs(template_path, overlay, output_path)
+    return output_path if output_path else result
@@ -1,16 +1,24 @@
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
-import PyPDF2
 from reportlab.platypus import Table, TableStyle
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.pdfmetrics import stringWidth
 from datetime import datetime
+from io import BytesIO
+import logging
+import multiprocessing
 import os
+import re
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 from textwrap import wrap
-from collections import defaultdict
-from decimal import Decimal, ROUND_HALF_UP
 from ui.helpers import prepare_venta_data
+from services.pricing import summarize
+from services.metrics import timed
+from services.pdf_generator.resources import FONT_BOLD, FONT_REGULAR, get_template, register_fonts, save_canvas, warm_up
+
+logger = logging.getLogger(__name__)
 
 # ----------------------------------------------------------------------
 # Utilidad para “wrappear” texto
@@ -34,29 +42,37 @@ def draw_wrapped_string(c, x, y, text, max_chars, line_height=7):
     for i, line in enumerate(lines):
         c.drawString(x, y - i * line_height, line)
 
-# ----------------------------------------------------------------------
-# Registro de fuentes (sobrescribe las advertencias originales)
-# ----------------------------------------------------------------------
-FONT_REGULAR = "OpenSauce"
-FONT_BOLD    = "OpenSauceBold"
-
-def _register_fonts():
-    font_path = "resources/fonts/OpenSauceSans-Regular.ttf"
-    font_bold = "resources/fonts/OpenSauceSans-Bold.ttf"
-    if os.path.exists(font_path):
-        pdfmetrics.registerFont(TTFont(FONT_REGULAR, font_path))
-    if os.path.exists(font_bold):
-        pdfmetrics.registerFont(TTFont(FONT_BOLD,   font_bold))
-
-_register_fonts()
-
 # ----------------------------------------------------------------------
 # Capa de datos (overlay)
 # ----------------------------------------------------------------------
 
-def create_overlay(data: dict, overlay_path: str, surcharge_key: str = "sales_surcharges", page: int = 1, apply_markup: bool = False):
+def create_overlay(data: dict, overlay_path, surcharge_key: str = "sales_surcharges", page: int = 1, apply_markup: bool = False):
+    """
+    Dibuja una sola página de overlay en `overlay_path` (ruta o archivo en memoria).
+    """
+    register_fonts()
     c = canvas.Canvas(overlay_path, pagesize=letter)
-
+    draw_overlay_page(c, data, surcharge_key, page, apply_markup)
+    save_canvas(c)
+
+
+@timed("pdf.render_overlay")
+def render_overlay(data: dict, surcharge_key: str = "sales_surcharges", pages: int = 1, apply_markup: bool = False) -> BytesIO:
+    """
+    Dibuja todas las páginas del overlay en un solo canvas y lo devuelve en memoria.
+    """
+    register_fonts()
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    for page in range(1, pages + 1):
+        draw_overlay_page(c, data, surcharge_key, page, apply_markup)
+        c.showPage()
+    save_canvas(c)
+    buffer.seek(0)
+    return buffer
+
+
+def draw_overlay_page(c, data: dict, surcharge_key: str = "sales_surcharges", page: int = 1, apply_markup: bool = False):
     surcharges = data.get(surcharge_key, [])
     is_last_page = False
 
@@ -237,14 +253,9 @@ def create_overlay(data: dict, overlay_path: str, surcharge_key: str = "sales_su
         is_last_page = True
 
     if is_last_page:
-        totales = defaultdict(Decimal)
-        for s in surcharges:
-            currency = s.get("currency", "").upper()
-            base_total = Decimal(s.get("total", 0))
-            if apply_markup:
-                base_total *= Decimal("1.04")  # Aplica 4% si es costos
-            total = base_total.quantize(Decimal("0.01"), ROUND_HALF_UP)
-            totales[currency] += total
+        # Costos: markup de services/pricing.COST_MARKUP por línea
+        summary = summarize(surcharges)
+        totales = summary.marked_up_totals if apply_markup else summary.totals
 
         x_label, x_value, y_start, line_height = 450, 510, 210, 13
         c.setFont(FONT_BOLD, 8)
@@ -260,24 +271,17 @@ def create_overlay(data: dict, overlay_path: str, surcharge_key: str = "sales_su
         for i, line in enumerate(wrap(comments, max_chars)):
             c.drawString(x_comments, y_comments - i * comments_height, line)
 
-    c.save()
-
 # ----------------------------------------------------------------------
 # Combinar plantilla + overlay
 # ----------------------------------------------------------------------
 
-def merge_pdfs(template_path, overlay_path, output_path):
-    template_pdf = PyPDF2.PdfReader(template_path)
-    overlay_pdf = PyPDF2.PdfReader(overlay_path)
-    writer = PyPDF2.PdfWriter()
-
-    for idx, template_page in enumerate(template_pdf.pages):
-        if idx < len(overlay_pdf.pages):
-            template_page.merge_page(overlay_pdf.pages[idx])
-        writer.add_page(template_page)
-
-    with open(output_path, "wb") as f_out:
-        writer.write(f_out)
+def merge_pdfs(template_path, overlay_path, output_path=None):
+    """
+    Combina la plantilla con el overlay (ruta o archivo en memoria). Si no se
+    indica `output_path` devuelve el PDF resultante como bytes.
+    La plantilla sale del registro, así que solo se parsea el overlay.
+    """
+    return get_template(template_path).merge(overlay_path, output_path)
 
 # ----------------------------------------------------------------------
 # Función pública que genera el PDF
@@ -285,20 +289,24 @@ def merge_pdfs(template_path, overlay_path, output_path):
 def generate_pdf(
     quotation_data: dict,
     template_path="resources/templates/PRE ORDEN COSTOS 1.pdf",
-    output_path="resources/output/pre_orden_ventas.pdf",
-    overlay_path="resources/templates/overlay.pdf",
+    output_path=None,
 ):
-    create_overlay(quotation_data, overlay_path)
-    merge_pdfs(template_path, overlay_path, output_path)
-    return output_path
-
-def generate_archives(venta_info: dict, variant: str = "ventas"):
+    """
+    Genera el PDF en memoria. Devuelve bytes, o escribe de forma atómica en
+    `output_path` si se indica y devuelve la ruta.
+    """
+    overlay = render_overlay(quotation_data)
+    result = merge_pdfs(template_path, overlay, output_path)
+    return output_path if output_path else result
+
+@timed("pdf.generate_archives")
+def generate_archives(venta_info: dict, variant: str = "ventas") -> bytes:
+    """
+    Genera la orden de venta o de costos y devuelve el PDF como bytes.
+    Todo el proceso (overlay y combinación con la plantilla) ocurre en memoria.
+    """
     data = prepare_venta_data(venta_info)
 
-    surcharge_key = "sales_surcharges" if variant == "ventas" else "cost_surcharges"
-    num_surcharges = len(data.get(surcharge_key, []))
-    template_version = "short" if num_surcharges <= 10 else "long"
-
     config = {
         "ventas": {
             "surcharge_key": "sales_surcharges",
@@ -306,7 +314,6 @@ def generate_archives(venta_info: dict, variant: str = "ventas"):
                 "short": "resources/templates/ORDER1.pdf",
                 "long": "resources/templates/ORDER2.pdf",
             },
-            "output": "resources/output/pre_orden_ventas.pdf",
         },
         "costos": {
             "surcharge_key": "cost_surcharges",
@@ -314,7 +321,6 @@ def generate_archives(venta_info: dict, variant: str = "ventas"):
                 "short": "resources/templates/PRE_ORDER1.pdf",
                 "long": "resources/templates/PRE_ORDER2.pdf",
             },
-            "output": "resources/output/pre_orden_costos.pdf",
         },
     }
 
@@ -322,26 +328,95 @@ def generate_archives(venta_info: dict, variant: str = "ventas"):
         raise ValueError(f"Variant desconocida: {variant}")
 
     cfg = config[variant]
+    num_surcharges = len(data.get(cfg["surcharge_key"], []))
+    template_version = "short" if num_surcharges <= 10 else "long"
     selected_template = cfg["template"][template_version]
 
     pages_needed = 1 if template_version == "short" else 2
-    overlay_paths = []
-
-    for page in range(1, pages_needed + 1):
-        overlay_path = f"resources/temp/overlay_{variant}_page{page}.pdf"
-        os.makedirs(os.path.dirname(overlay_path), exist_ok=True)
-        create_overlay(data, overlay_path, cfg["surcharge_key"], page, apply_markup=(variant == "costos"))
-        overlay_paths.append(overlay_path)
-
-    # Combina todas las páginas
-    combined_overlay_path = f"resources/temp/combined_overlay_{variant}.pdf"
-    overlay_writer = PyPDF2.PdfWriter()
-    for path in overlay_paths:
-        overlay_pdf = PyPDF2.PdfReader(path)
-        overlay_writer.add_page(overlay_pdf.pages[0])
-    with open(combined_overlay_path, "wb") as f_out:
-        overlay_writer.write(f_out)
-
-    merge_pdfs(selected_template, combined_overlay_path, cfg["output"])
-
-    return cfg["output"]
+    overlay = render_overlay(data, cfg["surcharge_key"], pages_needed, apply_markup=(variant == "costos"))
+
+    return merge_pdfs(selected_template, overlay)
+
+
+# ----------------------------------------------------------------------
+# Generación en lote (todas las órdenes de una operación)
+# ----------------------------------------------------------------------
+# Tiempo máximo para recibir todas las órdenes del pool antes de generarlas en serie
+GENERATION_TIMEOUT_S = 60
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """
+    Pool de procesos compartido por la app; se crea la primera vez que se usa.
+
+    Los procesos se crean con "spawn": un fork del servidor de Streamlit
+    (multihilo) heredaría locks tomados por otros hilos (métricas, registro de
+    plantillas) y el proceso hijo podría quedar bloqueado para siempre.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=warm_up,
+            )
+        return _executor
+
+
+def _discard_executor(executor):
+    """
+    Descarta un pool roto o bloqueado; el siguiente lote crea uno nuevo.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _render_job(job):
+    file_name, venta_info, variant = job
+    return file_name, generate_archives(venta_info, variant)
+
+
+_UNSAFE_NAME_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def _zip_entry_name(file_name: str) -> str:
+    """
+    Nombre de entrada del ZIP sin separadores de ruta ni caracteres de
+    control: el nombre del cliente llega tal cual del formulario y un "/" o
+    "\\" dejaría el PDF fuera de la carpeta al descomprimir.
+    """
+    return _UNSAFE_NAME_CHARS.sub("_", file_name).lstrip(". ") or "_"
+
+
+@timed("pdf.generate_all_archives")
+def generate_all_archives(jobs: list) -> bytes:
+    """
+    Genera varias órdenes en paralelo y las devuelve empaquetadas en un ZIP.
+    `jobs` es una lista de (nombre_archivo, venta_info, variant). Si el pool
+    de procesos falla o no responde en GENERATION_TIMEOUT_S se generan en
+    serie.
+    """
+    results = None
+    if len(jobs) > 1:
+        executor = _get_executor()
+        try:
+            results = list(executor.map(_render_job, jobs, timeout=GENERATION_TIMEOUT_S))
+        except (BrokenProcessPool, FuturesTimeoutError) as e:
+            logger.warning("Pool de generación PDF no disponible (%r); se genera en serie.", e)
+            _discard_executor(executor)
+
+    if results is None:
+        results = [_render_job(job) for job in jobs]
+
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for file_name, pdf_bytes in results:
+            zf.writestr(_zip_entry_name(file_name), pdf_bytes)
+    return buffer.getvalue()
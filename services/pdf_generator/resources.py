@@ -0,0 +1,259 @@
+import logging
+import os
+import tempfile
+import threading
+from io import BytesIO
+from services.metrics import timed
+
+# ----------------------------------------------------------------------
+# Registro de recursos de los generadores PDF
+#
+# Fuentes, plantillas e imágenes se cargan una sola vez por proceso y se
+# comparten entre generate_preorden y generate_anticipo. Las rutas se
+# resuelven contra la raíz del proyecto, así que no dependen del directorio
+# de trabajo. reportlab y PyPDF2 se importan al primer uso.
+# ----------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FONT_REGULAR = "OpenSauce"
+FONT_BOLD = "OpenSauceBold"
+
+FONTS = {
+    FONT_REGULAR: "resources/fonts/OpenSauceSans-Regular.ttf",
+    FONT_BOLD: "resources/fonts/OpenSauceSans-Bold.ttf",
+}
+
+# Plantillas que se precargan en warm_up()
+TEMPLATES = [
+    "resources/templates/ORDER1.pdf",
+    "resources/templates/ORDER2.pdf",
+    "resources/templates/PRE_ORDER1.pdf",
+    "resources/templates/PRE_ORDER2.pdf",
+    "resources/templates/Solicitud Anticipo-2.pdf",
+]
+
+
+def resource_path(path: str) -> str:
+    """
+    Ruta absoluta de un recurso; las rutas relativas son relativas a la raíz
+    del proyecto.
+    """
+    if os.path.isabs(path):
+        return path
+    return os.path.join(PROJECT_ROOT, path)
+
+
+# ----------------------------------------------------------------------
+# Fuentes
+# ----------------------------------------------------------------------
+_fonts_registered = False
+_fonts_lock = threading.Lock()
+
+
+def register_fonts():
+    """
+    Registra las fuentes TTF en reportlab una sola vez por proceso.
+    """
+    global _fonts_registered
+    if _fonts_registered:
+        return
+
+    with _fonts_lock:
+        if _fonts_registered:
+            return
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        for name, path in FONTS.items():
+            path = resource_path(path)
+            if os.path.exists(path):
+                pdfmetrics.registerFont(TTFont(name, path))
+            else:
+                logger.warning("No se encontró la fuente '%s' (%s).", name, path)
+        _fonts_registered = True
+
+
+# reportlab arma el subconjunto de cada fuente TTF al guardar el canvas y lo
+# lee del archivo de la fuente con una posición compartida por todo el
+# proceso: dos hilos guardando a la vez leen glifos equivocados.
+_save_lock = threading.Lock()
+
+
+def save_canvas(c):
+    """
+    Guarda un canvas de reportlab que usa las fuentes registradas.
+    """
+    with _save_lock:
+        c.save()
+
+
+# ----------------------------------------------------------------------
+# Plantillas
+#
+# Cada plantilla se lee y se parsea una sola vez por proceso. Las páginas
+# parseadas nunca se modifican: cada combinación copia la página de la
+# plantilla en un PdfWriter nuevo y le estampa el overlay como un Form
+# XObject. El contenido de la plantilla se copia tal cual, sin interpretarlo
+# (page.merge_page volvería a serializarlo y parsearlo en cada generación).
+# Si el archivo cambia en disco (mtime distinto) se vuelve a cargar.
+# ----------------------------------------------------------------------
+
+
+class PdfTemplate:
+    def __init__(self, path: str, mtime: float):
+        import PyPDF2
+
+        self.path = path
+        self.mtime = mtime
+        with open(path, "rb") as f:
+            self.raw = f.read()
+        self.reader = PyPDF2.PdfReader(BytesIO(self.raw))
+        self.pages = list(self.reader.pages)
+        # El lector comparte un único stream; se serializa su uso
+        self.lock = threading.Lock()
+
+    @timed("pdf.merge")
+    def merge(self, overlay, output_path=None):
+        """
+        Combina la plantilla con `overlay` (ruta o archivo en memoria). Si no se
+        indica `output_path` devuelve el PDF resultante como bytes.
+        """
+        import PyPDF2
+
+        overlay_pdf = PyPDF2.PdfReader(overlay)
+        writer = PyPDF2.PdfWriter()
+        buffer = BytesIO()
+
+        with self.lock:
+            for idx, template_page in enumerate(self.pages):
+                page = writer.add_page(template_page)
+                if idx < len(overlay_pdf.pages):
+                    _stamp(writer, page, overlay_pdf.pages[idx])
+            writer.write(buffer)
+
+        if output_path is None:
+            return buffer.getvalue()
+
+        write_atomic(output_path, buffer.getvalue())
+
+
+def _stream(writer, data: bytes, **entries):
+    from PyPDF2.generic import DecodedStreamObject, NameObject
+
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    for key, value in entries.items():
+        stream[NameObject(f"/{key}")] = value
+    return writer._add_object(stream)
+
+
+def _stamp(writer, page, overlay_page):
+    """
+    Dibuja `overlay_page` encima de `page` (ya copiada en `writer`): el
+    overlay pasa a ser un Form XObject con sus propios recursos, así que sus
+    nombres de fuentes no chocan con los de la plantilla.
+    """
+    from PyPDF2.generic import ArrayObject, DictionaryObject, NameObject
+
+    contents = overlay_page["/Contents"].get_object()
+    if isinstance(contents, ArrayObject):
+        data = b"\n".join(part.get_object().get_data() for part in contents)
+    else:
+        data = contents.get_data()
+    form = _stream(
+        writer, data,
+        Type=NameObject("/XObject"),
+        Subtype=NameObject("/Form"),
+        BBox=overlay_page.trimbox,
+        Resources=overlay_page["/Resources"].clone(writer),
+    )
+
+    # Copias superficiales: los recursos de la plantilla pueden ser
+    # compartidos por varias páginas
+    resources = DictionaryObject(page["/Resources"].get_object())
+    xobjects = DictionaryObject(resources.get("/XObject", DictionaryObject()).get_object())
+    xobjects[NameObject("/PreOrdenOverlay")] = form
+    resources[NameObject("/XObject")] = xobjects
+    page[NameObject("/Resources")] = resources
+
+    template_contents = page["/Contents"].get_object() if "/Contents" in page else ArrayObject()
+    if not isinstance(template_contents, ArrayObject):
+        template_contents = ArrayObject([page["/Contents"]])
+    page[NameObject("/Contents")] = ArrayObject([
+        _stream(writer, b"q\n"),
+        *template_contents,
+        _stream(writer, b"\nQ q /PreOrdenOverlay Do Q\n"),
+    ])
+
+
+def write_atomic(path: str, content: bytes):
+    """
+    Escribe `content` en un archivo temporal único del mismo directorio y lo
+    renombra sobre `path`, para que generaciones concurrentes nunca dejen un
+    archivo a medio escribir.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f_out:
+            f_out.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_template(path: str) -> PdfTemplate:
+    """
+    Devuelve la plantilla parseada de `path`, cargándola si es la primera vez
+    o si el archivo cambió desde la última carga.
+    """
+    path = resource_path(path)
+    mtime = os.path.getmtime(path)
+    with _templates_lock:
+        template = _templates.get(path)
+        if template is None or template.mtime != mtime:
+            with timed("pdf.load_template"):
+                template = PdfTemplate(path, mtime)
+            _templates[path] = template
+        return template
+
+
+# ----------------------------------------------------------------------
+# Imágenes
+# ----------------------------------------------------------------------
+_images = {}
+_images_lock = threading.Lock()
+
+
+def get_image(path: str) -> bytes:
+    """
+    Contenido de una imagen de resources/, leído una sola vez por proceso.
+    """
+    path = resource_path(path)
+    with _images_lock:
+        if path not in _images:
+            with open(path, "rb") as f:
+                _images[path] = f.read()
+        return _images[path]
+
+
+def warm_up():
+    """
+    Carga por adelantado fuentes y plantillas (p. ej. al iniciar un proceso
+    del pool de generación) para que la primera descarga no pague el costo.
+    """
+    register_fonts()
+    for path in TEMPLATES:
+        try:
+            get_template(path)
+        except OSError as e:
+            logger.warning("No se pudo precargar la plantilla %s: %s", path, e)
@@ -0,0 +1,100 @@
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping
+
+# ----------------------------------------------------------------------
+# Motor de precios
+#
+# Único lugar donde se calculan los totales de una lista de recargos: total
+# por línea, totales por moneda, totales con el markup de costos y profit.
+# El formulario, la base de datos, Google Sheets y los PDF consumen el mismo
+# resumen, así las cifras no se desalinean entre sí. Los cálculos son en
+# Decimal; se convierten a float solo para Sheets/JSON (ver as_floats).
+# ----------------------------------------------------------------------
+
+COST_MARKUP = Decimal("0.04")
+CENT = Decimal("0.01")
+
+
+def to_decimal(value) -> Decimal:
+    if isinstance(value, Decimal):
+        return value
+    if value in (None, ""):
+        return Decimal("0")
+    # str() evita arrastrar el error binario de los float
+    return Decimal(str(value))
+
+
+def as_floats(totals: Mapping[str, Decimal]) -> dict:
+    return {currency: float(amount) for currency, amount in totals.items()}
+
+
+@dataclass(frozen=True)
+class PricingSummary:
+    line_totals: tuple
+    totals: Mapping[str, Decimal]
+    marked_up_totals: Mapping[str, Decimal]
+    grand_total: Decimal
+
+    def float_totals(self, markup: bool = False) -> dict:
+        return as_floats(self.marked_up_totals if markup else self.totals)
+
+
+@lru_cache(maxsize=512)
+def _summarize(lines: tuple, markup: Decimal) -> PricingSummary:
+    factor = 1 + markup
+    totals, marked_up = {}, {}
+    line_totals = []
+    grand_total = Decimal("0")
+
+    for currency, amount in lines:
+        line_total = amount.quantize(CENT, ROUND_HALF_UP)
+        line_totals.append(line_total)
+        grand_total += line_total
+        totals[currency] = totals.get(currency, Decimal("0")) + line_total
+        marked_up[currency] = marked_up.get(currency, Decimal("0")) + (amount * factor).quantize(CENT, ROUND_HALF_UP)
+
+    return PricingSummary(
+        line_totals=tuple(line_totals),
+        totals=MappingProxyType(totals),
+        marked_up_totals=MappingProxyType(marked_up),
+        grand_total=grand_total,
+    )
+
+
+def summarize(surcharges, amount_key: str = "total", currency_key: str = "currency",
+              markup: Decimal = COST_MARKUP) -> PricingSummary:
+    """
+    Resumen (inmutable y memoizado) de una lista de recargos en una sola
+    pasada. El monto de cada línea es `amount_key` o, si no viene, cantidad
+    por tarifa. Cada línea (con o sin markup) se redondea a centavos antes
+    de sumar, como en los PDF de venta y de costos. La moneda se normaliza a
+    mayúsculas ("usd" y "USD" suman juntas).
+    """
+    lines = []
+    for s in surcharges:
+        if amount_key in s:
+            amount = to_decimal(s[amount_key])
+        else:
+            amount = to_decimal(s.get("quantity", 0)) * to_decimal(s.get("rate", 0))
+        lines.append(((s.get(currency_key) or "USD").upper(), amount))
+    return _summarize(tuple(lines), markup)
+
+
+def profit(sales_totals, cost_totals) -> dict:
+    """
+    Profit por moneda: suma de los totales de venta (uno o varios resúmenes
+    o diccionarios por moneda) menos los totales de costo.
+    """
+    if isinstance(sales_totals, Mapping):
+        sales_totals = [sales_totals]
+
+    result = {}
+    for totals in sales_totals:
+        for currency, amount in totals.items():
+            result[currency] = result.get(currency, Decimal("0")) + to_decimal(amount)
+    for currency, amount in cost_totals.items():
+        result[currency] = result.get(currency, Decimal("0")) - to_decimal(amount)
+    return result
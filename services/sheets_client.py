@@ -0,0 +1,304 @@
+import logging
+import random
+import threading
+import time
+from services.metrics import observe
+
+# ----------------------------------------------------------------------
+# Cliente de Google Sheets con control de cuota
+#
+# Toda llamada a la API pasa por SheetsClient.call, que:
+# - consume un token de un token bucket (presupuesto de requests por minuto),
+# - reintenta los 429 y 5xx con backoff exponencial con jitter,
+# - registra latencia, reintentos y errores por operación.
+# ----------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+REQUESTS_PER_MINUTE = 60
+MAX_RETRIES = 5
+BASE_DELAY_S = 1.0
+MAX_DELAY_S = 64.0
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe: `rate` tokens por segundo, hasta `capacity`.
+    `clock` y `sleep` se pueden reemplazar en las pruebas.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self.tokens = capacity
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Toma un token, esperando si hace falta. Devuelve los segundos esperados.
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = self._clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            self._sleep(wait)
+            waited += wait
+
+
+def _status_code(error):
+    """
+    Código HTTP de un error de gspread/requests, o None si no es un error HTTP.
+    """
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _is_retryable(error) -> bool:
+    import requests
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    code = _status_code(error)
+    return code == 429 or (code is not None and code >= 500)
+
+
+class SheetsClient:
+    def __init__(self, requests_per_minute: int = REQUESTS_PER_MINUTE, max_retries: int = MAX_RETRIES,
+                 base_delay: float = BASE_DELAY_S, max_delay: float = MAX_DELAY_S, sleep=time.sleep,
+                 clock=time.monotonic):
+        self.bucket = TokenBucket(rate=requests_per_minute / 60.0, capacity=requests_per_minute,
+                                  clock=clock, sleep=sleep)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _record(self, operation: str, **increments):
+        with self._lock:
+            m = self._metrics.setdefault(operation, {
+                "calls": 0, "errors": 0, "retries": 0, "throttled": 0,
+                "latency_total_s": 0.0, "latency_max_s": 0.0, "quota_wait_s": 0.0,
+            })
+            for key, value in increments.items():
+                if key == "latency_max_s":
+                    m[key] = max(m[key], value)
+                else:
+                    m[key] += value
+
+    def call(self, operation: str, fn, *args, **kwargs):
+        """
+        Ejecuta `fn(*args, **kwargs)` respetando la cuota y reintentando los
+        errores transitorios.
+        """
+        attempt = 0
+        while True:
+            quota_wait = self.bucket.acquire()
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                elapsed = time.perf_counter() - start
+                observe(f"sheets.{operation}", elapsed, error=True)
+                throttled = 1 if _status_code(e) == 429 else 0
+                if attempt < self.max_retries and _is_retryable(e):
+                    delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+                    delay = random.uniform(0, delay)  # full jitter
+                    self._record(operation, retries=1, throttled=throttled, quota_wait_s=quota_wait,
+                                 latency_total_s=elapsed, latency_max_s=elapsed)
+                    logger.info("Sheets %s falló (%s); reintento en %.1fs", operation, e, delay)
+                    self._sleep(delay)
+                    attempt += 1
+                    continue
+                self._record(operation, calls=1, errors=1, throttled=throttled, quota_wait_s=quota_wait,
+                             latency_total_s=elapsed, latency_max_s=elapsed)
+                raise
+
+            elapsed = time.perf_counter() - start
+            observe(f"sheets.{operation}", elapsed)
+            self._record(operation, calls=1, quota_wait_s=quota_wait,
+                         latency_total_s=elapsed, latency_max_s=elapsed)
+            return result
+
+    def append_rows(self, worksheet, rows: list, **kwargs):
+        """
+        Agrega todas las filas a la pestaña con una sola llamada a la API.
+        """
+        if not rows:
+            return None
+        return self.call("append_rows", worksheet.append_rows, rows, **kwargs)
+
+    def metrics(self) -> dict:
+        """
+        Copia de las métricas por operación (llamadas, errores, reintentos,
+        429 recibidos, latencia y espera por cuota).
+        """
+        with self._lock:
+            return {op: dict(m) for op, m in self._metrics.items()}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_sheets_client() -> SheetsClient:
+    """
+    Cliente compartido por el proceso. El presupuesto de requests se puede
+    ajustar con general.sheets_requests_per_minute en los secretos.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            rpm = REQUESTS_PER_MINUTE
+            try:
+                import streamlit as st
+                rpm = int(st.secrets["general"].get("sheets_requests_per_minute", rpm))
+            except Exception:
+                pass
+            _client = SheetsClient(requests_per_minute=rpm)
+        return _client
+
+
+# ----------------------------------------------------------------------
+# Cache de pestañas
+#
+# Abrir una pestaña cuesta dos llamadas de metadatos (open_by_key y
+# worksheet). Los handles se guardan por (spreadsheet_id, pestaña) durante
+# WORKSHEET_TTL_S segundos junto con la verificación de encabezados, así que
+# una escritura en estado estable cuesta una sola llamada a la API.
+# ----------------------------------------------------------------------
+
+WORKSHEET_TTL_S = 600
+
+
+class WorksheetCache:
+    def __init__(self, ttl: float = WORKSHEET_TTL_S):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._spreadsheets = {}
+        self._worksheets = {}
+
+    def _spreadsheet(self, gc, spreadsheet_id: str, api: SheetsClient):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._spreadsheets.get(spreadsheet_id)
+            if entry and now - entry[1] < self.ttl:
+                return entry[0]
+        spreadsheet = api.call("open_by_key", gc.open_by_key, spreadsheet_id)
+        with self._lock:
+            self._spreadsheets[spreadsheet_id] = (spreadsheet, now)
+        return spreadsheet
+
+    def get(self, gc, spreadsheet_id: str, sheet_name: str, headers: list = None, create: bool = True):
+        """
+        Devuelve la pestaña `sheet_name`, abriéndola con `gc` solo si no está
+        en caché o venció. Con `create` la crea si no existe; si se pasan
+        `headers` y la pestaña está vacía, escribe la fila de encabezados.
+        Sin `create` propaga WorksheetNotFound.
+        """
+        import gspread
+
+        key = (spreadsheet_id, sheet_name)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._worksheets.get(key)
+            if entry and now - entry[1] < self.ttl:
+                return entry[0]
+
+        api = get_sheets_client()
+        spreadsheet = self._spreadsheet(gc, spreadsheet_id, api)
+        try:
+            worksheet = api.call("worksheet", spreadsheet.worksheet, sheet_name)
+            if headers and not api.call("row_values", worksheet.row_values, 1):
+                api.call("append_row", worksheet.append_row, headers)
+        except gspread.exceptions.WorksheetNotFound:
+            if not create:
+                raise
+            worksheet = api.call("add_worksheet", spreadsheet.add_worksheet,
+                                 title=sheet_name, rows="1000", cols="30")
+            if headers:
+                api.call("append_row", worksheet.append_row, headers)
+            logger.warning("Worksheet '%s' was created.", sheet_name)
+
+        with self._lock:
+            self._worksheets[key] = (worksheet, now)
+        return worksheet
+
+    def invalidate(self, spreadsheet_id: str, sheet_name: str = None):
+        """
+        Descarta el handle de una pestaña (o de todo el libro si no se indica
+        `sheet_name`), p. ej. cuando alguien la borró o renombró.
+        """
+        with self._lock:
+            if sheet_name is None:
+                self._spreadsheets.pop(spreadsheet_id, None)
+                for key in [k for k in self._worksheets if k[0] == spreadsheet_id]:
+                    del self._worksheets[key]
+            else:
+                self._worksheets.pop((spreadsheet_id, sheet_name), None)
+
+
+_worksheet_cache = WorksheetCache()
+
+
+def get_worksheet_cache() -> WorksheetCache:
+    return _worksheet_cache
+
+
+# ----------------------------------------------------------------------
+# Clientes de Google
+#
+# Las credenciales, el cliente de gspread y el servicio de la API v4 se
+# crean la primera vez que se usan y se comparten en todo el proceso, de
+# modo que importar los módulos de Sheets no toca la red. El servicio usa
+# el documento de discovery incluido en google-api-python-client.
+# ----------------------------------------------------------------------
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+
+_google = {}
+_google_lock = threading.RLock()
+
+
+def _lazy(name: str, factory):
+    with _google_lock:
+        if name not in _google:
+            _google[name] = factory()
+        return _google[name]
+
+
+def get_credentials():
+    def factory():
+        import streamlit as st
+        from google.oauth2.service_account import Credentials
+        return Credentials.from_service_account_info(st.secrets["google_sheets_credentials"], scopes=SCOPES)
+    return _lazy("credentials", factory)
+
+
+def get_gspread_client():
+    def factory():
+        import gspread
+        return gspread.authorize(get_credentials())
+    return _lazy("gspread", factory)
+
+
+def get_sheets_service():
+    def factory():
+        from googleapiclient.discovery import build
+        return build("sheets", "v4", credentials=get_credentials(), static_discovery=True, cache_discovery=False)
+    return _lazy("sheets_service", factory)
@@ -0,0 +1,201 @@
+import json
+import logging
+import threading
+from sqlalchemy import text
+from database.db import get_engine, obtener_sesion
+from services.metrics import timed
+
+# ----------------------------------------------------------------------
+# Outbox de escrituras a Google Sheets
+#
+# Las escrituras se guardan en la tabla sheets_outbox dentro de la misma
+# transacción que la fila de negocio (o en una propia si no hay). Un hilo en
+# segundo plano las drena en lotes: las filas pendientes de una misma hoja se
+# envían con un solo append_rows (ver services/sheets_client.py para la cuota
+# y los reintentos inmediatos) y los lotes que aun así fallan se reprograman
+# con backoff exponencial. La UI no espera a Google.
+#
+# El orden por pestaña se respeta: mientras una pestaña tenga un evento
+# reprogramado, sus eventos posteriores no se envían (p. ej. el borrado de una
+# nota crédito nunca se adelanta al append que la crea). Un solo proceso drena
+# la cola a la vez (advisory lock), así dos réplicas no se intercalan. Cada
+# tramo enviado se marca en su propia transacción: la entrega es "al menos
+# una vez" y solo el tramo en curso puede repetirse si el proceso muere.
+# ----------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+POLL_INTERVAL_S = 2.0
+MAX_ATTEMPTS = 12
+MAX_BACKOFF_S = 3600
+
+# Un solo proceso drena la cola a la vez
+OUTBOX_LOCK_ID = 7310453
+
+_wakeup = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def enqueue(db, target: str, sheet: str, action: str, payload: dict):
+    """
+    Agrega una escritura a la cola usando la sesión `db`; se confirma junto
+    con el resto de la transacción del llamador.
+    """
+    db.execute(text("""
+        INSERT INTO sheets_outbox (destino, hoja, accion, payload)
+        VALUES (:destino, :hoja, :accion, CAST(:payload AS JSONB))
+    """), {
+        "destino": target,
+        "hoja": sheet,
+        "accion": action,
+        "payload": json.dumps(payload, default=str)
+    })
+
+
+def enqueue_many(events: list):
+    """
+    Encola varias escrituras (target, sheet, action, payload) en su propia
+    transacción y despierta al worker.
+    """
+    with obtener_sesion() as db:
+        for target, sheet, action, payload in events:
+            enqueue(db, target, sheet, action, payload)
+        db.commit()
+    notify()
+
+
+def notify():
+    """
+    Despierta al worker para que procese la cola sin esperar el siguiente ciclo.
+    """
+    _wakeup.set()
+
+
+def _runs(events):
+    """
+    Agrupa los eventos por hoja (conservando el orden dentro de cada una) y
+    luego en tramos consecutivos con la misma acción, para que todas las
+    filas pendientes de una pestaña salgan en un solo append_rows.
+    """
+    by_sheet = {}
+    for event in events:
+        by_sheet.setdefault((event["destino"], event["hoja"]), []).append(event)
+
+    runs = []
+    for (target, sheet), sheet_events in by_sheet.items():
+        for event in sheet_events:
+            key = (target, sheet, event["accion"])
+            if runs and runs[-1][0] == key:
+                runs[-1][1].append(event)
+            else:
+                runs.append((key, [event]))
+    return runs
+
+
+@timed("sheets.outbox_batch")
+def process_pending(limit: int = BATCH_SIZE) -> int:
+    """
+    Procesa un lote de eventos pendientes. Devuelve cuántos se enviaron.
+
+    Solo se toman eventos de pestañas sin eventos anteriores reprogramados
+    por un fallo; si una pestaña falla dentro del lote, sus eventos
+    posteriores también esperan. Los eventos que agotaron MAX_ATTEMPTS ya no
+    bloquean su pestaña.
+
+    Ninguna llamada a Google ocurre dentro de una transacción: el lote se lee
+    y cada tramo enviado (o fallido) se confirma en su propia transacción
+    corta, así un proceso que muere a mitad de lote solo reenvía el tramo en
+    curso. La exclusión entre procesos es un advisory lock de sesión sobre
+    una conexión que se mantiene durante todo el lote.
+    """
+    from services.sheets_writer import apply_outbox_events
+
+    sent = 0
+    with get_engine().connect() as conn:
+        locked = conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": OUTBOX_LOCK_ID}).scalar()
+        conn.commit()
+        if not locked:
+            # Otro proceso está drenando la cola
+            return 0
+
+        try:
+            events = conn.execute(text("""
+                SELECT s.id_evento, s.destino, s.hoja, s.accion, s.payload, s.intentos
+                FROM sheets_outbox s
+                WHERE s.procesado_en IS NULL
+                  AND s.disponible_en <= CURRENT_TIMESTAMP
+                  AND s.intentos < :max_intentos
+                  AND NOT EXISTS (
+                      SELECT 1
+                      FROM sheets_outbox o2
+                      WHERE o2.destino = s.destino
+                        AND o2.hoja = s.hoja
+                        AND o2.procesado_en IS NULL
+                        AND o2.intentos < :max_intentos
+                        AND o2.id_evento < s.id_evento
+                        AND o2.disponible_en > CURRENT_TIMESTAMP
+                  )
+                ORDER BY s.id_evento
+                LIMIT :limite
+            """), {"limite": limit, "max_intentos": MAX_ATTEMPTS}).mappings().all()
+            conn.commit()
+
+            failed_sheets = set()
+            for (target, sheet, action), run in _runs(events):
+                ids = [e["id_evento"] for e in run]
+                if (target, sheet) in failed_sheets:
+                    continue
+                try:
+                    apply_outbox_events(target, sheet, action, [e["payload"] for e in run])
+                except Exception as e:
+                    failed_sheets.add((target, sheet))
+                    logger.warning("Error enviando %s eventos a %s/%s: %s", len(ids), target, sheet, e)
+                    conn.execute(text("""
+                        UPDATE sheets_outbox
+                        SET intentos = intentos + 1,
+                            ultimo_error = :error,
+                            disponible_en = CURRENT_TIMESTAMP
+                                + LEAST(power(2, intentos + 1), :max_backoff) * INTERVAL '1 second'
+                        WHERE id_evento = ANY(:ids)
+                    """), {"ids": ids, "error": str(e), "max_backoff": MAX_BACKOFF_S})
+                    conn.commit()
+                    continue
+
+                conn.execute(text("""
+                    UPDATE sheets_outbox
+                    SET procesado_en = CURRENT_TIMESTAMP
+                    WHERE id_evento = ANY(:ids)
+                """), {"ids": ids})
+                conn.commit()
+                sent += len(ids)
+        finally:
+            conn.rollback()
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": OUTBOX_LOCK_ID})
+            conn.commit()
+    return sent
+
+
+def _run_worker():
+    while True:
+        _wakeup.wait(POLL_INTERVAL_S)
+        _wakeup.clear()
+        try:
+            # Drenar mientras haya lotes completos
+            while process_pending() >= BATCH_SIZE:
+                pass
+        except Exception:
+            logger.exception("Error procesando la cola de Google Sheets")
+
+
+def start_worker():
+    """
+    Inicia (una sola vez por proceso) el hilo que drena la cola.
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, name="sheets-outbox", daemon=True)
+            _worker.start()
+    return _worker
@@ -1,55 +1,87 @@
-import gspread
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
 import streamlit as st
 from datetime import datetime
+import logging
+import re
+import threading
+import time
 import pytz
-import streamlit as st
+from services.sheets_outbox import enqueue, enqueue_many
+from services.pricing import summarize
+from services.sheets_client import get_gspread_client, get_sheets_client, get_worksheet_cache
 
-credentials = Credentials.from_service_account_info(
-    st.secrets["google_sheets_credentials"],
-    scopes=[
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive",
-    ]
-)
+# gspread y los clientes de Google se cargan al primer uso (ver
+# services/sheets_client.py): importar este módulo no abre conexiones.
+
+logger = logging.getLogger(__name__)
 
-client_gcp = gspread.authorize(credentials)
-sheets_service = build("sheets", "v4", credentials=credentials)
-SPREADSHEET_ID = st.secrets["general"]["time_sheet_id"]
-ORDEN_ID = st.secrets["general"]["orden_sheet"]
 colombia_timezone = pytz.timezone('America/Bogota')
 
+# Hojas de cálculo lógicas a las que apuntan los eventos del outbox, con la
+# clave de cada una en st.secrets["general"]
+SPREADSHEETS = {
+    "time_sheet": "time_sheet_id",
+    "orden": "orden_sheet",
+}
+
+
+def _spreadsheet_id(target: str) -> str:
+    return st.secrets["general"][SPREADSHEETS[target]]
+
+
+def _open_worksheet(spreadsheet_id: str, sheet_name: str, headers: list = None):
+    """
+    Abre la pestaña `sheet_name` (desde la caché de handles), creándola con
+    sus encabezados si no existe. Propaga los errores de gspread (la usa
+    también el worker del outbox).
+    """
+    return get_worksheet_cache().get(get_gspread_client(), spreadsheet_id, sheet_name, headers)
+
+
 def get_or_create_worksheet(sheet_name: str, headers: list = None):
+    import gspread
     try:
-        sheet = client_gcp.open_by_key(SPREADSHEET_ID)
-        try:
-            worksheet = sheet.worksheet(sheet_name)
-        except gspread.exceptions.WorksheetNotFound:
-            worksheet = sheet.add_worksheet(title=sheet_name, rows="1000", cols="30")
-            if headers:
-                worksheet.append_row(headers)
-            st.warning(f"Worksheet '{sheet_name}' was created.")
-        return worksheet
+        return _open_worksheet(_spreadsheet_id("time_sheet"), sheet_name, headers)
     except gspread.exceptions.SpreadsheetNotFound:
         st.error("No se encontró la hoja de cálculo.")
         return None
 
 def get_or_create_worksheet_orden(sheet_name: str, headers: list = None):
+    import gspread
     try:
-        sheet = client_gcp.open_by_key(ORDEN_ID)
-        try:
-            worksheet = sheet.worksheet(sheet_name)
-        except gspread.exceptions.WorksheetNotFound:
-            worksheet = sheet.add_worksheet(title=sheet_name, rows="1000", cols="30")
-            if headers:
-                worksheet.append_row(headers)
-            st.warning(f"Worksheet '{sheet_name}' was created.")
-        return worksheet
+        return _open_worksheet(_spreadsheet_id("orden"), sheet_name, headers)
     except gspread.exceptions.SpreadsheetNotFound:
         st.error("No se encontró la hoja de cálculo.")
         return None
 
+
+def apply_outbox_events(target: str, sheet_name: str, action: str, payloads: list):
+    """
+    Aplica en Google Sheets un grupo de eventos consecutivos del outbox que
+    comparten hoja y acción. Los appends se envían en un solo append_rows.
+    """
+    import gspread
+
+    target_id = _spreadsheet_id(target)
+    worksheet = _open_worksheet(target_id, sheet_name, payloads[0].get("headers"))
+
+    try:
+        if action == "append":
+            rows = [p["row"] for p in payloads]
+            response = get_sheets_client().append_rows(worksheet, rows, value_input_option="USER_ENTERED")
+            if sheet_name == NOTA_CREDITO_SHEET:
+                _index_appended_notas(worksheet, rows, response)
+        elif action == "delete_nota_credito":
+            for p in payloads:
+                _delete_nota_credito_row(worksheet, p["id_nc"])
+        else:
+            raise ValueError(f"Acción de outbox desconocida: {action}")
+    except (gspread.exceptions.WorksheetNotFound, gspread.exceptions.APIError):
+        # El handle en caché puede apuntar a una pestaña borrada o renombrada;
+        # el reintento del outbox la vuelve a abrir.
+        get_worksheet_cache().invalidate(target_id, sheet_name)
+        raise
+
+
 def save_anticipo_submission(data: dict):
     SHEET_NAME = "SOLICITUD DE ANTICIPO"
     headers = [
@@ -57,10 +89,6 @@ def save_anticipo_submission(data: dict):
         "Tipo Servicio", "Tipo Operación", "Referencia", "Recargos", "Total USD", "Total COP", "TRM", "Total COP TRM"
     ]
 
-    worksheet = get_or_create_worksheet(SHEET_NAME, headers)
-    if not worksheet:
-        return
-
     try:
         # Extraer campos
         commercial = data["commercial"]
@@ -84,19 +112,19 @@ def save_anticipo_submission(data: dict):
         )
 
         # Recargos
-        usd_total = 0.0
-        cop_total = 0.0
         surcharge_lines = []
+        all_surcharges = []
         for container_type, surcharges in data["additional_surcharges"].items():
             for surcharge in surcharges:
                 cost = surcharge['cost']
                 currency = surcharge['currency']
                 concept = surcharge['concept']
                 surcharge_lines.append(f"{container_type} - {concept}: ${cost:.2f} {currency}")
-                if currency == "USD":
-                    usd_total += cost
-                elif currency == "COP":
-                    cop_total += cost
+                all_surcharges.append(surcharge)
+
+        totals = summarize(all_surcharges, amount_key="cost").float_totals()
+        usd_total = totals.get("USD", 0.0)
+        cop_total = totals.get("COP", 0.0)
 
         surcharge_str = '\n'.join(surcharge_lines)
 
@@ -110,7 +138,7 @@ def save_anticipo_submission(data: dict):
             services, operation_type, reference, surcharge_str, usd_total, cop_total, trm, total_cop_trm
         ]
 
-        worksheet.append_row(row, value_input_option="USER_ENTERED")
+        enqueue_many([("time_sheet", SHEET_NAME, "append", {"row": row, "headers": headers})])
         st.success("Datos de solicitud de anticipo guardados correctamente.")
     except Exception as e:
         st.error(f"Error guardando datos en hoja de anticipo: {e}")
@@ -123,105 +151,102 @@ def register_new_client(client_name, clients_list):
     normalized_existing = [c.strip().lower() for c in clients_list]
 
     if client_normalized not in normalized_existing:
-        sheet = client_gcp.open_by_key(SPREADSHEET_ID)
-        worksheet = sheet.worksheet("clientes")
-        worksheet.append_row([client_name])
+        worksheet = get_worksheet_cache().get(get_gspread_client(), _spreadsheet_id("time_sheet"), "clientes", create=False)
+        get_sheets_client().call("append_row", worksheet.append_row, [client_name])
         st.session_state["clients_list"].append(client_name)
         st.session_state["client"] = None
         load_clients.clear()
         st.rerun()
 
 
-def save_order_submission(order_info: dict, sheet_name: str):
-    headers = [
-        "Comercial", "Fecha", "No Solicitud", "Cliente", "Ruta (POL -> POD)", "Referencia",
-        "Totales", "Comentarios Finales"
-    ]
+ORDER_HEADERS = [
+    "Comercial", "Fecha", "No Solicitud", "Cliente", "Ruta (POL -> POD)", "Referencia",
+    "Totales", "Comentarios Finales"
+]
 
-    worksheet = get_or_create_worksheet_orden(sheet_name, headers)
-    if not worksheet:
-        return
 
-    try:
-        # --- Comercial y número de solicitud ---
-        commercial = order_info.get("commercial") or order_info.get("comercial", "")
-        no_solicitud = order_info.get("no_solicitud", "")
-
-        # --- Datos del cliente (dentro de venta) ---
-        venta_data = order_info.get("venta", {})
-        datos_cliente = (
-            f"{venta_data.get('cliente', '')}"
-        )
+def build_order_row(order_info: dict, sheet_name: str) -> list:
+    """
+    Arma la fila de la hoja VENTA o COSTO para una orden.
+    """
+    # --- Comercial y número de solicitud ---
+    commercial = order_info.get("commercial") or order_info.get("comercial", "")
+    no_solicitud = order_info.get("no_solicitud", "")
+
+    # --- Datos del cliente (dentro de venta) ---
+    venta_data = order_info.get("venta", {})
+    datos_cliente = (
+        f"{venta_data.get('cliente', '')}"
+    )
+
+    # --- Datos de la carga ---
+    carga = order_info.get("carga", {})
+    ruta = f"{carga.get('pol_aol', '')} -> {carga.get('pod_aod', '')}"
+    reference = carga.get("reference", "")
+
+    # --- Recargos ---
+    sales_surcharges = venta_data.get("sales_surcharges", [])
+    cost_surcharges = order_info.get("cost_surcharges", [])
+
+    # --- Totales ---
+    if sheet_name.upper() == "VENTA":
+        label, surcharges = "Venta", sales_surcharges
+    else:
+        label, surcharges = "Costo", cost_surcharges
+    totals_by_currency = summarize(surcharges).float_totals()
+    total_str = "\n".join([f"Total {label} {currency}: {amount:.2f} {currency}"
+                            for currency, amount in totals_by_currency.items()])
+
+    # --- Comentarios finales ---
+    comentarios = order_info.get("comentarios", "")
+
+    # --- Timestamp ---
+    timestamp = datetime.now(pytz.utc).astimezone(colombia_timezone).strftime('%Y-%m-%d %H:%M:%S')
+
+    # --- Fila final ---
+    return [
+        commercial, timestamp, no_solicitud, datos_cliente, ruta, reference, total_str,
+        comentarios
+    ]
 
-        # --- Datos de la carga ---
-        carga = order_info.get("carga", {})
-        ruta = f"{carga.get('pol_aol', '')} -> {carga.get('pod_aod', '')}"
-        reference = carga.get("reference", "")
-
-        # --- Recargos ---
-        sales_surcharges = venta_data.get("sales_surcharges", [])
-        cost_surcharges = order_info.get("cost_surcharges", [])
-
-        # --- Totales ---
-        if sheet_name.upper() == "VENTA":
-            totals_by_currency = {}
-            for s in sales_surcharges:
-                currency = s.get("currency", "USD")
-                totals_by_currency[currency] = totals_by_currency.get(currency, 0.0) + s.get("total", 0.0)
-            
-            total_str = "\n".join([f"Total Venta {currency}: {amount:.2f} {currency}" 
-                                for currency, amount in totals_by_currency.items()])
-        else:
-            totals_by_currency = {}
-            for s in cost_surcharges:
-                currency = s.get("currency", "USD")
-                totals_by_currency[currency] = totals_by_currency.get(currency, 0.0) + s.get("total", 0.0)
-            
-            total_str = "\n".join([f"Total Costo {currency}: {amount:.2f} {currency}" 
-                                for currency, amount in totals_by_currency.items()])
 
-        # --- Comentarios finales ---
-        comentarios = order_info.get("comentarios", "")
+def save_order_submission(order_info: dict, sheet_name: str):
+    save_order_submissions([(order_info, sheet_name)])
 
-        # --- Timestamp ---
-        timestamp = datetime.now(pytz.utc).astimezone(colombia_timezone).strftime('%Y-%m-%d %H:%M:%S')
 
-        # --- Fila final ---
-        row = [
-            commercial, timestamp, no_solicitud, datos_cliente, ruta, reference, total_str,
-            comentarios
-        ]
+def save_order_submissions(orders: list):
+    """
+    Guarda varias órdenes a la vez: recibe una lista de (order_info, sheet_name).
+    Las filas se encolan en el outbox y el worker las envía agrupadas por hoja.
+    """
+    try:
+        enqueue_many([
+            ("orden", sheet_name, "append", {"row": build_order_row(order_info, sheet_name), "headers": ORDER_HEADERS})
+            for order_info, sheet_name in orders
+        ])
+    except Exception as e:
+        st.error(f"Error guardando datos de las órdenes: {e}")
 
-        worksheet.append_row(row, value_input_option="USER_ENTERED")
+NOTA_CREDITO_SHEET = "NOTA CREDITO"
+NOTA_CREDITO_HEADERS = [
+    "ID Nota",
+    "Número Caso (M)",
+    "Número Factura",
+    "Tipo Nota",
+    "Valor",
+    "Razón",
+    "Fecha Creación"
+]
 
-    except Exception as e:
-        st.error(f"Error guardando datos en hoja {sheet_name}: {e}")
 
 def get_or_create_worksheet_nota_credito():
-    headers = [
-        "ID Nota",
-        "Número Caso (M)",
-        "Número Factura",
-        "Tipo Nota",
-        "Valor",
-        "Razón",
-        "Fecha Creación"
-    ]
-    return get_or_create_worksheet_orden("NOTA CREDITO", headers)
-
+    return get_or_create_worksheet_orden(NOTA_CREDITO_SHEET, NOTA_CREDITO_HEADERS)
 
-def save_nota_credito(nota_info: dict):
-    """
-    Guarda una nota de crédito en la hoja NOTA CREDITO.
-    """
-    ws = get_or_create_worksheet_nota_credito()
-    if not ws:
-        return
 
-    colombia_timezone = pytz.timezone("America/Bogota")
+def build_nota_credito_row(nota_info: dict) -> list:
     fecha_creacion = datetime.now(pytz.utc).astimezone(colombia_timezone).strftime("%Y-%m-%d %H:%M:%S")
 
-    row = [
+    return [
         nota_info.get("id_nc", ""),
         nota_info.get("no_solicitud", ""),
         nota_info.get("no_factura", ""),
@@ -230,21 +255,161 @@ def save_nota_credito(nota_info: dict):
         nota_info.get("razon", ""),  # Nuevo campo Razón
         fecha_creacion
     ]
-    ws.append_row(row, value_input_option="USER_ENTERED")
+
+
+def enqueue_nota_credito(db, nota_info: dict):
+    """
+    Encola la fila de la nota de crédito en la transacción `db`.
+    """
+    enqueue(db, "orden", NOTA_CREDITO_SHEET, "append", {
+        "row": build_nota_credito_row(nota_info),
+        "headers": NOTA_CREDITO_HEADERS
+    })
+
+
+def enqueue_delete_nota_credito(db, id_nc: int):
+    """
+    Encola la eliminación de la nota de crédito en la transacción `db`.
+    """
+    enqueue(db, "orden", NOTA_CREDITO_SHEET, "delete_nota_credito", {
+        "id_nc": id_nc,
+        "headers": NOTA_CREDITO_HEADERS
+    })
+
+
+def save_nota_credito(nota_info: dict):
+    """
+    Guarda una nota de crédito en la hoja NOTA CREDITO (vía outbox).
+    """
+    enqueue_many([("orden", NOTA_CREDITO_SHEET, "append", {
+        "row": build_nota_credito_row(nota_info),
+        "headers": NOTA_CREDITO_HEADERS
+    })])
 
 
 def delete_nota_credito_sheet(id_nc: int):
     """
-    Elimina una nota de crédito de la hoja NOTA CREDITO según el ID.
+    Elimina una nota de crédito de la hoja NOTA CREDITO según el ID (vía outbox).
     """
-    ws = get_or_create_worksheet_nota_credito()
-    if not ws:
-        return
+    enqueue_many([("orden", NOTA_CREDITO_SHEET, "delete_nota_credito", {
+        "id_nc": id_nc,
+        "headers": NOTA_CREDITO_HEADERS
+    })])
+
+
+# ----------------------------------------------------------------------
+# Índice ID Nota -> fila
+#
+# Para borrar una nota no se descarga la pestaña completa: se mantiene por
+# proceso un índice de la columna "ID Nota" (construido una vez leyendo solo
+# esa columna) que se actualiza con cada append y cada borrado. Antes de
+# borrar se verifica la celda, y si no coincide (alguien movió filas) el
+# índice se reconstruye siempre. Un índice leído hace menos de
+# NOTA_INDEX_FRESH_S segundos se da por bueno solo para notas que no
+# aparecen en él: no se vuelve a descargar la columna para buscarlas.
+# ----------------------------------------------------------------------
+NOTA_INDEX_FRESH_S = 60
+
+_nota_index = {}
+_nota_index_built = {}
+_nota_index_lock = threading.Lock()
+
+
+def _nota_index_key(ws):
+    return (ws.spreadsheet_id, ws.title)
+
+
+def _nota_credito_index(ws, rebuild: bool = False) -> dict:
+    key = _nota_index_key(ws)
+    with _nota_index_lock:
+        index = _nota_index.get(key)
+    if index is not None and not rebuild:
+        return index
+
+    ids = get_sheets_client().call("col_values", ws.col_values, 1)
+    index = {str(v): row for row, v in enumerate(ids, start=1) if row > 1 and v != ""}
+    with _nota_index_lock:
+        _nota_index[key] = index
+        _nota_index_built[key] = time.monotonic()
+    return index
+
+
+def _nota_index_is_fresh(ws) -> bool:
+    """
+    True si el índice aún no existe (se leerá ahora) o se leyó hace poco.
+    """
+    key = _nota_index_key(ws)
+    with _nota_index_lock:
+        if key not in _nota_index:
+            return True
+        built = _nota_index_built.get(key)
+    return built is not None and time.monotonic() - built < NOTA_INDEX_FRESH_S
 
-    all_records = ws.get_all_records()
-    for idx, record in enumerate(all_records, start=2):  # start=2 porque fila 1 = encabezados
-        if str(record.get("ID Nota")) == str(id_nc):
-            ws.delete_rows(idx)
-            break
 
+def _first_appended_row(response) -> int | None:
+    """
+    Primera fila escrita por un append_rows, a partir de updates.updatedRange
+    (p. ej. "'NOTA CREDITO'!A12:G14").
+    """
+    try:
+        updated_range = response["updates"]["updatedRange"]
+    except (TypeError, KeyError):
+        return None
+    match = re.search(r"![A-Z]+(\d+)", updated_range)
+    return int(match.group(1)) if match else None
 
+
+def _index_appended_notas(ws, rows: list, response):
+    """
+    Agrega al índice (si ya existe) las notas recién escritas.
+    """
+    first_row = _first_appended_row(response)
+    with _nota_index_lock:
+        index = _nota_index.get(_nota_index_key(ws))
+        if index is None:
+            return
+        if first_row is None:
+            # Sin la fila de destino no se puede ubicar; se reconstruye a demanda
+            del _nota_index[_nota_index_key(ws)]
+            return
+        for offset, row in enumerate(rows):
+            index[str(row[0])] = first_row + offset
+
+
+def _delete_nota_credito_row(ws, id_nc):
+    """
+    Borra la fila de la nota `id_nc`. Si la celda indicada por el índice no
+    tiene esa nota (otra réplica o una persona movió filas) el índice se
+    reconstruye una vez; si tras reconstruirlo la nota no aparece, ya no está
+    en la hoja. Si aun así la fila no coincide se lanza RuntimeError y el
+    outbox reintenta el borrado.
+    """
+    api = get_sheets_client()
+    key = str(id_nc)
+    with _nota_index_lock:
+        rebuilt = _nota_index_key(ws) not in _nota_index
+    fresh = _nota_index_is_fresh(ws)
+
+    while True:
+        row = _nota_credito_index(ws, rebuild=False).get(key)
+        if row is None:
+            if fresh or rebuilt:
+                # El índice leído hace poco no la tiene: ya no está en la hoja
+                return
+        else:
+            cell = api.call("acell", ws.acell, f"A{row}")
+            if str(cell.value) == key:
+                api.call("delete_rows", ws.delete_rows, row)
+                with _nota_index_lock:
+                    index = _nota_index.get(_nota_index_key(ws), {})
+                    index.pop(key, None)
+                    for other, other_row in index.items():
+                        if other_row > row:
+                            index[other] = other_row - 1
+                return
+            if rebuilt:
+                raise RuntimeError(
+                    f"La fila {row} de {ws.title} no tiene la nota {key} (tiene {cell.value!r})"
+                )
+        _nota_credito_index(ws, rebuild=True)
+        rebuilt = True
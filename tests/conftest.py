@@ -0,0 +1,55 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+# Los módulos se importan desde la raíz del proyecto (database, services, ui...)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+@pytest.fixture
+def pg_engine(monkeypatch):
+    """
+    Engine de Postgres (TEST_DATABASE_URL) con un esquema propio y vacío para
+    la prueba; database.db lo usa como engine de la app. Se omite la prueba
+    si no hay base de datos de pruebas.
+    """
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL no está definida")
+
+    from sqlalchemy import create_engine, text
+    from database import db
+
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    admin = create_engine(url)
+    with admin.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+
+    engine = create_engine(url, connect_args={"options": f"-c search_path={schema}"})
+    monkeypatch.setattr(db, "_engine", engine)
+    db.SessionLocal.configure(bind=engine)
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+        db.SessionLocal.configure(bind=None)
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        admin.dispose()
+
+
+@pytest.fixture
+def aplicar_sql(pg_engine):
+    """
+    Ejecuta archivos .sql del proyecto (rutas relativas a la raíz) en el
+    esquema de la prueba.
+    """
+    def aplicar(*rutas):
+        with pg_engine.begin() as conn:
+            for ruta in rutas:
+                with open(os.path.join(PROJECT_ROOT, ruta), encoding="utf-8") as f:
+                    conn.exec_driver_sql(f.read())
+    return aplicar
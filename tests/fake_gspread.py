@@ -0,0 +1,138 @@
+"""
+Stand-in local de gspread para las pruebas: un cliente, libros y pestañas en
+memoria con la misma interfaz que usa la app, conteo de llamadas a la "API" e
+inyección de fallos (p. ej. 429/5xx o errores de red).
+"""
+
+import threading
+from collections import Counter
+
+import gspread
+import requests
+
+
+class _Respuesta:
+    def __init__(self, code, message):
+        self.status_code = code
+        self.text = message
+        self._json = {"error": {"code": code, "message": message, "status": "FAKE"}}
+
+    def json(self):
+        return self._json
+
+
+def api_error(code: int, message: str = "fake error") -> gspread.exceptions.APIError:
+    """
+    APIError de gspread con el código HTTP indicado.
+    """
+    return gspread.exceptions.APIError(_Respuesta(code, message))
+
+
+class FakeApi:
+    """
+    Estado compartido del servidor falso: cuenta las llamadas por método y
+    lanza los errores programados con fail().
+    """
+
+    def __init__(self):
+        self.calls = Counter()
+        self._fallos = {}
+        self.lock = threading.Lock()
+
+    def fail(self, method: str, *errors):
+        """
+        Las próximas llamadas a `method` lanzan `errors`, uno por llamada.
+        """
+        with self.lock:
+            self._fallos.setdefault(method, []).extend(errors)
+
+    def hit(self, method: str):
+        with self.lock:
+            self.calls[method] += 1
+            pendientes = self._fallos.get(method)
+            error = pendientes.pop(0) if pendientes else None
+        if error is not None:
+            raise error
+
+
+class FakeWorksheet:
+    def __init__(self, api: FakeApi, spreadsheet_id: str, title: str):
+        self.api = api
+        self.spreadsheet_id = spreadsheet_id
+        self.title = title
+        self.rows = []
+
+    def _range(self, first, last):
+        return f"'{self.title}'!A{first}:G{last}"
+
+    def append_row(self, values, **kwargs):
+        self.api.hit("append_row")
+        return self._append([values])
+
+    def append_rows(self, values, **kwargs):
+        self.api.hit("append_rows")
+        return self._append(values)
+
+    def _append(self, values):
+        first = len(self.rows) + 1
+        self.rows.extend([list(v) for v in values])
+        return {"updates": {"updatedRange": self._range(first, len(self.rows)), "updatedRows": len(values)}}
+
+    def row_values(self, row):
+        self.api.hit("row_values")
+        return [str(v) for v in self.rows[row - 1]] if row <= len(self.rows) else []
+
+    def col_values(self, col):
+        self.api.hit("col_values")
+        return [str(r[col - 1]) if len(r) >= col else "" for r in self.rows]
+
+    def acell(self, label):
+        self.api.hit("acell")
+        row = int(label[1:])
+        value = self.rows[row - 1][0] if row <= len(self.rows) else None
+        return gspread.Cell(row, 1, None if value is None else str(value))
+
+    def delete_rows(self, start, end=None):
+        self.api.hit("delete_rows")
+        del self.rows[start - 1:(end or start)]
+
+    def get_all_records(self):
+        self.api.hit("get_all_records")
+        headers = self.rows[0] if self.rows else []
+        return [dict(zip(headers, r)) for r in self.rows[1:]]
+
+
+class FakeSpreadsheet:
+    def __init__(self, api: FakeApi, spreadsheet_id: str):
+        self.api = api
+        self.id = spreadsheet_id
+        self.worksheets = {}
+
+    def worksheet(self, title):
+        self.api.hit("worksheet")
+        if title not in self.worksheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.worksheets[title]
+
+    def add_worksheet(self, title, rows, cols):
+        self.api.hit("add_worksheet")
+        self.worksheets[title] = FakeWorksheet(self.api, self.id, title)
+        return self.worksheets[title]
+
+
+class FakeClient:
+    """
+    Reemplazo de gspread.Client: open_by_key crea el libro si no existe.
+    """
+
+    def __init__(self, api: FakeApi = None):
+        self.api = api or FakeApi()
+        self.spreadsheets = {}
+
+    def open_by_key(self, key):
+        self.api.hit("open_by_key")
+        return self.spreadsheets.setdefault(key, FakeSpreadsheet(self.api, key))
+
+
+def connection_error():
+    return requests.exceptions.ConnectionError("fake connection reset")
@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy import create_engine, event, text
+
+from database import db
+
+
+@pytest.fixture
+def checkouts(tmp_path, monkeypatch):
+    """
+    Engine SQLite con el pool de la app; devuelve el contador de checkouts.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}", poolclass=db._PoolMedido, pool_pre_ping=True)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+    monkeypatch.setattr(db, "_engine", engine)
+    db.SessionLocal.configure(bind=engine)
+
+    conteo = {"checkouts": 0}
+
+    @event.listens_for(engine, "checkout")
+    def contar(*_):
+        conteo["checkouts"] += 1
+
+    yield conteo
+    db.SessionLocal.configure(bind=None)
+    engine.dispose()
+
+
+def _crud(valor):
+    with db.obtener_sesion() as s:
+        s.execute(text("INSERT INTO t VALUES (:x)"), {"x": valor})
+        s.commit()
+    with db.obtener_sesion() as s:
+        return s.execute(text("SELECT count(*) FROM t")).scalar()
+
+
+def test_una_ejecucion_toma_una_sola_conexion(checkouts):
+    with db.sesion_por_ejecucion() as ejecucion:
+        for i in range(5):
+            assert _crud(i) == i + 1
+            # Entre un CRUD y otro no queda transacción abierta
+            assert not ejecucion.conexion.in_transaction()
+        assert checkouts["checkouts"] == 1
+
+    # La conexión vuelve al pool al terminar la ejecución
+    assert db.get_engine().pool.checkedout() == 0
+    with db.sesion_por_ejecucion():
+        _crud(9)
+    assert checkouts["checkouts"] == 2
+
+
+def test_ejecucion_sin_crud_no_toma_conexion(checkouts):
+    with db.sesion_por_ejecucion():
+        pass
+    assert checkouts["checkouts"] == 0
+
+
+def test_lo_no_confirmado_se_descarta_al_salir_del_crud(checkouts):
+    with db.sesion_por_ejecucion():
+        with db.obtener_sesion() as s:
+            s.execute(text("INSERT INTO t VALUES (1)"))
+        with db.obtener_sesion() as s:
+            assert s.execute(text("SELECT count(*) FROM t")).scalar() == 0
@@ -0,0 +1,75 @@
+import zipfile
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import pytest
+
+from services.pdf_generator import generate_preorden
+
+
+def _jobs(n):
+    return [
+        (f"ORDEN_{i}.pdf", {
+            "no_solicitud": f"SOL-{i}",
+            "venta": {"cliente": f"Cliente {i}", "sales_surcharges": [
+                {"concept": "Flete", "quantity": 1.0, "rate": 10.0, "total": 10.0, "currency": "USD"}
+            ]},
+            "carga": {"cargo_type": "Contenedor", "container_details": {}},
+        }, "ventas")
+        for i in range(n)
+    ]
+
+
+def _nombres(zip_bytes):
+    with zipfile.ZipFile(BytesIO(zip_bytes)) as zf:
+        assert all(zf.read(nombre).startswith(b"%PDF") for nombre in zf.namelist())
+        return zf.namelist()
+
+
+def test_pool_de_procesos_usa_spawn():
+    executor = generate_preorden._get_executor()
+    try:
+        assert executor._mp_context.get_start_method() == "spawn"
+        assert _nombres(generate_preorden.generate_all_archives(_jobs(3))) == [f"ORDEN_{i}.pdf" for i in range(3)]
+    finally:
+        generate_preorden._discard_executor(executor)
+
+
+class _PoolFallido:
+    def __init__(self, error):
+        self.error = error
+        self.cerrado = False
+
+    def map(self, fn, jobs, timeout=None):
+        assert timeout == generate_preorden.GENERATION_TIMEOUT_S
+        raise self.error
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.cerrado = True
+
+
+@pytest.mark.parametrize("error", [FuturesTimeoutError(), BrokenProcessPool()])
+def test_pool_bloqueado_o_roto_genera_en_serie(monkeypatch, error):
+    pool = _PoolFallido(error)
+    monkeypatch.setattr(generate_preorden, "_executor", pool)
+
+    zip_bytes = generate_preorden.generate_all_archives(_jobs(2))
+
+    assert _nombres(zip_bytes) == ["ORDEN_0.pdf", "ORDEN_1.pdf"]
+    assert pool.cerrado
+    assert generate_preorden._executor is None
+
+
+def test_nombres_de_entrada_sin_rutas(monkeypatch):
+    monkeypatch.setattr(generate_preorden, "_executor", None)
+    jobs = _jobs(3)
+    jobs[0] = ("ORDEN_1_1_../../etc/Cliente.pdf", *jobs[0][1:])
+    jobs[1] = ("ORDEN_1_2_..\\Cliente: A/B.pdf", *jobs[1][1:])
+    jobs[2] = ("/ORDEN_1_3_Cliente.pdf", *jobs[2][1:])
+
+    assert _nombres(generate_preorden.generate_all_archives(jobs)) == [
+        "ORDEN_1_1_.._.._etc_Cliente.pdf",
+        "ORDEN_1_2_.._Cliente_ A_B.pdf",
+        "_ORDEN_1_3_Cliente.pdf",
+    ]
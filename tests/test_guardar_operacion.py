@@ -0,0 +1,83 @@
+import pytest
+from decimal import Decimal
+from sqlalchemy import text
+
+from database.crud.operaciones import (
+    guardar_operacion_completa, obtener_notas_credito_por_venta, obtener_operacion_completa,
+    obtener_ventas_con_notas_credito,
+)
+
+
+@pytest.fixture
+def esquema(aplicar_sql):
+    aplicar_sql("init_db.sql", "database/migrations/0001_ventas_master_detalle.sql")
+
+
+def _operacion(lineas, costos=3):
+    return (
+        {"no_solicitud": "OP-1", "comercial": "Comercial"},
+        {"tipo_carga": "Suelta", "bl_awb": "", "pol_aol": "", "pod_aod": "", "shipper": "", "consignee": "",
+         "detalle": None, "unidad_medida": "KG", "cantidad_suelta": 5, "referencia": ""},
+        [{"cliente": f"Cliente {v}", "moneda": "USD", "comentarios": "",
+          "detalles": [{"concepto": f"V{v}-{i}", "cantidad": 1, "tarifa": Decimal("2.50"), "monto": Decimal("2.50"),
+                        "moneda": "USD"} for i in range(lineas)]}
+         for v in range(2)],
+        [{"concepto": f"C{i}", "cantidad": 1, "tarifa": 1.5, "monto": 1.5, "moneda": "USD", "comentarios": ""}
+         for i in range(costos)],
+    )
+
+
+def _conceptos_por_id(pg_engine, tabla, id_col):
+    with pg_engine.connect() as conn:
+        return dict(conn.execute(text(f"SELECT {id_col}, concepto FROM {tabla}")).all())
+
+
+def test_ids_devueltos_corresponden_a_cada_fila(esquema, pg_engine, monkeypatch):
+    # Secuencias descendentes: el orden de los ids no coincide con el de las
+    # filas, así que los ids solo quedan bien si se asocian por posición.
+    with pg_engine.begin() as conn:
+        for tabla, col in (("ventas_master", "id_venta_master"), ("ventas_detalle", "id_detalle"),
+                           ("costos", "id_costo")):
+            conn.execute(text(f"ALTER SEQUENCE {tabla}_{col}_seq INCREMENT BY -1 RESTART WITH 100000"))
+    monkeypatch.setattr("database.crud.operaciones.TAMANO_LOTE", 7)
+
+    operacion, carga, ventas, costos = _operacion(lineas=20)
+    ids = guardar_operacion_completa(operacion, carga, ventas, costos)
+
+    detalles = _conceptos_por_id(pg_engine, "ventas_detalle", "id_detalle")
+    for venta, ids_venta in zip(ventas, ids["ventas"]):
+        assert [detalles[i] for i in ids_venta["detalles"]] == [d["concepto"] for d in venta["detalles"]]
+    with pg_engine.connect() as conn:
+        clientes = dict(conn.execute(text("SELECT id_venta_master, cliente FROM ventas_master")).all())
+    assert [clientes[v["id_venta_master"]] for v in ids["ventas"]] == ["Cliente 0", "Cliente 1"]
+    costos_db = _conceptos_por_id(pg_engine, "costos", "id_costo")
+    assert [costos_db[i] for i in ids["costos"]] == ["C0", "C1", "C2"]
+
+
+def test_guardado_conserva_tipos(esquema, pg_engine):
+    operacion, carga, ventas, costos = _operacion(lineas=2, costos=1)
+    guardar_operacion_completa(operacion, carga, ventas, costos)
+
+    guardada = obtener_operacion_completa("OP-1")
+    detalle = guardada["ventas"][0]["detalles"][0]
+    assert (detalle["concepto"], detalle["monto"]) == ("V0-0", Decimal("2.50"))
+    assert guardada["ventas"][0]["monto_total"] == Decimal("5.00")
+    assert guardada["costos"][0]["tarifa"] == Decimal("1.50")
+
+
+def test_notas_de_ventas_con_notas_conservan_tipos(esquema, pg_engine):
+    operacion, carga, ventas, costos = _operacion(lineas=2, costos=0)
+    ids = guardar_operacion_completa(operacion, carga, ventas, costos)
+    id_venta = ids["ventas"][0]["id_venta_master"]
+    with pg_engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO notas_credito (id_operacion, no_factura, tipo_nc, valor_nc, razon, id_venta_master)
+            VALUES (:op, 'F-1', 'Valor Parcial', 1.10, 'Descuento', :venta),
+                   (:op, 'F-2', 'Valor Parcial', 2.25, '', :venta)
+        """), {"op": ids["id_operacion"], "venta": id_venta})
+
+    venta = obtener_ventas_con_notas_credito("OP-1")[0]
+
+    assert venta["notas"] == obtener_notas_credito_por_venta(id_venta)
+    assert [n["valor_nc"] for n in venta["notas"]] == [Decimal("1.10"), Decimal("2.25")]
+    assert venta["saldo"] == venta["monto_total"] - sum(n["valor_nc"] for n in venta["notas"])
@@ -0,0 +1,31 @@
+from sqlalchemy import text
+
+from database import migrate
+
+
+def _migraciones(tmp_path, monkeypatch, archivos):
+    for nombre, sql in archivos.items():
+        (tmp_path / f"{nombre}.sql").write_text(sql, encoding="utf-8")
+    monkeypatch.setattr(migrate, "MIGRATIONS_DIR", str(tmp_path))
+
+
+def test_migracion_fallida_se_informa_y_queda_pendiente(pg_engine, tmp_path, monkeypatch, capsys):
+    _migraciones(tmp_path, monkeypatch, {
+        "0001_tabla": "CREATE TABLE prueba (id INT);",
+        "0002_extension": "CREATE EXTENSION extension_que_no_existe;",
+        "0003_indice": "CREATE INDEX idx_prueba ON prueba (id);",
+    })
+
+    assert migrate.main([]) == 1
+    assert "0002_extension" in capsys.readouterr().err
+    assert migrate.migraciones_pendientes() == ["0002_extension", "0003_indice"]
+    with pg_engine.connect() as conn:
+        assert conn.execute(text("SELECT to_regclass('prueba')")).scalar() is not None
+
+
+def test_sin_tabla_de_control_todas_estan_pendientes(pg_engine, tmp_path, monkeypatch):
+    _migraciones(tmp_path, monkeypatch, {"0001_tabla": "CREATE TABLE prueba (id INT);"})
+
+    assert migrate.migraciones_pendientes() == ["0001_tabla"]
+    assert migrate.main([]) == 0
+    assert migrate.migraciones_pendientes() == []
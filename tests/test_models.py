@@ -0,0 +1,85 @@
+import pickle
+from decimal import Decimal
+
+from database.models import Carga, CreditNote, Operation, SaleBlock, Surcharge
+from services.pdf_generator.generate_preorden import generate_archives
+from services.pricing import summarize
+from services.sheets_writer import build_nota_credito_row, build_order_row
+from ui.helpers import reconstruir_sales_blocks
+
+VENTAS_DB = [{
+    "id_venta_master": 7, "cliente": "Cliente", "comentarios": "nota",
+    "detalles": [
+        {"id_detalle": 70, "concepto": "Flete", "cantidad": Decimal("2.00"), "tarifa": Decimal("10.50"),
+         "monto": Decimal("21.00"), "moneda": "USD"},
+        {"id_detalle": 71, "concepto": "BL", "cantidad": None, "tarifa": None, "monto": None, "moneda": "COP"},
+    ],
+}]
+
+
+def _estado():
+    return {
+        "no_solicitud": "M-1", "commercial": "Comercial", "cargo_type": "Carga suelta",
+        "unidad_medida": "KG", "cantidad_suelta": 3.0, "final_comments_cost": "costos",
+        "sales_blocks": reconstruir_sales_blocks(VENTAS_DB),
+        "cost_surcharges": [Surcharge("Handling", 1.0, 4.0, 4.0, "USD", id=5)],
+    }
+
+
+def test_operacion_cargada_se_guarda_con_sus_ids():
+    operacion, carga, ventas, costos = Operation.from_session(_estado()).to_db()
+
+    assert operacion == {"no_solicitud": "M-1", "comercial": "Comercial"}
+    assert (carga["tipo_carga"], carga["detalle"], carga["unidad_medida"], carga["cantidad_suelta"]) == \
+        ("Carga suelta", None, "KG", 3.0)
+    assert ventas == [{
+        "id_venta_master": 7, "cliente": "Cliente", "moneda": "USD", "comentarios": "nota",
+        "detalles": [
+            {"id_detalle": 70, "concepto": "Flete", "cantidad": 2.0, "tarifa": 10.5, "monto": 21.0, "moneda": "USD"},
+            {"id_detalle": 71, "concepto": "BL", "cantidad": 0.0, "tarifa": 0.0, "monto": 0.0, "moneda": "COP"},
+        ],
+    }]
+    assert costos == [{"id_costo": 5, "concepto": "Handling", "cantidad": 1.0, "tarifa": 4.0, "monto": 4.0,
+                       "moneda": "USD", "comentarios": "costos"}]
+
+
+def test_register_ids_actualiza_los_objetos_de_la_sesion():
+    estado = _estado()
+    estado["sales_blocks"].append(SaleBlock("Nuevo", surcharges=[Surcharge("Flete", 1, 1, 1)]))
+    operacion = Operation.from_session(estado)
+
+    operacion.register_ids({
+        "ventas": [{"id_venta_master": 7, "detalles": [70, 71]}, {"id_venta_master": 8, "detalles": [80]}],
+        "costos": [5],
+    })
+    nuevo = estado["sales_blocks"][1]
+    assert (nuevo.id_venta_master, nuevo.surcharges[0].id) == (8, 80)
+
+
+def test_lectura_como_diccionario():
+    s = Surcharge("Flete", 2, 3)
+    assert "total" not in s and s.get("total", 6) == 6
+    s.total = 6.0
+    assert "total" in s and s["total"] == 6.0
+    assert "inexistente" not in s and s.get("inexistente") is None
+    assert not hasattr(s, "__dict__")
+
+
+def test_pdf_sheets_y_precios_leen_los_objetos_sin_convertir():
+    bloque = reconstruir_sales_blocks(VENTAS_DB)[0]
+    carga = Carga.from_session({"cargo_type": "Contenedor", "pol_aol": "CTG", "pod_aod": "MIA"})
+    venta_info = {"no_solicitud": "M-1", "comercial": "Comercial", "carga": carga,
+                  "venta": {"cliente": bloque.client, "sales_surcharges": bloque.surcharges}}
+
+    assert dict(summarize(bloque.surcharges).totals) == {"USD": Decimal("21.00"), "COP": Decimal("0.00")}
+    fila = build_order_row(venta_info, "VENTA")
+    assert fila[4] == "CTG -> MIA" and "Total Venta USD: 21.00 USD" in fila[6]
+    assert generate_archives(venta_info).startswith(b"%PDF")
+
+    # Los trabajos del pool de PDF viajan por pickle
+    assert pickle.loads(pickle.dumps(venta_info))["venta"]["sales_surcharges"] == bloque.surcharges
+
+
+def test_nota_credito_se_pasa_tal_cual_a_la_hoja():
+    nota = CreditNote("M-1", 7, "F-1", "Valor Total", Decimal("10.00"), "razón", id_nc=3)
+    assert build_nota_credito_row(nota)[:6] == [3, "M-1", "F-1", "Valor Total", Decimal("10.00"), "razón"]
@@ -0,0 +1,107 @@
+import pytest
+
+from fake_gspread import FakeApi, FakeWorksheet
+from services import sheets_client, sheets_writer
+
+
+@pytest.fixture
+def hoja(monkeypatch):
+    """
+    Pestaña NOTA CREDITO falsa con las notas 1..10 y un índice vacío.
+    """
+    monkeypatch.setattr(sheets_writer, "_nota_index", {})
+    monkeypatch.setattr(sheets_writer, "_nota_index_built", {})
+    monkeypatch.setattr(sheets_client, "_client", sheets_client.SheetsClient(requests_per_minute=6000, sleep=lambda s: None))
+    ws = FakeWorksheet(FakeApi(), "fake-orden", sheets_writer.NOTA_CREDITO_SHEET)
+    ws.rows.append(list(sheets_writer.NOTA_CREDITO_HEADERS))
+    ws.rows.extend([i, f"M-{i}", f"F-{i}", "Valor Total", 10, "", ""] for i in range(1, 11))
+    return ws
+
+
+def _ids(ws):
+    return [fila[0] for fila in ws.rows[1:]]
+
+
+def test_borrados_usan_el_indice(hoja):
+    sheets_writer._delete_nota_credito_row(hoja, 3)
+    sheets_writer._delete_nota_credito_row(hoja, 7)
+
+    assert _ids(hoja) == [1, 2, 4, 5, 6, 8, 9, 10]
+    assert hoja.api.calls == {"col_values": 1, "acell": 2, "delete_rows": 2}
+
+
+def test_id_ausente_no_relee_un_indice_recien_construido(hoja):
+    sheets_writer._delete_nota_credito_row(hoja, 2)
+    sheets_writer._delete_nota_credito_row(hoja, 99)
+    sheets_writer._delete_nota_credito_row(hoja, 99)
+
+    assert hoja.api.calls["col_values"] == 1
+    assert _ids(hoja) == [1, 3, 4, 5, 6, 7, 8, 9, 10]
+
+
+def test_id_ausente_en_indice_viejo_lo_reconstruye_una_vez(hoja):
+    sheets_writer._delete_nota_credito_row(hoja, 2)
+    # Alguien agregó la nota 11 a mano después de construir el índice
+    hoja.rows.append([11, "M-11", "F-11", "Valor Total", 10, "", ""])
+
+    sheets_writer._delete_nota_credito_row(hoja, 11)
+    assert hoja.api.calls["col_values"] == 1
+    assert 11 in _ids(hoja)
+
+    # El índice envejece más allá de NOTA_INDEX_FRESH_S
+    clave = sheets_writer._nota_index_key(hoja)
+    sheets_writer._nota_index_built[clave] -= sheets_writer.NOTA_INDEX_FRESH_S + 1
+    sheets_writer._delete_nota_credito_row(hoja, 11)
+    assert hoja.api.calls["col_values"] == 2
+    assert 11 not in _ids(hoja)
+
+
+def test_filas_corridas_con_indice_fresco_lo_reconstruyen(hoja):
+    sheets_writer._delete_nota_credito_row(hoja, 1)
+    # Otra réplica borró la nota 3: las filas de abajo subieron una posición
+    del hoja.rows[2]
+
+    sheets_writer._delete_nota_credito_row(hoja, 5)
+    assert _ids(hoja) == [2, 4, 6, 7, 8, 9, 10]
+    assert hoja.api.calls == {"col_values": 2, "acell": 3, "delete_rows": 2}
+
+
+def test_filas_reordenadas_a_mano_con_indice_fresco(hoja):
+    sheets_writer._delete_nota_credito_row(hoja, 1)
+    hoja.rows[1:] = sorted(hoja.rows[1:], key=lambda fila: -fila[0])
+
+    sheets_writer._delete_nota_credito_row(hoja, 5)
+    assert _ids(hoja) == [10, 9, 8, 7, 6, 4, 3, 2]
+    assert hoja.api.calls["col_values"] == 2
+
+
+def test_fila_que_no_coincide_tras_reconstruir_lanza_error(hoja, monkeypatch):
+    sheets_writer._delete_nota_credito_row(hoja, 1)
+    columna_vieja = [str(fila[0]) for fila in hoja.rows]
+    del hoja.rows[2]
+    # Las filas se siguen moviendo mientras se lee la columna
+    monkeypatch.setattr(hoja, "col_values", lambda col: columna_vieja)
+
+    with pytest.raises(RuntimeError, match="no tiene la nota 5"):
+        sheets_writer._delete_nota_credito_row(hoja, 5)
+    assert 5 in _ids(hoja)
+
+
+def test_id_ausente_tras_reconstruir_ya_no_esta(hoja):
+    sheets_writer._delete_nota_credito_row(hoja, 1)
+    # La nota 5 se borró por fuera y otra fila ocupa su lugar
+    del hoja.rows[4]
+
+    sheets_writer._delete_nota_credito_row(hoja, 5)
+    assert _ids(hoja) == [2, 3, 4, 6, 7, 8, 9, 10]
+    assert hoja.api.calls["col_values"] == 2
+
+
+def test_append_del_outbox_actualiza_el_indice(hoja):
+    sheets_writer._delete_nota_credito_row(hoja, 10)
+    filas = [[11, "M-11", "F-11", "Valor Total", 10, "", ""]]
+    sheets_writer._index_appended_notas(hoja, filas, hoja.append_rows(filas))
+
+    sheets_writer._delete_nota_credito_row(hoja, 11)
+    assert 11 not in _ids(hoja)
+    assert hoja.api.calls["col_values"] == 1
@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+
+import PyPDF2
+import pytest
+
+from services.pdf_generator import generate_anticipo
+from services.pdf_generator.generate_preorden import generate_archives
+
+GENERACIONES = 50
+# La plantilla de anticipo es pesada (~0,7 s por combinación en un núcleo)
+ANTICIPOS = 16
+
+
+def _texto(pdf) -> str:
+    reader = PyPDF2.PdfReader(BytesIO(pdf) if isinstance(pdf, bytes) else pdf)
+    return "\n".join(page.extract_text() for page in reader.pages)
+
+
+def _total(monto) -> str:
+    # Mismo formato que draw_overlay_page para los totales
+    return f"${monto:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def _orden(i):
+    """
+    Orden única por índice: alterna ventas/costos y plantillas de una y dos
+    páginas (más de 10 recargos).
+    """
+    variant = "costos" if i % 2 else "ventas"
+    recargos = [
+        {"concept": f"FLETE-{i}-{j}", "quantity": 1.0, "rate": float(i + 1), "total": float(i + 1), "currency": "USD"}
+        for j in range(12 if i % 3 == 0 else 3)
+    ]
+    info = {
+        "no_solicitud": f"SOL-{i:04d}",
+        "comercial": "Comercial",
+        "carga": {"cargo_type": "Contenedor", "container_details": {}},
+        "comentarios": f"comentario {i}",
+    }
+    if variant == "ventas":
+        info["venta"] = {"cliente": f"CLIENTE {i}", "sales_surcharges": recargos}
+    else:
+        info["cost_surcharges"] = recargos
+    return info, variant
+
+
+def _verificar_orden(i, pdf):
+    info, variant = _orden(i)
+    texto = _texto(pdf)
+    recargos = info["venta"]["sales_surcharges"] if variant == "ventas" else info["cost_surcharges"]
+
+    assert set(re.findall(r"SOL-\d{4}", texto)) == {f"SOL-{i:04d}"}
+    assert set(re.findall(r"FLETE-(\d+)-\d+", texto)) == {str(i)}
+    assert len(re.findall(rf"FLETE-{i}-\d+", texto)) == len(recargos)
+    assert f"COMENTARIO {i}" in texto
+    if variant == "ventas":
+        assert f"CLIENTE {i}\n" in texto
+        assert _total(len(recargos) * (i + 1)) in texto
+
+
+def _generar(i):
+    info, variant = _orden(i)
+    return generate_archives(info, variant)
+
+
+def test_generaciones_en_hilos_no_se_mezclan():
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        resultados = list(pool.map(_generar, range(GENERACIONES)))
+
+    for i, pdf in enumerate(resultados):
+        _verificar_orden(i, pdf)
+
+
+def test_generaciones_en_procesos_no_se_mezclan():
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=4, mp_context=contexto) as pool:
+        resultados = list(pool.map(_generar, range(GENERACIONES)))
+
+    for i, pdf in enumerate(resultados):
+        _verificar_orden(i, pdf)
+
+
+def _anticipo(i, output_path):
+    data = {
+        "no_solicitud": f"ANT-{i:04d}",
+        "commercial": "Comercial",
+        "client": f"CLIENTE ANTICIPO {i}",
+        "customer_name": "Contacto",
+        "customer_phone": "300",
+        "customer_email": "c@example.com",
+        "transport_type": "Marítimo",
+        "operation_type": "Importación",
+        "additional_surcharges": {"20' Dry": [{"concept": f"RECARGO-{i}", "cost": float(i), "currency": "USD"}]},
+        "total_cop_trm": f"TOTAL-{i}",
+        "trm": "",
+    }
+    return generate_anticipo.generate_pdf(data, output_path=output_path)
+
+
+@pytest.mark.parametrize("mismo_archivo", [False, True])
+def test_anticipos_en_hilos_escriben_archivos_completos(tmp_path, mismo_archivo):
+    def destino(i):
+        return str(tmp_path / ("anticipo.pdf" if mismo_archivo else f"anticipo_{i}.pdf"))
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda i: _anticipo(i, destino(i)), range(ANTICIPOS)))
+
+    # Escritura atómica: ningún temporal huérfano y cada archivo es un PDF completo
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
+    for i in ([None] if mismo_archivo else range(ANTICIPOS)):
+        with open(destino(i), "rb") as f:
+            texto = _texto(f)
+        ids = set(re.findall(r"ANT-(\d{4})", texto))
+        assert len(ids) == 1
+        n = int(ids.pop())
+        assert mismo_archivo or n == i
+        assert f"RECARGO-{n}" in texto and f"TOTAL-{n}" in texto
@@ -0,0 +1,90 @@
+import builtins
+import os
+from collections import Counter
+
+import pytest
+
+from services.pdf_generator import resources
+from services.pdf_generator.generate_preorden import generate_archives
+
+GENERACIONES = 100
+RESOURCES_DIR = os.path.join(resources.PROJECT_ROOT, "resources")
+
+
+def _orden(i):
+    variant = "costos" if i % 2 else "ventas"
+    recargos = [
+        {"concept": f"FLETE-{i}-{j}", "quantity": 1.0, "rate": 10.0, "total": 10.0, "currency": "USD"}
+        for j in range(12 if i % 3 == 0 else 3)
+    ]
+    info = {"no_solicitud": f"SOL-{i:04d}", "comercial": "Comercial", "carga": {"cargo_type": "Contenedor"}}
+    if variant == "ventas":
+        info["venta"] = {"cliente": f"CLIENTE {i}", "sales_surcharges": recargos}
+    else:
+        info["cost_surcharges"] = recargos
+    return info, variant
+
+
+@pytest.fixture
+def lecturas(monkeypatch):
+    """
+    Cuenta los open() de archivos de resources/ y los os.path.getmtime.
+    """
+    conteo = {"open": Counter(), "getmtime": 0}
+    open_original = builtins.open
+    getmtime_original = os.path.getmtime
+
+    def open_contado(file, *args, **kwargs):
+        if isinstance(file, (str, os.PathLike)) and os.path.abspath(file).startswith(RESOURCES_DIR):
+            conteo["open"][os.path.relpath(file, resources.PROJECT_ROOT)] += 1
+        return open_original(file, *args, **kwargs)
+
+    def getmtime_contado(path):
+        conteo["getmtime"] += 1
+        return getmtime_original(path)
+
+    monkeypatch.setattr(builtins, "open", open_contado)
+    monkeypatch.setattr(os.path, "getmtime", getmtime_contado)
+    return conteo
+
+
+def test_registro_en_frio_lee_cada_recurso_una_vez(monkeypatch, lecturas):
+    monkeypatch.setattr(resources, "_templates", {})
+    monkeypatch.setattr(resources, "_fonts_registered", False)
+
+    for i in range(GENERACIONES):
+        generate_archives(*_orden(i))
+
+    assert dict(lecturas["open"]) == {
+        "resources/fonts/OpenSauceSans-Regular.ttf": 1,
+        "resources/fonts/OpenSauceSans-Bold.ttf": 1,
+        "resources/templates/ORDER1.pdf": 1,
+        "resources/templates/ORDER2.pdf": 1,
+        "resources/templates/PRE_ORDER1.pdf": 1,
+        "resources/templates/PRE_ORDER2.pdf": 1,
+    }
+
+
+def test_registro_caliente_no_lee_archivos(lecturas):
+    resources.warm_up()
+    lecturas["open"].clear()
+    lecturas["getmtime"] = 0
+
+    for i in range(GENERACIONES):
+        generate_archives(*_orden(i))
+
+    assert sum(lecturas["open"].values()) == 0
+    # Solo un stat por generación para detectar plantillas cambiadas en disco
+    assert lecturas["getmtime"] == GENERACIONES
+
+
+def test_plantilla_cambiada_en_disco_se_recarga(tmp_path):
+    original = resources.resource_path("resources/templates/ORDER1.pdf")
+    copia = tmp_path / "ORDER1.pdf"
+    copia.write_bytes(open(original, "rb").read())
+
+    primera = resources.get_template(str(copia))
+    assert resources.get_template(str(copia)) is primera
+
+    os.utime(copia, (primera.mtime + 10, primera.mtime + 10))
+    assert resources.get_template(str(copia)) is not primera
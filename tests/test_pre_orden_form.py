@@ -0,0 +1,97 @@
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import forms.pre_orden_form as pre_orden_form
+from database.crud import clientes
+from database.models import SaleBlock, Surcharge
+
+
+def _app():
+    from forms.pre_orden_form import forms
+    forms()
+
+
+@pytest.fixture
+def formulario(monkeypatch):
+    directorio = clientes.DirectorioClientes([{"cliente": "Cliente 1", "nit": "1"}])
+    monkeypatch.setattr(pre_orden_form, "obtener_directorio_clientes", lambda: directorio)
+
+    llamadas = []
+    render_profit = pre_orden_form._render_profit
+
+    def contar(profit_area):
+        llamadas.append(profit_area)
+        render_profit(profit_area)
+
+    monkeypatch.setattr(pre_orden_form, "_render_profit", contar)
+
+    at = AppTest.from_function(_app, default_timeout=60)
+    at.session_state["form_visible"] = True
+    at.session_state["sales_blocks"] = [
+        SaleBlock(f"Cliente {v}", surcharges=[Surcharge(f"Flete {i}", 1, 10) for i in range(3)]) for v in range(3)
+    ]
+    at.session_state["cost_surcharges"] = [Surcharge("Handling", 1, 4)]
+    return at, llamadas
+
+
+def test_profit_se_dibuja_una_vez_por_ejecucion_completa(formulario):
+    at, llamadas = formulario
+
+    at.run()
+    assert not at.exception
+    assert len(llamadas) == 1
+    assert "**Profit USD**: 86.00 USD" in [m.value for m in at.markdown]
+
+    llamadas.clear()
+    at.button(key="add_sales_block").click().run()
+    assert not at.exception
+    assert len(llamadas) == 1
+    assert at.session_state["profit_diferido"] is False
+
+
+def test_numeros_de_contenedor_invalidos_muestran_aviso(formulario):
+    at, _ = formulario
+    at.session_state["container_type"] = ["20' Dry Standard"]
+    at.session_state["qty_20' Dry Standard"] = 2
+    at.session_state["containers_20' Dry Standard"] = "csqu3054383\nMSCU1234565"
+
+    at.run()
+
+    assert not at.exception
+    assert "Dígito de control o formato ISO 6346 inválido: MSCU1234565" in [w.value for w in at.warning]
+    assert at.session_state["container_data"]["20' Dry Standard"]["names"] == ["CSQU3054383", "MSCU1234565"]
+
+
+def _editar(at, key, cambios):
+    nonce = at.session_state[f"{key}_editor"]["nonce"]
+    at.session_state[f"{key}_{nonce}"] = {"edited_rows": {}, "added_rows": [], "deleted_rows": [], **cambios}
+    at.run()
+    assert not at.exception
+    return at.session_state[f"{key}_editor"]["nonce"] != nonce
+
+
+def test_columna_total_se_recalcula_en_la_misma_ejecucion(formulario):
+    at, _ = formulario
+    at.run()
+
+    nueva_instantanea = _editar(at, "sale_surcharges_0", {
+        "edited_rows": {0: {"quantity": 3}},
+        "added_rows": [{"concept": "Nuevo", "quantity": 2, "rate": 1.25, "currency": "COP"}],
+        "deleted_rows": [1],
+    })
+
+    assert nueva_instantanea
+    recargos = at.session_state["sales_blocks"][0].surcharges
+    assert [(s.concept, s.total, s.currency) for s in recargos] == [
+        ("Flete 0", 30.0, "USD"), ("Flete 2", 10.0, "USD"), ("Nuevo", 2.5, "COP"),
+    ]
+    grilla = at.dataframe[0].value
+    assert list(grilla["total"]) == [30.0, 10.0, 2.5]
+
+
+def test_editar_sin_cambiar_totales_conserva_la_grilla(formulario):
+    at, _ = formulario
+    at.run()
+
+    assert not _editar(at, "sale_surcharges_0", {"edited_rows": {1: {"concept": "BL"}}})
+    assert [s.concept for s in at.session_state["sales_blocks"][0].surcharges] == ["Flete 0", "BL", "Flete 2"]
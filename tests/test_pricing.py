@@ -0,0 +1,31 @@
+from decimal import Decimal
+
+from services.pricing import profit, summarize
+
+
+def test_moneda_se_normaliza_a_mayusculas():
+    resumen = summarize([
+        {"total": 10, "currency": "usd"},
+        {"total": 5, "currency": "USD"},
+        {"total": 1000, "currency": "cop"},
+        {"total": 1},
+    ])
+    assert dict(resumen.totals) == {"USD": Decimal("16.00"), "COP": Decimal("1000.00")}
+
+
+def test_cada_linea_se_redondea_a_centavos_antes_de_sumar():
+    # 3 x 0.335 = 1.005 -> 1.01 por línea; sin redondear serían 2.01
+    recargos = [{"quantity": 3, "rate": 0.335, "currency": "USD"}] * 2
+    resumen = summarize(recargos)
+
+    assert resumen.line_totals == (Decimal("1.01"), Decimal("1.01"))
+    assert resumen.totals["USD"] == Decimal("2.02")
+    assert resumen.grand_total == Decimal("2.02")
+    # Markup del 4% por línea: 1.005 * 1.04 = 1.0452 -> 1.05
+    assert resumen.marked_up_totals["USD"] == Decimal("2.10")
+
+
+def test_profit_por_moneda():
+    ventas = summarize([{"total": 100, "currency": "USD"}]).totals
+    costos = summarize([{"total": 40.5, "currency": "usd"}]).totals
+    assert profit(ventas, costos) == {"USD": Decimal("59.50")}
@@ -0,0 +1,153 @@
+import random
+
+import gspread
+import pytest
+
+from fake_gspread import FakeApi, FakeWorksheet, api_error, connection_error
+from services import sheets_client
+from services.sheets_client import SheetsClient, TokenBucket
+from ui import helpers
+
+
+class FakeClock:
+    """
+    Reloj manual: sleep() avanza el tiempo y guarda cada espera.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def reloj():
+    return FakeClock()
+
+
+@pytest.fixture
+def hoja():
+    ws = FakeWorksheet(FakeApi(), "fake", "VENTA")
+    ws.rows.append(["encabezado"])
+    return ws
+
+
+@pytest.fixture(autouse=True)
+def sin_jitter(monkeypatch):
+    # Backoff completo (sin jitter) para poder comprobar las esperas
+    monkeypatch.setattr(random, "uniform", lambda a, b: b)
+
+
+def _cliente(reloj, **kwargs):
+    kwargs.setdefault("requests_per_minute", 600)
+    return SheetsClient(sleep=reloj.sleep, clock=reloj, **kwargs)
+
+
+@pytest.mark.parametrize("error", [api_error(429), api_error(500), api_error(503), connection_error()])
+def test_reintenta_errores_transitorios(reloj, hoja, error):
+    hoja.api.fail("row_values", error, error)
+    client = _cliente(reloj)
+
+    assert client.call("row_values", hoja.row_values, 1) == ["encabezado"]
+    assert hoja.api.calls["row_values"] == 3
+    assert reloj.sleeps == [1.0, 2.0]
+
+    m = client.metrics()["row_values"]
+    assert (m["calls"], m["errors"], m["retries"]) == (1, 0, 2)
+    assert m["throttled"] == (2 if getattr(error, "code", None) == 429 else 0)
+
+
+def test_se_rinde_despues_de_max_retries(reloj, hoja):
+    hoja.api.fail("append_rows", *[api_error(429)] * 10)
+    client = _cliente(reloj, max_retries=3)
+
+    with pytest.raises(gspread.exceptions.APIError):
+        client.append_rows(hoja, [["x"]])
+    assert hoja.api.calls["append_rows"] == 4
+    assert reloj.sleeps == [1.0, 2.0, 4.0]
+    assert hoja.rows == [["encabezado"]]
+
+    m = client.metrics()["append_rows"]
+    assert (m["calls"], m["errors"], m["retries"], m["throttled"]) == (1, 1, 3, 4)
+
+
+def test_backoff_limitado_por_max_delay(reloj, hoja):
+    hoja.api.fail("row_values", *[api_error(503)] * 5)
+    client = _cliente(reloj, max_retries=5, max_delay=4.0)
+
+    client.call("row_values", hoja.row_values, 1)
+    assert reloj.sleeps == [1.0, 2.0, 4.0, 4.0, 4.0]
+
+
+@pytest.mark.parametrize("error", [api_error(400), api_error(403), api_error(404), ValueError("fila inválida")])
+def test_no_reintenta_errores_permanentes(reloj, hoja, error):
+    hoja.api.fail("row_values", error)
+    client = _cliente(reloj)
+
+    with pytest.raises(type(error)):
+        client.call("row_values", hoja.row_values, 1)
+    assert hoja.api.calls["row_values"] == 1
+    assert reloj.sleeps == []
+    assert client.metrics()["row_values"]["errors"] == 1
+
+
+def test_bucket_marca_el_ritmo_al_agotarse(reloj, hoja):
+    client = _cliente(reloj, requests_per_minute=60)
+
+    # La capacidad inicial (un minuto de presupuesto) sale sin esperar
+    for _ in range(60):
+        client.call("row_values", hoja.row_values, 1)
+    assert reloj.sleeps == []
+
+    # Después, una llamada por segundo
+    for _ in range(5):
+        client.call("row_values", hoja.row_values, 1)
+    assert reloj.sleeps == pytest.approx([1.0] * 5)
+    assert reloj.now == pytest.approx(5.0)
+    assert client.metrics()["row_values"]["quota_wait_s"] == pytest.approx(5.0)
+
+
+def test_bucket_se_recarga_sin_pasar_la_capacidad(reloj):
+    bucket = TokenBucket(rate=2.0, capacity=4, clock=reloj, sleep=reloj.sleep)
+    for _ in range(4):
+        assert bucket.acquire() == 0.0
+
+    reloj.now += 1.0  # dos tokens
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(0.5)
+
+    reloj.now += 60.0
+    for _ in range(4):
+        assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize("carga, metodo", [
+    (helpers.load_clients, "col_values"),
+    (helpers.load_clients_finance, "get_all_records"),
+])
+def test_lecturas_de_clientes_pasan_por_el_cliente(monkeypatch, reloj, hoja, carga, metodo):
+    hoja.rows = [["cliente"], ["ACME"], ["Globex"]]
+    hoja.api.fail(metodo, api_error(429))
+    client = _cliente(reloj)
+    monkeypatch.setattr(sheets_client, "_client", client)
+    monkeypatch.setattr(helpers.st, "secrets", {"general": {"time_sheet_id": "fake", "data_clientes": "fake"}})
+    monkeypatch.setattr(helpers, "get_worksheet", lambda sheet_id, sheet_name: hoja)
+    carga.clear()
+
+    try:
+        resultado = carga()
+    finally:
+        carga.clear()
+
+    clientes = resultado if isinstance(resultado, list) else resultado["cliente"].tolist()
+    assert clientes == ["ACME", "Globex"]
+    assert hoja.api.calls[metodo] == 2
+    assert client.metrics()[metodo]["throttled"] == 1
@@ -0,0 +1,168 @@
+import pytest
+from sqlalchemy import text
+
+from fake_gspread import FakeClient, api_error
+from services import sheets_client, sheets_outbox, sheets_writer
+
+ORDEN = "fake-orden"
+
+
+@pytest.fixture
+def hojas(monkeypatch, aplicar_sql):
+    """
+    Outbox en un esquema de pruebas y Google Sheets reemplazado por el
+    stand-in local. Devuelve el cliente falso.
+    """
+    aplicar_sql("database/migrations/0004_sheets_outbox.sql", "database/migrations/0005_sheets_outbox_orden.sql")
+
+    gc = FakeClient()
+    cache = sheets_client.WorksheetCache()
+    monkeypatch.setattr(sheets_writer, "_spreadsheet_id", lambda target: f"fake-{target}")
+    monkeypatch.setattr(sheets_writer, "get_gspread_client", lambda: gc)
+    monkeypatch.setattr(sheets_writer, "get_worksheet_cache", lambda: cache)
+    monkeypatch.setattr(sheets_writer, "_nota_index", {})
+    monkeypatch.setattr(sheets_writer, "_nota_index_built", {})
+    monkeypatch.setattr(sheets_client, "_client", sheets_client.SheetsClient(requests_per_minute=6000, sleep=lambda s: None))
+    return gc
+
+
+def _filas(gc, hoja):
+    return gc.spreadsheets[ORDEN].worksheets[hoja].rows[1:]
+
+
+def _pendientes(pg_engine):
+    with pg_engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT accion FROM sheets_outbox WHERE procesado_en IS NULL ORDER BY id_evento"
+        )).scalars().all()
+
+
+def _disponibles_ya(pg_engine):
+    with pg_engine.begin() as conn:
+        conn.execute(text("UPDATE sheets_outbox SET disponible_en = CURRENT_TIMESTAMP - INTERVAL '1 second'"))
+
+
+def _nota(id_nc):
+    return {"id_nc": id_nc, "no_solicitud": "M-1", "no_factura": f"F-{id_nc}", "tipo_nc": "Valor Total", "valor_nc": 10}
+
+
+def _orden(cliente):
+    return {"no_solicitud": "M-1", "comercial": "Comercial", "venta": {"cliente": cliente, "sales_surcharges": []}}
+
+
+def test_appends_de_una_hoja_salen_en_un_solo_append_rows(hojas, pg_engine):
+    sheets_writer.save_order_submissions([(_orden(f"Cliente {i}"), "VENTA") for i in range(3)])
+
+    assert sheets_outbox.process_pending() == 3
+    assert [fila[3] for fila in _filas(hojas, "VENTA")] == ["Cliente 0", "Cliente 1", "Cliente 2"]
+    assert hojas.api.calls["append_rows"] == 1
+    assert _pendientes(pg_engine) == []
+
+
+def test_borrado_no_se_adelanta_al_append_reprogramado(hojas, pg_engine):
+    # El append de la nota falla una vez y queda reprogramado con backoff
+    hojas.api.fail("append_rows", api_error(400))
+    sheets_writer.save_nota_credito(_nota(1))
+    assert sheets_outbox.process_pending() == 0
+
+    # La nota se elimina antes de que el append se reintente
+    sheets_writer.delete_nota_credito_sheet(1)
+    sheets_writer.save_order_submissions([(_orden("Otra hoja"), "VENTA")])
+
+    # Solo avanza la otra pestaña; el borrado espera al append
+    assert sheets_outbox.process_pending() == 1
+    assert [fila[3] for fila in _filas(hojas, "VENTA")] == ["Otra hoja"]
+    assert _pendientes(pg_engine) == ["append", "delete_nota_credito"]
+
+    # Al vencer el backoff salen los dos, en orden: la nota no queda huérfana
+    _disponibles_ya(pg_engine)
+    assert sheets_outbox.process_pending() == 2
+    assert _filas(hojas, "NOTA CREDITO") == []
+    assert _pendientes(pg_engine) == []
+
+
+def test_fallo_dentro_del_lote_retiene_los_eventos_siguientes_de_la_hoja(hojas, pg_engine):
+    sheets_writer.save_nota_credito(_nota(1))
+    assert sheets_outbox.process_pending() == 1
+
+    # Borrado y nuevo append en el mismo lote; el borrado falla
+    sheets_writer.delete_nota_credito_sheet(1)
+    sheets_writer.save_nota_credito(_nota(2))
+    hojas.api.fail("acell", api_error(400))
+
+    assert sheets_outbox.process_pending() == 0
+    assert [str(fila[0]) for fila in _filas(hojas, "NOTA CREDITO")] == ["1"]
+    assert _pendientes(pg_engine) == ["delete_nota_credito", "append"]
+
+    _disponibles_ya(pg_engine)
+    assert sheets_outbox.process_pending() == 2
+    assert [str(fila[0]) for fila in _filas(hojas, "NOTA CREDITO")] == ["2"]
+
+
+def test_eventos_agotados_no_bloquean_la_hoja(hojas, pg_engine):
+    hojas.api.fail("append_rows", api_error(400))
+    sheets_writer.save_nota_credito(_nota(1))
+    assert sheets_outbox.process_pending() == 0
+    with pg_engine.begin() as conn:
+        conn.execute(text("UPDATE sheets_outbox SET intentos = :n"), {"n": sheets_outbox.MAX_ATTEMPTS})
+
+    sheets_writer.save_nota_credito(_nota(2))
+    assert sheets_outbox.process_pending() == 1
+    assert [str(fila[0]) for fila in _filas(hojas, "NOTA CREDITO")] == ["2"]
+
+
+def test_un_solo_proceso_drena_la_cola(hojas, pg_engine):
+    sheets_writer.save_nota_credito(_nota(1))
+    with pg_engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": sheets_outbox.OUTBOX_LOCK_ID})
+        conn.commit()
+        assert sheets_outbox.process_pending() == 0
+        conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": sheets_outbox.OUTBOX_LOCK_ID})
+        conn.commit()
+    assert sheets_outbox.process_pending() == 1
+
+
+def _transacciones_abiertas(pg_engine):
+    with pg_engine.connect() as conn:
+        return conn.execute(text("""
+            SELECT count(*) FROM pg_stat_activity
+            WHERE state LIKE 'idle in transaction%%' AND pid <> pg_backend_pid()
+        """)).scalar()
+
+
+def test_llamadas_a_google_fuera_de_transaccion(hojas, pg_engine, monkeypatch):
+    abiertas = []
+    aplicar = sheets_writer.apply_outbox_events
+
+    def aplicar_y_medir(*args):
+        abiertas.append(_transacciones_abiertas(pg_engine))
+        return aplicar(*args)
+
+    monkeypatch.setattr(sheets_writer, "apply_outbox_events", aplicar_y_medir)
+    sheets_writer.save_order_submissions([(_orden("Cliente"), "VENTA")])
+    sheets_writer.save_nota_credito(_nota(1))
+
+    assert sheets_outbox.process_pending() == 2
+    assert abiertas == [0, 0]
+
+
+def test_caida_a_mitad_de_lote_conserva_lo_enviado(hojas, pg_engine, monkeypatch):
+    aplicar = sheets_writer.apply_outbox_events
+
+    def aplicar_y_caer(target, sheet, action, payloads):
+        if sheet == sheets_writer.NOTA_CREDITO_SHEET:
+            raise SystemExit("proceso terminado")
+        return aplicar(target, sheet, action, payloads)
+
+    monkeypatch.setattr(sheets_writer, "apply_outbox_events", aplicar_y_caer)
+    sheets_writer.save_order_submissions([(_orden("Cliente"), "VENTA")])
+    sheets_writer.save_nota_credito(_nota(1))
+
+    with pytest.raises(SystemExit):
+        sheets_outbox.process_pending()
+    # El tramo de VENTA ya quedó marcado; solo la nota sigue pendiente
+    assert _pendientes(pg_engine) == ["append"]
+
+    monkeypatch.setattr(sheets_writer, "apply_outbox_events", aplicar)
+    assert sheets_outbox.process_pending() == 1
+    assert [fila[3] for fila in _filas(hojas, "VENTA")] == ["Cliente"]
@@ -0,0 +1,44 @@
+import pytest
+
+from ui.validators import container_check_digit, is_valid_container_number, parse_container_numbers
+
+
+@pytest.mark.parametrize("numero, digito", [
+    ("CSQU3054383", 3),
+    ("MSKU9070323", 3),
+    ("MSCU1234566", 6),
+])
+def test_digito_de_control(numero, digito):
+    assert container_check_digit(numero) == digito
+    assert is_valid_container_number(numero)
+
+
+@pytest.mark.parametrize("numero", [
+    "MSCU1234565",   # dígito de control equivocado (es 6)
+    "CSQU3054384",
+    "CSQX3054383",   # categoría distinta de U, J o Z
+    "CSQU305438",    # faltan dígitos
+    "C5QU3054383",   # número en el código del propietario
+    "",
+])
+def test_numeros_invalidos(numero):
+    assert not is_valid_container_number(numero)
+
+
+def test_minusculas_y_separadores_internos_se_normalizan():
+    assert is_valid_container_number("csqu 305438-3")
+    assert parse_container_numbers("msku.907032/3") == (["MSKU9070323"], [])
+
+
+def test_lista_pegada_con_separadores():
+    texto = "CSQU3054383\r\nmsku9070323, MSCU1234565;\tCSQU3054383\n\n ;"
+    numeros, invalidos = parse_container_numbers(texto)
+
+    # Orden de entrada, sin duplicados; los inválidos se guardan y se listan aparte
+    assert numeros == ["CSQU3054383", "MSKU9070323", "MSCU1234565"]
+    assert invalidos == ["MSCU1234565"]
+
+
+def test_texto_vacio():
+    assert parse_container_numbers("") == ([], [])
+    assert parse_container_numbers(None) == ([], [])
@@ -1,22 +1,29 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
 import streamlit as st
-import gspread
-import pandas as pd
 from database.crud.operaciones import obtener_operacion_completa
+from database.models import SaleBlock, Surcharge
+from services import sheets_client
+from services.sheets_client import get_sheets_client, get_worksheet_cache
+
+# pandas y gspread se importan dentro de las funciones que los usan
+if TYPE_CHECKING:
+    import gspread
+    import pandas as pd
 
-@st.cache_resource(ttl=3600)
 def get_gspread_client() -> gspread.Client:
-    credentials = st.secrets["google_sheets_credentials"]
-    return gspread.service_account_from_dict(credentials)
+    # Cliente compartido con services.sheets_writer (se crea una sola vez)
+    return sheets_client.get_gspread_client()
 
 
 def get_worksheet(sheet_id: str, sheet_name: str) -> gspread.Worksheet | None:
+    import gspread
     gc = get_gspread_client()
     try:
-        ss = gc.open_by_key(sheet_id)
-        if sheet_name not in (ws.title for ws in ss.worksheets()):
-            st.error(f"❌ La pestaña '{sheet_name}' no existe en la hoja.")
-            return None
-        return ss.worksheet(sheet_name)
+        return get_worksheet_cache().get(gc, sheet_id, sheet_name, create=False)
+    except gspread.exceptions.WorksheetNotFound:
+        st.error(f"❌ La pestaña '{sheet_name}' no existe en la hoja.")
     except gspread.exceptions.SpreadsheetNotFound:
         st.error("❌ No se encontró la hoja de cálculo con el ID proporcionado.")
     except Exception as e:
@@ -33,11 +40,34 @@ def load_clients() -> list[str]:
     if ws is None:
         return []
 
-    clientes = ws.col_values(1)    # primera columna
+    clientes = get_sheets_client().call("col_values", ws.col_values, 1)    # primera columna
     return clientes[1:]            # omite encabezado
 
+def filtrar_clientes(clients_list: list[str], search: str, limit: int = 20) -> list[str]:
+    """
+    Filtra una lista de nombres de clientes para el typeahead: primero los
+    que empiezan por `search`, luego los que lo contienen.
+    """
+    search = (search or "").strip().lower()
+    if not search:
+        return clients_list[:limit]
+
+    prefix, contains = [], []
+    for name in clients_list:
+        lowered = name.lower()
+        if lowered.startswith(search):
+            prefix.append(name)
+            if len(prefix) >= limit:
+                break
+        elif search in lowered and len(contains) < limit:
+            contains.append(name)
+
+    return (prefix + contains)[:limit]
+
+
 @st.cache_data(ttl=3600)
 def load_clients_finance() -> pd.DataFrame:
+    import pandas as pd
     sheet_id   = st.secrets["general"]["data_clientes"]
     sheet_name = "clientes"
 
@@ -45,7 +75,7 @@ def load_clients_finance() -> pd.DataFrame:
     if ws is None:
         return pd.DataFrame()
 
-    data = ws.get_all_records()
+    data = get_sheets_client().call("get_all_records", ws.get_all_records)
     return pd.DataFrame(data)
 
 
@@ -147,8 +177,7 @@ def cargar_operacion_en_formulario(no_solicitud):
         for c_type, c_data in detalle.items():
             qty_key = f"qty_{c_type}"
             st.session_state[qty_key] = c_data.get("qty", 0)
-            for idx, name in enumerate(c_data.get("names", [])):
-                st.session_state[f"name_{c_type}_{idx}"] = name
+            st.session_state[f"containers_{c_type}"] = "\n".join(c_data.get("names", []))
     else:
         st.session_state["unidad_medida"] = carga.get("unidad_medida", "KG")
         st.session_state["cantidad_suelta"] = float(carga.get("cantidad_suelta", 0.0))
@@ -157,16 +186,7 @@ def cargar_operacion_en_formulario(no_solicitud):
     st.session_state["sales_blocks"] = reconstruir_sales_blocks(ventas)
 
     # --- Costos ---
-    st.session_state["cost_surcharges"] = [
-        {
-            "concept": c.get("concepto", ""),
-            "quantity": float(c.get("cantidad", 0.0)),
-            "rate": float(c.get("tarifa", 0.0)),
-            "total": float(c.get("monto", 0.0)),
-            "currency": c.get("moneda", "USD"),
-        }
-        for c in costos
-    ]
+    st.session_state["cost_surcharges"] = [Surcharge.from_db(c, "id_costo") for c in costos]
     if costos and any(c.get("comentarios") for c in costos):
         st.session_state["final_comments_cost"] = next(
             (c.get("comentarios") for c in costos if c.get("comentarios")), ""
@@ -183,24 +203,7 @@ def reconstruir_sales_blocks(ventas_master_db):
     - ventas_master: info general
     - detalles: lista de recargos (ventas_detalle)
     """
-    blocks = []
-    for venta in ventas_master_db:
-        block = {
-            "id_venta_master": venta.get("id_venta_master"),  # para NC
-            "client": venta.get("cliente", ""),
-            "sales_surcharges": [],
-            "comments": venta.get("comentarios", "")
-        }
-        for detalle in venta.get("detalles", []):
-            block["sales_surcharges"].append({
-                "concept": detalle.get("concepto", ""),
-                "quantity": float(detalle.get("cantidad", 0)),
-                "rate": float(detalle.get("tarifa", 0)),
-                "total": float(detalle.get("monto", 0)),
-                "currency": detalle.get("moneda", "USD")
-            })
-        blocks.append(block)
-    return blocks
+    return [SaleBlock.from_db(venta) for venta in ventas_master_db]
 
 
 def prepare_venta_data(venta_info: dict) -> dict:
@@ -1,3 +1,5 @@
+import re
+
 def safe_strip(value):
     return str(value).strip() if value else ""
 
@@ -35,4 +37,76 @@ def validate_request_data(data):
             if surcharge.get("cost", 0.0) <= 0:
                 errors.append(f"⚠️ The surcharge amount in '{cont}' #{i+1} must be greater than 0.")
 
-    return errors
\ No newline at end of file
+    return errors
+
+
+# ----------------------------------------------------------------------
+# Números de contenedor (ISO 6346)
+#
+# Formato: 3 letras del propietario + categoría (U, J o Z) + 6 dígitos de
+# serie + dígito de control, p. ej. "CSQU3054383".
+# ----------------------------------------------------------------------
+
+_CONTAINER_RE = re.compile(r"^[A-Z]{3}[UJZ]\d{7}$")
+
+# Separadores aceptados al pegar una lista: saltos de línea, comas, punto y
+# coma, tabulaciones (columnas de Excel/CSV)
+_SEPARATORS_RE = re.compile(r"[\n\r,;\t]+")
+
+
+def _letter_values():
+    # A=10 ... Z=38, saltando los múltiplos de 11
+    values, value = {}, 10
+    for letter in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
+        if value % 11 == 0:
+            value += 1
+        values[letter] = value
+        value += 1
+    return values
+
+
+_LETTER_VALUES = _letter_values()
+
+
+def normalize_container_number(value: str) -> str:
+    """
+    Quita espacios, guiones y puntos y pasa a mayúsculas ("msku 123456-7" ->
+    "MSKU1234567").
+    """
+    return re.sub(r"[\s\-./]", "", value or "").upper()
+
+
+def container_check_digit(code: str) -> int:
+    """
+    Dígito de control ISO 6346 de los 10 primeros caracteres de `code`.
+    """
+    total = 0
+    for i, char in enumerate(code[:10]):
+        value = _LETTER_VALUES[char] if char.isalpha() else int(char)
+        total += value * (2 ** i)
+    return total % 11 % 10
+
+
+def is_valid_container_number(value: str) -> bool:
+    code = normalize_container_number(value)
+    return bool(_CONTAINER_RE.match(code)) and container_check_digit(code) == int(code[10])
+
+
+def parse_container_numbers(text: str):
+    """
+    Convierte una lista pegada (una por línea o separadas por comas, punto y
+    coma o tabulaciones) en números de contenedor normalizados, en una sola
+    pasada. Devuelve (numeros, invalidos): `numeros` conserva el orden sin
+    duplicados e incluye también los inválidos, que se listan aparte para
+    avisar al usuario.
+    """
+    numbers, invalid, seen = [], [], set()
+    for token in _SEPARATORS_RE.split(text or ""):
+        code = normalize_container_number(token)
+        if not code or code in seen:
+            continue
+        seen.add(code)
+        numbers.append(code)
+        if not is_valid_container_number(code):
+            invalid.append(code)
+    return numbers, invalid
@@ -0,0 +1,61 @@
+import streamlit as st
+from services import metrics
+
+
+def pool_gauges() -> dict:
+    """
+    Estado del pool de conexiones como gauges de Prometheus.
+    """
+    from database.db import metricas_pool
+    return {f"orders_db_pool_{nombre}": valor for nombre, valor in metricas_pool().items()}
+
+
+def show():
+    st.header("Métricas de la aplicación")
+    st.caption("Latencias medidas en este proceso desde que se inició.")
+
+    snapshot = metrics.snapshot()
+    if snapshot:
+        import pandas as pd
+
+        df = pd.DataFrame([
+            {
+                "Operación": name,
+                "Llamadas": m["count"],
+                "Errores": m["errors"],
+                "Promedio (ms)": round(m["avg_ms"], 1),
+                "p50 (ms)": round(m["p50_ms"], 1),
+                "p95 (ms)": round(m["p95_ms"], 1),
+                "p99 (ms)": round(m["p99_ms"], 1),
+                "Máx (ms)": round(m["max_ms"], 1),
+                "Total (s)": round(m["total_s"], 2),
+            }
+            for name, m in snapshot.items()
+        ])
+        st.dataframe(df, hide_index=True, width="stretch")
+    else:
+        st.info("Aún no hay mediciones.")
+
+    st.subheader("Pool de conexiones")
+    gauges = pool_gauges()
+    cols = st.columns(4)
+    for i, (nombre, valor) in enumerate(gauges.items()):
+        cols[i % 4].metric(nombre.removeprefix("orders_db_pool_"), f"{valor:,.2f}" if isinstance(valor, float) else valor)
+
+    st.subheader("Google Sheets")
+    from services.sheets_client import get_sheets_client
+    sheets = get_sheets_client().metrics()
+    if sheets:
+        st.dataframe(
+            [{"Operación": op, **m} for op, m in sorted(sheets.items())],
+            hide_index=True, width="stretch"
+        )
+    else:
+        st.info("Aún no hay llamadas a Google Sheets.")
+
+    st.download_button(
+        label="Descargar (formato Prometheus)",
+        data=metrics.prometheus_text(gauges),
+        file_name="metrics.prom",
+        mime="text/plain",
+    )
@@ -1,9 +1,5 @@
 import streamlit as st
-import pandas as pd
-from database.crud.operaciones import (
-    obtener_ventas_por_solicitud,
-    obtener_notas_credito_por_venta
-)
+from database.crud.operaciones import obtener_ventas_con_notas_credito
 from database.crud.nota_credito import insertar_nota_credito
 
 def show():
@@ -12,7 +8,7 @@ def show():
     no_solicitud = st.text_input("Ingrese Número de Solicitud*", key="nc_no_solicitud")
 
     if no_solicitud:
-        ventas = obtener_ventas_por_solicitud(no_solicitud)
+        ventas = obtener_ventas_con_notas_credito(no_solicitud)
 
         if not ventas:
             st.info("No hay ventas registradas para este número de solicitud.")
@@ -29,9 +25,8 @@ def show():
             moneda = venta["moneda"]
             cliente = venta["cliente"]
 
-            notas = obtener_notas_credito_por_venta(id_venta_master)
-            total_nc = sum(n["valor_nc"] for n in notas)
-            open_balance = float(monto_venta) - float(total_nc)
+            notas = venta["notas"]
+            open_balance = float(venta["saldo"])
 
             # Agregar estas notas a la lista global
             for n in notas:
@@ -115,6 +110,7 @@ def show():
 
         if notas_credito_global:
             st.markdown("### 📋 Notas Crédito Registradas")
+            import pandas as pd
             df_nc = pd.DataFrame(notas_credito_global)
             st.dataframe(df_nc, width=True)
         else:
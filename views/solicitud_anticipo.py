@@ -1,9 +1,7 @@
 import streamlit as st
 from datetime import datetime
 import pytz
-from services.pdf_generator.generate_anticipo import generate_pdf
 from ui.helpers import *
-from services.sheets_writer import save_anticipo_submission, register_new_client
 from forms.anticipo_form import forms
 
 colombia_timezone = pytz.timezone('America/Bogota')
@@ -31,6 +29,8 @@ def show():
     request_data = forms(clients_list)
 
     if st.button('Send Information'):
+        from services.pdf_generator.generate_anticipo import generate_pdf
+        from services.sheets_writer import save_anticipo_submission, register_new_client
 
         save_anticipo_submission(request_data)
 
@@ -38,10 +38,7 @@ def show():
 
         register_new_client(request_data.get("client"), st.session_state["clients_list"])
 
-        pdf_filename = generate_pdf(request_data)
-
-        with open(pdf_filename, "rb") as f:
-            pdf_bytes = f.read()
+        pdf_bytes = generate_pdf(request_data)
 
         st.download_button(
             label="Download PDF",